@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+ Agent driver benchmark.
+ Plays a sweep of short headless matches between random bots with each agent driver and reports matches and ticks per second.
+
+ Usage: python benchmarks/agent_drivers.py [--matches N] [--ticks N] [--agents N]
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from coderone.dungeon import main as dungeon
+from coderone.dungeon.agent_driver import DRIVERS
+from coderone.dungeon.game_recorder import Recorder
+
+AGENT_MODULE = 'agent_drivers'
+
+
+class Agent:
+	""" Random bot """
+	ACTIONS = ['', 'u', 'd', 'l', 'r', 'p']
+
+	def next_move(self, game_state, player_state):
+		return random.choice(self.ACTIONS)
+
+
+def sweep(matches:int, agents:int, config:dict):
+	""" Matches and ticks per second """
+	ticks = 0
+	start = time.time()
+	for seed in range(matches):
+		config['seed'] = seed
+		ticks += dungeon.run([AGENT_MODULE] * agents, None, config=config, recorder=Recorder()).iteration
+	elapsed = time.time() - start
+	return matches / elapsed, ticks / elapsed
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Agent driver benchmark')
+	parser.add_argument('--matches', type=int, default=20, help='number of matches per driver')
+	parser.add_argument('--ticks', type=int, default=100, help='ticks per match')
+	parser.add_argument('--agents', type=int, default=2, help='agents per match')
+	args = parser.parse_args()
+
+	logging.getLogger().setLevel(logging.WARNING)
+
+	print(f"{'driver':>10} {'matches/sec':>12} {'ticks/sec':>10}")
+	for driver in DRIVERS:
+		config = {
+			'driver': driver,
+			'headless': True,
+			'turbo': True,
+			'lockstep': True,
+			'rows': 10,
+			'columns': 12,
+			'max_iterations': args.ticks,
+			'tick_step': 0.1,
+			'move_deadline': 0.1,
+		}
+		matches, ticks = sweep(args.matches, args.agents, config)
+		print(f"{driver:>10} {matches:>12.2f} {ticks:>10.0f}")
+
+
+if __name__ == "__main__":
+	main()
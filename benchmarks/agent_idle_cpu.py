@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+ Agent process CPU benchmark.
+ Starts agents in separate processes, the way matches are run, and reports the CPU time each agent process uses
+ as a percentage of one core: while the game sends no states at all, and while a match is played at 10 ticks per second.
+ CPU time of agent processes is read from /proc, so the benchmark only runs on Linux.
+
+ Usage: python benchmarks/agent_idle_cpu.py [--agents N] [--seconds N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from coderone.dungeon.game import Game
+from coderone.dungeon.agent_driver.multiproc_driver import Driver
+
+AGENT_MODULE = 'agent_idle_cpu'
+TICK_STEP = 0.1
+
+
+class Agent:
+	""" Agent that answers straight away """
+
+	def next_move(self, game_state, player_state):
+		return ''
+
+
+def cpu_time(pid:int) -> float:
+	""" CPU time used by a process in seconds """
+	with open(f'/proc/{pid}/stat') as f:
+		fields = f.read().rsplit(')', 1)[1].split()
+	return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def measure(workers, seconds:float, play) -> float:
+	""" Average CPU use of worker processes in percent of a core while `play` runs for `seconds` """
+	start_cpu = [cpu_time(w.pid) for w in workers]
+	start = time.time()
+	play(seconds)
+	elapsed = time.time() - start
+	return sum(cpu_time(w.pid) - cpu for w, cpu in zip(workers, start_cpu)) / len(workers) / elapsed * 100
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Agent process CPU benchmark')
+	parser.add_argument('--agents', type=int, default=2, help='number of agents')
+	parser.add_argument('--seconds', type=float, default=5, help='duration of each measurement')
+	args = parser.parse_args()
+
+	with Driver(AGENT_MODULE) as driver:
+		game = Game(seed=1)
+		agents = [driver.agent() for _ in range(args.agents)]
+		for agent in agents:
+			game.add_agent(agent, None)
+		game.generate_map()
+
+		while not all(agent.is_ready for agent in agents):
+			time.sleep(0.01)
+
+		def play(seconds:float):
+			deadline = time.time() + seconds
+			while time.time() < deadline:
+				game.tick(TICK_STEP)
+				time.sleep(TICK_STEP)
+
+		idle = measure(driver._workers, args.seconds, time.sleep)
+		playing = measure(driver._workers, args.seconds, play)
+
+	print(f"{'agents':>8} {'idle cpu %':>12} {'match cpu %':>12}")
+	print(f"{args.agents:>8} {idle:>12.1f} {playing:>12.1f}")
+
+
+if __name__ == "__main__":
+	main()
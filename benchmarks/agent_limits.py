@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+ Agent resource limits benchmark.
+ Plays a match of a runaway agent against a well-behaved one, with and without resource limits for agent processes,
+ and reports ticks per second, whether the match has run to the end, and peak resident memory, CPU time and disqualification of the runaway agent.
+ The runaway agent either allocates --hog-step-mb MB per move, up to --hog-max-mb, or spins the CPU for --hog-spin-ms per move.
+
+ Usage: python benchmarks/agent_limits.py [--ticks N] [--memory-limit-mb MB] [--cpu-limit-sec SEC] [--cpu N]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from coderone.dungeon import main as dungeon
+from coderone.dungeon.game_recorder import Recorder
+
+AGENT_MODULE = 'agent_limits'
+
+# Agent processes import this module: behaviour of the runaway agent
+HOG = os.environ.get('AGENT_HOG', '')
+HOG_STEP_MB = int(os.environ.get('AGENT_HOG_STEP_MB', 16))
+HOG_MAX_MB = int(os.environ.get('AGENT_HOG_MAX_MB', 1024))
+HOG_SPIN_SEC = float(os.environ.get('AGENT_HOG_SPIN_MS', 50)) / 1000
+
+
+class Agent:
+	""" Runaway agent in the seat of player 0, well-behaved agent in the others """
+
+	def __init__(self):
+		self.memory = []
+
+	def next_move(self, game_state, player_state):
+		if player_state.id != 0:
+			return ''
+		if HOG == 'memory' and len(self.memory) * HOG_STEP_MB < HOG_MAX_MB:
+			self.memory.append(b'\1' * (HOG_STEP_MB << 20))
+		elif HOG == 'cpu':
+			end = time.process_time() + HOG_SPIN_SEC
+			while time.process_time() < end:
+				pass
+		return ''
+
+
+def play(config:dict):
+	start = time.time()
+	stats = dungeon.run([AGENT_MODULE] * 2, None, config=config, recorder=Recorder())
+	return stats, stats.iteration / (time.time() - start)
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Agent resource limits benchmark')
+	parser.add_argument('--ticks', type=int, default=100, help='ticks of the match')
+	parser.add_argument('--memory-limit-mb', type=float, default=256, help='memory limit of agent processes')
+	parser.add_argument('--cpu-limit-sec', type=float, default=1, help='CPU time limit of agent processes per match')
+	parser.add_argument('--cpu', type=int, default=None, help='CPU to pin agent processes to')
+	parser.add_argument('--hog-step-mb', type=int, default=16, help='memory the runaway agent allocates per move')
+	parser.add_argument('--hog-max-mb', type=int, default=1024, help='most memory the runaway agent allocates')
+	parser.add_argument('--hog-spin-ms', type=float, default=50, help='CPU time the runaway agent spins for per move')
+	args = parser.parse_args()
+
+	os.environ.update(AGENT_HOG_STEP_MB=str(args.hog_step_mb), AGENT_HOG_MAX_MB=str(args.hog_max_mb), AGENT_HOG_SPIN_MS=str(args.hog_spin_ms))
+	logging.getLogger().setLevel(logging.ERROR)
+
+	print(f"{'runaway':>8} {'limits':>7} {'ticks/sec':>10} {'finished':>9} {'peak RSS MB':>12} {'CPU sec':>8}  disqualified")
+	for hog in ['memory', 'cpu']:
+		os.environ['AGENT_HOG'] = hog
+		for limits in [False, True]:
+			config = {
+				'headless': True,
+				'turbo': True,
+				'lockstep': True,
+				'rows': 10,
+				'columns': 12,
+				'max_iterations': args.ticks,
+				'tick_step': 0.2,
+				'move_deadline': 0.2,
+				'seed': 1,
+			}
+			if limits:
+				config.update(agent_memory_limit_mb=args.memory_limit_mb, agent_cpu_limit_sec=args.cpu_limit_sec,
+					agent_cpu_affinity=[args.cpu] if args.cpu is not None else None)
+			stats, ticks = play(config)
+			agent = stats.agents[0]
+			print(f"{hog:>8} {'on' if limits else 'off':>7} {ticks:>10.1f} {str(stats.iteration >= args.ticks):>9} "
+				f"{agent.peak_rss_mb or 0:>12.0f} {agent.cpu_time or 0:>8.2f}  {agent.disqualified or '-'}")
+
+
+if __name__ == "__main__":
+	main()
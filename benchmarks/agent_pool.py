@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+ Agent worker pool benchmark.
+ Plays a series of short headless matches, the way a tournament does, and reports matches per second
+ with agent processes started for every match and with agent processes leased from a WorkerPool.
+ Agent module import is slowed down by --import-sec, as agents loading models are.
+
+ Usage: python benchmarks/agent_pool.py [--matches N] [--ticks N] [--import-sec SEC]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from coderone.dungeon import main as dungeon
+from coderone.dungeon.game_recorder import Recorder
+from coderone.dungeon.agent_driver.multiproc_driver import WorkerPool
+
+AGENT_MODULE = 'agent_pool'
+
+# Agent processes import this module: emulate an agent that takes a while to load, e.g. a model
+time.sleep(float(os.environ.get('AGENT_IMPORT_SEC', 0)))
+
+
+class Agent:
+	""" Agent that answers straight away """
+
+	def next_move(self, game_state, player_state):
+		return ''
+
+
+def play(matches:int, config:dict, pool:WorkerPool=None) -> float:
+	""" Matches per second """
+	start = time.time()
+	for seed in range(matches):
+		config['seed'] = seed
+		dungeon.run([AGENT_MODULE, AGENT_MODULE], None, config=config, recorder=Recorder(), pool=pool)
+	return matches / (time.time() - start)
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Agent worker pool benchmark')
+	parser.add_argument('--matches', type=int, default=20, help='number of matches')
+	parser.add_argument('--ticks', type=int, default=20, help='ticks per match')
+	parser.add_argument('--import-sec', type=float, default=0.5, help='time it takes agent processes to import the agent module')
+	args = parser.parse_args()
+
+	os.environ['AGENT_IMPORT_SEC'] = str(args.import_sec)
+
+	logging.getLogger().setLevel(logging.WARNING)
+	config = {
+		'headless': True,
+		'turbo': True,
+		'lockstep': True,
+		'rows': 10,
+		'columns': 12,
+		'max_iterations': args.ticks,
+		'tick_step': 0.1,
+		'move_deadline': 0.1,
+	}
+
+	fresh = play(args.matches, config)
+	with WorkerPool(config) as pool:
+		pooled = play(args.matches, config, pool)
+		started = pool.started
+
+	print(f"{'matches':>8} {'fresh/sec':>10} {'pooled/sec':>11} {'processes':>10}")
+	print(f"{args.matches:>8} {fresh:>10.2f} {pooled:>11.2f} {started:>10}")
+
+
+if __name__ == "__main__":
+	main()
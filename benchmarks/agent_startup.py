@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+ Agent process start-up benchmark.
+ Reports the time from asking a driver for an agent until the agent process reports ready,
+ for agent processes started from scratch and forked from the zygote with the agent's dependencies preloaded.
+ Agent dependencies are modules the benchmark agent imports, numpy by default.
+
+ Usage: python benchmarks/agent_startup.py [--agents N] [--deps numpy,...] [--start-method fork|spawn|forkserver]
+"""
+
+import argparse
+import importlib
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from coderone.dungeon.agent_driver.multiproc_driver import Driver
+
+AGENT_MODULE = 'agent_startup'
+
+# Agent processes import this module: import the dependencies of the emulated agent
+for dep in filter(None, os.environ.get('AGENT_DEPS', '').split(',')):
+	importlib.import_module(dep)
+
+
+class Agent:
+	""" Agent that answers straight away """
+
+	def next_move(self, game_state, player_state):
+		return ''
+
+
+def startup_ms(agents:int, config:dict) -> float:
+	""" Average time to get an agent ready in ms, agents are started one after another """
+	total = 0
+	with Driver(AGENT_MODULE, config=config) as driver:
+		for _ in range(agents):
+			start = time.time()
+			agent = driver.agent()
+			while not agent.is_ready:
+				time.sleep(0.001)
+			total += time.time() - start
+	return total / agents * 1000
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Agent process start-up benchmark')
+	parser.add_argument('--agents', type=int, default=10, help='number of agents to start')
+	parser.add_argument('--deps', type=str, default='numpy', help='comma-separated modules the agent imports')
+	parser.add_argument('--start-method', type=str, default=None, help='start method of agent processes started from scratch')
+	args = parser.parse_args()
+
+	if args.start_method:
+		multiprocessing.set_start_method(args.start_method)
+	os.environ['AGENT_DEPS'] = args.deps
+	deps = list(filter(None, args.deps.split(',')))
+
+	cold = startup_ms(args.agents, {})
+
+	# The zygote is started by the first agent, the following ones are forked from it
+	zygote_start = startup_ms(1, {'zygote': True, 'zygote_preload': deps})
+	zygote = startup_ms(args.agents, {'zygote': True, 'zygote_preload': deps})
+
+	print(f"{'start method':>14} {'cold ms':>9} {'zygote start ms':>16} {'zygote ms':>10}")
+	print(f"{multiprocessing.get_start_method():>14} {cold:>9.1f} {zygote_start:>16.1f} {zygote:>10.1f}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+ Async agent driver benchmark.
+ Agents of the benchmark await a simulated inference server call on every tick. Reports ticks per second of a headless match
+ with more and more such agents on the event loop of the async driver, along with the rate the game would get calling them one by one.
+
+ Usage: python benchmarks/async_agents.py [--latency-ms N] [--ticks N]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from coderone.dungeon import main as dungeon
+from coderone.dungeon.game_recorder import Recorder
+
+AGENT_MODULE = 'async_agents'
+LATENCY_SEC = float(os.environ.get('AGENT_LATENCY_SEC', 0.02))
+
+
+class Agent:
+	""" Random bot asking an inference server stand-in for its moves """
+	ACTIONS = ['', 'u', 'd', 'l', 'r', 'p']
+
+	async def next_move(self, game_state, player_state):
+		await asyncio.sleep(LATENCY_SEC)
+		return random.choice(self.ACTIONS)
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Async agent driver benchmark')
+	parser.add_argument('--latency-ms', type=float, default=20, help='latency of the simulated inference call')
+	parser.add_argument('--ticks', type=int, default=50, help='ticks per match')
+	args = parser.parse_args()
+
+	os.environ['AGENT_LATENCY_SEC'] = str(args.latency_ms / 1000) # The driver imports the benchmark as the agent module
+	latency = args.latency_ms / 1000
+	logging.getLogger().setLevel(logging.WARNING)
+
+	print(f"{'agents':>8} {'ticks/sec':>10} {'sequential':>11}")
+	for agents in (2, 8, 32):
+		config = {
+			'driver': 'async',
+			'headless': True,
+			'turbo': True,
+			'lockstep': True,
+			'rows': 20,
+			'columns': 20,
+			'max_iterations': args.ticks,
+			'tick_step': 1.0,
+			'move_deadline': 1.0,
+			'seed': 1,
+		}
+		start = time.time()
+		ticks = dungeon.run([AGENT_MODULE] * agents, None, config=config, recorder=Recorder()).iteration
+		rate = ticks / (time.time() - start)
+		print(f"{agents:>8} {rate:>10.1f} {1 / (agents * latency):>11.1f}")
+
+
+if __name__ == "__main__":
+	main()
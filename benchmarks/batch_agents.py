@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+ Batched agent server benchmark.
+ Plays a self-play match of one agent module in every seat and reports resident memory of the agent processes,
+ their CPU time and ticks per second with a process per seat (multiproc driver) and a process per module (batch driver),
+ with the batch driver calling `next_move` per seat and the `next_moves` hook of the agent.
+ The agent emulates a neural network: a matrix of --model-mb MB loaded on import and a product with it per move. Needs NumPy.
+
+ Usage: python benchmarks/batch_agents.py [--agents N] [--ticks N] [--model-mb MB]
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from coderone.dungeon import main as dungeon
+from coderone.dungeon.agent_driver import get_driver
+from coderone.dungeon.game_recorder import Recorder
+
+AGENT_MODULE = 'batch_agents'
+ACTIONS = ['', 'u', 'd', 'l', 'r', 'p']
+
+# Agent processes import this module: load the model of the emulated agent
+_FEATURES = int((float(os.environ.get('AGENT_MODEL_MB', 32)) * (1 << 20) / 8) ** 0.5)
+MODEL = numpy.random.default_rng(0).standard_normal((_FEATURES, _FEATURES))
+
+
+def _features(game_state, player_state):
+	x = numpy.zeros(_FEATURES)
+	x[(game_state.tick_number * 31 + hash(player_state.location)) % _FEATURES] = 1
+	return x
+
+
+class Agent:
+	""" Agent answering with the product of the model and features of the state, batched if AGENT_BATCHED is set """
+
+	def next_move(self, game_state, player_state):
+		return ACTIONS[int(numpy.argmax(_features(game_state, player_state) @ MODEL)) % len(ACTIONS)]
+
+	if os.environ.get('AGENT_BATCHED'):
+		@staticmethod
+		def next_moves(batch):
+			scores = numpy.stack([_features(item.game_state, item.player_state) for item in batch]) @ MODEL
+			return [ACTIONS[int(i) % len(ACTIONS)] for i in numpy.argmax(scores, axis=1)]
+
+
+def _rss_mb(pid:int) -> float:
+	with open(f'/proc/{pid}/statm') as f:
+		return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1 << 20)
+
+
+def memory_mb(agents:int, config:dict) -> float:
+	""" Resident memory of the agent processes of a match in MB, once all agents are ready """
+	Driver = get_driver(config['driver'])
+	drivers = [Driver(AGENT_MODULE, config=config) for _ in range(agents)]
+	try:
+		proxies = [d.agent() for d in drivers]
+		while not all(p.is_ready for p in proxies):
+			time.sleep(0.01)
+		return sum(_rss_mb(p.pid) for p in multiprocessing.active_children())
+	finally:
+		for d in drivers:
+			d.stop()
+
+
+def play(agents:int, config:dict):
+	""" Ticks per second of a match and CPU time of its agent processes in seconds """
+	usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+	start = time.time()
+	ticks = dungeon.run([AGENT_MODULE] * agents, None, config=config, recorder=Recorder()).iteration
+	elapsed = time.time() - start
+	cpu = resource.getrusage(resource.RUSAGE_CHILDREN)
+	return ticks / elapsed, cpu.ru_utime + cpu.ru_stime - usage.ru_utime - usage.ru_stime
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Batched agent server benchmark')
+	parser.add_argument('--agents', type=int, default=8, help='seats of the agent module in the match')
+	parser.add_argument('--ticks', type=int, default=200, help='ticks of the match')
+	parser.add_argument('--model-mb', type=float, default=32, help='size of the model the agent loads')
+	args = parser.parse_args()
+
+	os.environ['AGENT_MODEL_MB'] = str(args.model_mb)
+	logging.getLogger().setLevel(logging.WARNING)
+
+	print(f"{'driver':>10} {'next_moves':>11} {'memory MB':>10} {'CPU sec':>8} {'ticks/sec':>10}")
+	for driver, batched in [('multiproc', False), ('batch', False), ('batch', True)]:
+		if batched:
+			os.environ['AGENT_BATCHED'] = '1'
+		config = {
+			'driver': driver,
+			'headless': True,
+			'turbo': True,
+			'lockstep': True,
+			'rows': 10,
+			'columns': 12,
+			'max_iterations': args.ticks,
+			'tick_step': 0.1,
+			'move_deadline': 1,
+			'seed': 1,
+		}
+		memory = memory_mb(args.agents, config)
+		ticks, cpu = play(args.agents, config)
+		print(f"{driver:>10} {str(batched):>11} {memory:>10.0f} {cpu:>8.2f} {ticks:>10.1f}")
+
+
+if __name__ == "__main__":
+	main()
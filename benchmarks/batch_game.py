@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""
+ BatchGame throughput benchmark.
+ Steps batches of games with random actions and reports the number of game ticks per second
+ summed over all games in the batch.
+
+ Usage: python benchmarks/batch_game.py [--games 1,100,1000] [--ticks N] [--players N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from coderone.dungeon.batch_game import BatchGame, ACTIONS
+
+
+def run(n_games:int, n_players:int, ticks:int, seed:int=1) -> float:
+	batch = BatchGame.generate(n_games, n_players, seed=seed)
+	action_rng = np.random.default_rng(seed)
+	actions = action_rng.integers(0, len(ACTIONS), size=(ticks, n_games, n_players))
+
+	start = time.perf_counter()
+	for tick in range(ticks):
+		batch.step(actions[tick])
+	elapsed = time.perf_counter() - start
+
+	return n_games * ticks / elapsed
+
+
+def main():
+	parser = argparse.ArgumentParser(description='BatchGame throughput benchmark')
+	parser.add_argument('--games', type=str, default='1,100,1000', help='comma-separated list of batch sizes')
+	parser.add_argument('--players', type=int, default=4, help='number of players per game')
+	parser.add_argument('--ticks', type=int, default=300, help='number of ticks to run')
+	args = parser.parse_args()
+
+	print(f"{'games':>8} {'game ticks/sec':>16}")
+	for n_games in (int(v) for v in args.games.split(',')):
+		rate = run(n_games, args.players, args.ticks)
+		print(f"{n_games:>8} {rate:>16.1f}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+"""
+ Parity check of the vectorized BatchGame against the reference Game implementation.
+ Games are generated from the same seeds, both engines are fed identical actions and their states are compared after every tick.
+ Action order shuffling is disabled in both engines. Cells chosen by Game for spawned ammo and treasure and the delay until the next treasure
+ are mirrored into the BatchGame, as these are the only random decisions taken during a tick.
+
+ Usage: python benchmarks/batch_parity.py [--games N] [--ticks N] [--players N]
+"""
+
+import argparse
+import os
+import random
+import sys
+from collections import defaultdict, deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from coderone.dungeon.game import Game, PlayerActions, DelayedEffectType
+from coderone.dungeon.batch_game import BatchGame, ACTIONS
+
+
+class _FixedOrderRandom(random.Random):
+	""" Random number generator that leaves the order of player actions as is """
+	def shuffle(self, x):
+		pass
+
+
+class _MirroredBatchGame(BatchGame):
+	""" BatchGame that spawns items in the cells the reference games have chosen """
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.spawn_queue = defaultdict(deque)
+
+	def _choose_spawn_cells(self, games, free, kind):
+		cells = []
+		for g in games:
+			queue = self.spawn_queue[(int(g), kind)]
+			cells.append(self._cell(queue.popleft()) if queue else -1)
+		return np.array(cells, dtype=np.int64)
+
+	def _treasure_spawn_delay(self, games, spawned):
+		return np.array([self.spawn_queue[(int(g), 'delay')].popleft() for g in games], dtype=np.int64)
+
+
+def by_cell(fires):
+	""" Order fires by cell keeping the order of fires within a cell, the only order that affects the outcome of a tick """
+	return sorted(fires, key=lambda fire: fire[0])
+
+
+def game_state(game:Game):
+	""" Extract the state of the reference game in the form comparable with the batch """
+	cell = lambda pos: pos[0] * game.row_count + pos[1]
+	pids = sorted(game.players)
+	index = {pid: p for p, pid in enumerate(pids)}
+	ammo_due = defaultdict(int)
+	treasure_due = []
+	for effect in game._effect_timers.pending():
+		if effect.effect == DelayedEffectType.SPAWN_AMMO:
+			ammo_due[effect.hp - 1] += 1
+		else:
+			treasure_due.append(effect.hp - 1)
+
+	return {
+		'tick': game.tick_counter,
+		'is_over': game.is_over,
+		'winner': index[game.winner[0]] if game.winner else None,
+		'players': [(game.players[pid].pos, game.players[pid].hp, game.players[pid].ammo, game.players[pid].reward) for pid in pids],
+		'static': sorted(cell(b.pos) for b in game.static_block_list),
+		'blocks': sorted((cell(b.pos), b.hp) for b in game.value_block_list),
+		'bombs': sorted((cell(b.pos), b.hp, index[b.owner_id], b.power) for b in game.bomb_list),
+		'ammo': sorted((cell(a.pos), a.hp, a.value) for a in game.ammunition_list),
+		'treasure': sorted(cell(t.pos) for t in game.treasure_list),
+		'fire': by_cell((cell(f.pos), index[f.owner_id]) for f in game.fire_list),
+		'ammo_due': dict(ammo_due),
+		'treasure_due': treasure_due,
+	}
+
+
+def batch_state(batch:BatchGame, i:int):
+	""" Extract the state of the i-th game of the batch """
+	cells = lambda mask: np.nonzero(mask[i])[0].tolist()
+	ammo_due = {}
+	for slot in np.nonzero(batch.ammo_effects[i])[0]:
+		due = (int(slot) - batch._step) % batch._effect_ring
+		ammo_due[due] = int(batch.ammo_effects[i, slot])
+
+	return {
+		'tick': int(batch.tick_counter[i]),
+		'is_over': bool(batch.is_over[i]),
+		'winner': int(batch.winner[i]) if batch.winner[i] >= 0 else None,
+		'players': [((int(batch.player_x[i, p]), int(batch.player_y[i, p])), int(batch.player_hp[i, p]), int(batch.player_ammo[i, p]), int(batch.player_reward[i, p])) for p in range(batch.n_players)],
+		'static': cells(batch.static_blocks),
+		'blocks': [(c, int(batch.block_hp[i, c])) for c in cells(batch.block_present)],
+		'bombs': [(c, int(batch.bomb_ttl[i, c]), int(batch.bomb_owner[i, c]), int(batch.bomb_power[i, c])) for c in cells(batch.bomb_present)],
+		'ammo': [(c, int(batch.ammo_ttl[i, c]), int(batch.ammo_value[i, c])) for c in cells(batch.ammo_present)],
+		'treasure': cells(batch.treasure_present),
+		'fire': by_cell((int(batch.fire_cell[i, j]), int(batch.fire_owner[i, j])) for j in np.nonzero(batch.fire_valid[i])[0]),
+		'ammo_due': ammo_due,
+		'treasure_due': [int(batch.treasure_due[i]) - batch._step] if batch.treasure_due[i] >= 0 else [],
+	}
+
+
+def check(n_games:int, n_players:int, ticks:int, seed:int, columns:int, rows:int, max_iterations:int) -> int:
+	games = []
+	for i in range(n_games):
+		game = Game(row_count=rows, column_count=columns, max_iterations=max_iterations)
+		game._rng = _FixedOrderRandom(seed * n_games + i)
+		for _ in range(n_players):
+			game.add_player(None)
+		game.generate_map()
+		games.append(game)
+
+	batch = _MirroredBatchGame.from_games(games, seed=seed, shuffle_actions=False)
+
+	action_rng = np.random.default_rng(seed)
+	# Bias actions towards placing bombs to get plenty of fire
+	action_p = np.array([2.0 if a == PlayerActions.PLACE_BOMB else 1.0 for a in ACTIONS])
+	action_p /= action_p.sum()
+
+	mismatches = 0
+	for tick in range(ticks):
+		actions = action_rng.choice(len(ACTIONS), size=(n_games, n_players), p=action_p)
+
+		for i, game in enumerate(games):
+			ammo_before = {a.pos for a in game.ammunition_list}
+			treasure_before = {t.pos for t in game.treasure_list}
+			effects_before = set(map(id, game._effect_timers.pending()))
+
+			for p, pid in enumerate(sorted(game.players)):
+				game.enqueue_action(pid, ACTIONS[actions[i, p]])
+			game.tick(0)
+
+			batch.spawn_queue[(i, DelayedEffectType.SPAWN_AMMO)].extend(a.pos for a in game.ammunition_list if a.pos not in ammo_before)
+			batch.spawn_queue[(i, DelayedEffectType.SPAWN_TREASURE)].extend(t.pos for t in game.treasure_list if t.pos not in treasure_before)
+			batch.spawn_queue[(i, 'delay')].extend(e.hp for e in game._effect_timers.pending()
+				if e.effect == DelayedEffectType.SPAWN_TREASURE and id(e) not in effects_before)
+
+		batch.step(actions)
+
+		for i, game in enumerate(games):
+			expected, actual = game_state(game), batch_state(batch, i)
+			diff = [key for key in expected if expected[key] != actual[key]]
+			if diff:
+				mismatches += 1
+				print(f"tick {tick} game {i}: mismatch in {diff}")
+				for key in diff:
+					print(f"  {key}:\n    game:  {expected[key]}\n    batch: {actual[key]}")
+
+		if mismatches:
+			break
+
+	return mismatches
+
+
+def main():
+	parser = argparse.ArgumentParser(description='BatchGame parity check against Game')
+	parser.add_argument('--games', type=int, default=64, help='number of games to check')
+	parser.add_argument('--players', type=int, default=4, help='number of players per game')
+	parser.add_argument('--ticks', type=int, default=600, help='number of ticks to run')
+	parser.add_argument('--max_iterations', type=int, default=500, help='game iteration limit')
+	parser.add_argument('--size', type=str, default='12x10', help='map size COLUMNSxROWS')
+	parser.add_argument('--seed', type=int, default=1)
+	args = parser.parse_args()
+
+	columns, rows = (int(v) for v in args.size.split('x'))
+	mismatches = check(args.games, args.players, args.ticks, args.seed, columns, rows, args.max_iterations)
+	if mismatches:
+		print(f"FAILED: {mismatches} mismatches")
+		sys.exit(1)
+
+	print(f"OK: {args.games} games x {args.ticks} ticks match")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+ CLI start-up benchmark.
+ Reports the time spent importing modules, as measured by `python -X importtime`, when importing `coderone.dungeon.main`
+ and when running a short headless match with the CLI, with agents in the game process and in agent processes.
+ Fails if any of them takes longer than --budget-ms or imports a dependency the headless path has no use for,
+ so it can be run as a check.
+
+ Usage: python benchmarks/cli_startup.py [--repeat N] [--budget-ms MS]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Top-level packages that are only needed by graphics, interactive play, agent reloading or submission
+HEAVY_DEPENDENCIES = ('watchdog', 'requests', 'arcade', 'pyglet', 'curses', 'numpy')
+
+# Runs the CLI with the rest of the arguments. Processes the match starts, e.g. the resource tracker of shared memory,
+# are not measured: they are started with the interpreter flags of sys._xoptions, and don't hold up the game
+CLI = "import sys, runpy; sys._xoptions.pop('importtime', None); runpy.run_module('coderone.dungeon.main', run_name='__main__', alter_sys=True)"
+
+AGENT_SOURCE = '''
+class Agent:
+	def next_move(self, game_state, player_state):
+		return ''
+'''
+
+
+def import_profile(args:list):
+	""" Total import time in ms of a python run with the given arguments and the top-level packages it has imported """
+	env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+	result = subprocess.run([sys.executable, '-X', 'importtime', *args], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+	if result.returncode:
+		raise RuntimeError(f"{' '.join(args)} has failed:\n{result.stderr}")
+
+	total_us, packages = 0, set()
+	for line in result.stderr.splitlines():
+		if not line.startswith('import time:') or 'self [us]' in line:
+			continue
+		self_us, _, name = line[len('import time:'):].split('|')
+		total_us += int(self_us)
+		packages.add(name.strip().split('.')[0])
+	return total_us / 1000, packages
+
+
+def main():
+	parser = argparse.ArgumentParser(description='CLI start-up benchmark')
+	parser.add_argument('--repeat', type=int, default=5, help='runs of each case, the fastest one is reported')
+	parser.add_argument('--budget-ms', type=float, default=80, help='most time a case may spend importing modules')
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp:
+		agent = os.path.join(tmp, 'startup_agent.py')
+		with open(agent, 'w') as f:
+			f.write(AGENT_SOURCE)
+		config = os.path.join(tmp, 'config.json')
+		with open(config, 'w') as f:
+			json.dump({'headless': True, 'turbo': True, 'max_iterations': 5, 'tick_step': 0.1}, f)
+
+		match = ['-c', CLI, '--headless', '--config', config]
+		cases = {
+			'import main': ['-c', 'import coderone.dungeon.main'],
+			'headless inproc': match + ['--driver', 'inproc', agent, agent],
+			'headless multiproc': match + ['--driver', 'multiproc', agent, agent],
+		}
+
+		failed = False
+		print(f"{'case':>20} {'import ms':>10}  heavy dependencies")
+		for case, case_args in cases.items():
+			profiles = [import_profile(case_args) for _ in range(args.repeat)]
+			import_ms = min(ms for ms, _ in profiles)
+			heavy = sorted(set.union(*(packages for _, packages in profiles)) & set(HEAVY_DEPENDENCIES))
+			failed = failed or import_ms > args.budget_ms or bool(heavy)
+			print(f"{case:>20} {import_ms:>10.1f}  {', '.join(heavy) or '-'}")
+
+	if failed:
+		print(f"Start-up is over the budget of {args.budget_ms}ms or imports heavy dependencies", file=sys.stderr)
+		sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
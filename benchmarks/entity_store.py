@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+ Entity storage benchmark.
+ Reports memory used by game entities on a large map and tick throughput of a long endless session,
+ where a new map is generated each time a match is over.
+
+ Usage: python benchmarks/entity_store.py [--size 200x200] [--endless_ticks N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from coderone.dungeon.game import Game
+from game_tick import make_game, ACTIONS
+
+
+def entity_memory(columns:int, rows:int, n_players:int):
+	""" Measure memory allocated for the state of a game with a freshly generated map
+	"""
+	tracemalloc.start()
+	before = tracemalloc.get_traced_memory()[0]
+	game = make_game(columns, rows, n_players, seed=1)
+	allocated = tracemalloc.get_traced_memory()[0] - before
+	tracemalloc.stop()
+
+	n_entities = len(game.all_entities) + len(game.players)
+	return allocated, n_entities
+
+
+def endless_run(columns:int, rows:int, n_players:int, ticks:int, seed:int=1):
+	""" Run an endless session with a short iteration limit and return ticks/sec and the number of matches played
+	"""
+	game = make_game(columns, rows, n_players, seed)
+	game.max_iterations = 300
+	action_rng = random.Random(seed)
+
+	matches = 0
+	start = time.perf_counter()
+	for _ in range(ticks):
+		for pid in game.players:
+			game.enqueue_action(pid, action_rng.choice(ACTIONS))
+		game.tick(0)
+		if game.is_over:
+			matches += 1
+			game.generate_map()
+	elapsed = time.perf_counter() - start
+
+	return ticks / elapsed, matches
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Entity storage benchmark')
+	parser.add_argument('--size', type=str, default='200x200', help='map size COLUMNSxROWS for the memory benchmark')
+	parser.add_argument('--players', type=int, default=64, help='number of players for the memory benchmark')
+	parser.add_argument('--endless_ticks', type=int, default=50000, help='number of ticks in the endless session')
+	args = parser.parse_args()
+
+	columns, rows = (int(v) for v in args.size.split('x'))
+	allocated, n_entities = entity_memory(columns, rows, args.players)
+	print(f"{args.size} map: {n_entities} entities, {allocated / 2**20:.2f} MiB, {allocated / n_entities:.0f} bytes/entity")
+
+	rate, matches = endless_run(Game.COLUMN_COUNT, Game.ROW_COUNT, 4, args.endless_ticks)
+	print(f"endless {Game.COLUMN_COUNT}x{Game.ROW_COUNT}: {args.endless_ticks} ticks, {matches} matches, {rate:.1f} ticks/sec")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+ Forward model benchmark for search-based agents.
+ Measures how many times per second a game in progress can be copied with `Game.clone()`
+ (compared against `copy.deepcopy`), restored from a snapshot, and how many random rollouts of a fixed depth can be played from it.
+
+ Usage: python benchmarks/game_clone.py [--depth N] [--seconds S] [--sizes 12x10,50x50]
+"""
+
+import argparse
+import copy
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from game_tick import make_game, ACTIONS
+
+
+def rate(fn, seconds:float) -> float:
+	""" Call fn repeatedly for about the given number of seconds and return calls per second """
+	calls = 0
+	start = time.perf_counter()
+	elapsed = 0.0
+	while elapsed < seconds:
+		fn()
+		calls += 1
+		elapsed = time.perf_counter() - start
+	return calls / elapsed
+
+
+def run(columns:int, rows:int, n_players:int, depth:int, seconds:float, seed:int=1):
+	""" Play a few ticks into a game and measure copy and rollout rates from that position """
+	game = make_game(columns, rows, n_players, seed)
+	action_rng = random.Random(seed)
+	for _ in range(50):
+		for pid in game.players:
+			game.enqueue_action(pid, action_rng.choice(ACTIONS))
+		game.tick(0)
+
+	snapshot = game.snapshot()
+	scratch = game.clone()
+
+	def __rollout():
+		sim = game.clone()
+		for _ in range(depth):
+			for pid in sim.players:
+				sim.enqueue_action(pid, action_rng.choice(ACTIONS))
+			sim.tick(0)
+
+	return {
+		'deepcopy/s': rate(lambda: copy.deepcopy(game), seconds),
+		'clone/s': rate(game.clone, seconds),
+		'restore/s': rate(lambda: scratch.restore(snapshot), seconds),
+		'rollouts/s': rate(__rollout, seconds),
+	}
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Game clone and rollout benchmark')
+	parser.add_argument('--depth', type=int, default=20, help='number of ticks per rollout')
+	parser.add_argument('--seconds', type=float, default=2.0, help='time to spend measuring each rate')
+	parser.add_argument('--sizes', type=str, default='12x10,50x50', help='comma-separated list of COLUMNSxROWS map sizes')
+	args = parser.parse_args()
+
+	print(f"{'map':>10} {'players':>8} {'deepcopy/s':>12} {'clone/s':>12} {'restore/s':>12} {'rollouts/s':>12}")
+	for size in args.sizes.split(','):
+		columns, rows = (int(v) for v in size.split('x'))
+		n_players = max(4, min(64, (columns * rows) // 600))
+		rates = run(columns, rows, n_players, args.depth, args.seconds)
+		print(f"{size:>10} {n_players:>8} {rates['deepcopy/s']:>12.0f} {rates['clone/s']:>12.0f} {rates['restore/s']:>12.0f} {rates['rollouts/s']:>12.0f}")
+
+
+if __name__ == "__main__":
+	main()
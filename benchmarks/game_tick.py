@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+ Game tick throughput benchmark.
+ Runs a headless game with random player actions (no agents attached) on maps of several sizes
+ and reports the number of game ticks per second.
+
+ Usage: python benchmarks/game_tick.py [--ticks N] [--sizes 12x10,50x50,200x200]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from coderone.dungeon.game import Game, PlayerActions
+
+ACTIONS = list(PlayerActions)
+
+
+def make_game(columns:int, rows:int, n_players:int, seed:int) -> Game:
+	""" Create a game with block density of the default 12x10 map scaled to the given map size
+	"""
+	game = Game(row_count=rows, column_count=columns, max_iterations=None, seed=seed)
+
+	scale = (rows * columns) / (Game.ROW_COUNT * Game.COLUMN_COUNT)
+	game.STATIC_BLOCK_COUNT = int(Game.STATIC_BLOCK_COUNT * scale)
+	game.SOFT_BLOCK_COUNT = int(Game.SOFT_BLOCK_COUNT * scale)
+	game.ORE_BLOCK_COUNT = int(Game.ORE_BLOCK_COUNT * scale)
+	game.FREE_AMMO_COUNT = int(Game.FREE_AMMO_COUNT * scale)
+
+	for _ in range(n_players):
+		game.add_player(None)
+	game.generate_map()
+
+	return game
+
+
+def run(columns:int, rows:int, n_players:int, ticks:int, seed:int=1) -> Tuple[float, float]:
+	""" Run the benchmark and return time spent generating the map and the number of ticks per second
+	"""
+	start = time.perf_counter()
+	game = make_game(columns, rows, n_players, seed)
+	setup_time = time.perf_counter() - start
+
+	action_rng = random.Random(seed)
+
+	start = time.perf_counter()
+	for _ in range(ticks):
+		for pid in game.players:
+			game.enqueue_action(pid, action_rng.choice(ACTIONS))
+		game.tick(0)
+	elapsed = time.perf_counter() - start
+
+	return setup_time, ticks / elapsed
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Game tick throughput benchmark')
+	parser.add_argument('--ticks', type=int, default=500, help='number of ticks to run per map size')
+	parser.add_argument('--sizes', type=str, default='12x10,50x50,200x200', help='comma-separated list of COLUMNSxROWS map sizes')
+	args = parser.parse_args()
+
+	print(f"{'map':>10} {'players':>8} {'map gen sec':>12} {'ticks/sec':>12}")
+	for size in args.sizes.split(','):
+		columns, rows = (int(v) for v in size.split('x'))
+		n_players = max(4, min(64, (columns * rows) // 600))
+		setup_time, rate = run(columns, rows, n_players, args.ticks)
+		print(f"{size:>10} {n_players:>8} {setup_time:>12.3f} {rate:>12.1f}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+ Agent hot reload benchmark.
+ Watches a generated agent package of --modules modules and saves a submodule the agent uses the way editors do,
+ with several writes per save. Reports reloads per save, modules reloaded, the time a reload takes
+ and the latency from the save until agents are reset, against the time to reload every module of the package.
+
+ Usage: python benchmarks/hot_reload.py [--modules N] [--saves N] [--writes N]
+"""
+
+import argparse
+import importlib
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from coderone.dungeon.agent_driver.module_watcher import ModuleWatcher, ImportGraph
+
+PACKAGE = 'hot_reload_agent'
+
+# Helpers the agent doesn't use in this session, but that make the package large
+HELPER_SOURCE = '''
+TABLE = {{i: i * i for i in range(2000)}}
+
+def helper_{index}(x):
+	return TABLE.get(x, 0)
+'''
+
+
+def _write(path:str, source:str):
+	with open(path, 'w') as f:
+		f.write(source)
+
+
+def make_package(root:str, modules:int):
+	package = os.path.join(root, PACKAGE)
+	os.makedirs(package)
+	helpers = [f'helper_{i}' for i in range(modules)]
+	for i, name in enumerate(helpers):
+		_write(os.path.join(package, f'{name}.py'), HELPER_SOURCE.format(index=i))
+	_write(os.path.join(package, '__init__.py'), ''.join(f'from . import {name}\n' for name in helpers) + 'from .agent import Agent\n')
+	_write(os.path.join(package, 'agent.py'), 'from .policy import decide\n\nclass Agent:\n\tdef next_move(self, game_state, player_state):\n\t\treturn decide()\n')
+	write_policy(root, 0)
+
+
+def write_policy(root:str, version:int):
+	_write(os.path.join(root, PACKAGE, 'policy.py'), f'VERSION = {version}\n\ndef decide():\n\treturn VERSION\n')
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Agent hot reload benchmark')
+	parser.add_argument('--modules', type=int, default=200, help='helper modules in the agent package')
+	parser.add_argument('--saves', type=int, default=5, help='saves of the edited module')
+	parser.add_argument('--writes', type=int, default=3, help='file writes per save')
+	args = parser.parse_args()
+
+	logging.getLogger().setLevel(logging.WARNING)
+	with tempfile.TemporaryDirectory() as root:
+		make_package(root, args.modules)
+		sys.path.insert(0, root)
+		module = importlib.import_module(PACKAGE)
+
+		agents = []
+		watcher = ModuleWatcher()
+		watcher.watch_module(module, lambda m: agents.append(m.Agent()))
+		watcher.start_watching()
+		handler = watcher.handlers[0]
+
+		stats, correct = [], True
+		try:
+			for version in range(1, args.saves + 1):
+				count = handler.reload_count
+				for _ in range(args.writes):
+					write_policy(root, version)
+					time.sleep(0.005)
+				deadline = time.time() + 10
+				while handler.reload_count == count and time.time() < deadline:
+					time.sleep(0.005)
+				time.sleep(2 * handler.debounce) # Reloads that should not happen
+				stats.append((handler.reload_count - count, handler.last_reload))
+				correct = correct and bool(agents) and agents[-1].next_move(None, None) == version
+		finally:
+			watcher.stop_watching()
+
+		graph = ImportGraph(PACKAGE)
+		order = graph.reload_order(set(graph.modules().values()))
+		start = time.time()
+		for name in order:
+			importlib.reload(sys.modules[name])
+		full_ms = (time.time() - start) * 1000
+
+	print(f"{'reloads/save':>13} {'modules':>8} {'reload ms':>10} {'latency ms':>11} {'full reload ms':>15} {'new code':>9}")
+	reloads = sum(r for r, _ in stats) / len(stats)
+	last = [s for _, s in stats if s]
+	print(f"{reloads:>13.1f} {len(last[-1].modules) if last else 0:>8} {sum(s.reload_ms for s in last) / max(1, len(last)):>10.1f} "
+		f"{sum(s.latency_ms for s in last) / max(1, len(last)):>11.1f} {full_ms:>15.1f} {str(correct):>9}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""
+ Long session benchmark.
+ Plays one long match without an iteration limit and reports tick throughput over consecutive windows of ticks
+ together with the number of perishable entities (bombs, fire, ammo and delayed effects) pending at the end of each window.
+ Players are made fire-proof, so the match never ends and ammo keeps accumulating on the map.
+
+ Usage: python benchmarks/long_session.py [--size 50x50] [--players 16] [--ticks N] [--window N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from game_tick import make_game, ACTIONS
+
+
+def pending_timers(game) -> int:
+	return len(game.bomb_list) + len(game.fire_list) + len(game.ammunition_list) + sum(1 for _ in game._effect_timers.pending())
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Long session benchmark')
+	parser.add_argument('--size', type=str, default='50x50', help='map size COLUMNSxROWS')
+	parser.add_argument('--players', type=int, default=16, help='number of players')
+	parser.add_argument('--ticks', type=int, default=20000, help='number of ticks to play')
+	parser.add_argument('--window', type=int, default=2000, help='number of ticks per reported window')
+	parser.add_argument('--seed', type=int, default=1)
+	args = parser.parse_args()
+
+	columns, rows = (int(v) for v in args.size.split('x'))
+	game = make_game(columns, rows, args.players, args.seed)
+	game.FIRE_HIT = 0
+	action_rng = random.Random(args.seed)
+
+	print(f"{'ticks':>8} {'pending':>8} {'ticks/sec':>10}")
+	for window_end in range(args.window, args.ticks + 1, args.window):
+		start = time.perf_counter()
+		for _ in range(args.window):
+			for pid in game.players:
+				game.enqueue_action(pid, action_rng.choice(ACTIONS))
+			game.tick(0)
+		elapsed = time.perf_counter() - start
+
+		print(f"{window_end:>8} {pending_timers(game):>8} {args.window / elapsed:>10.0f}")
+
+
+if __name__ == "__main__":
+	main()
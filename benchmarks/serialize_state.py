@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""
+ GameState serialization benchmark.
+ Measures the average time the game spends producing the agents' view of the world (`Game._serialize_state`)
+ per tick on maps of several sizes.
+
+ Usage: python benchmarks/serialize_state.py [--ticks N] [--sizes 12x10,50x50,200x200]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from game_tick import make_game, ACTIONS
+
+
+def run(columns:int, rows:int, n_players:int, ticks:int, seed:int=1) -> float:
+	""" Run the game and return average time of a state serialization in microseconds
+	"""
+	game = make_game(columns, rows, n_players, seed)
+	action_rng = random.Random(seed)
+
+	elapsed = 0.0
+	for _ in range(ticks):
+		for pid in game.players:
+			game.enqueue_action(pid, action_rng.choice(ACTIONS))
+		game.tick(0)
+
+		# Games without agents don't serialize their state, so it is done here once per tick as the game would
+		start = time.perf_counter()
+		game._serialize_state()
+		elapsed += time.perf_counter() - start
+
+	return elapsed / ticks * 1e6
+
+
+def main():
+	parser = argparse.ArgumentParser(description='GameState serialization benchmark')
+	parser.add_argument('--ticks', type=int, default=60, help='number of ticks to run per map size')
+	parser.add_argument('--sizes', type=str, default='12x10,50x50,200x200', help='comma-separated list of COLUMNSxROWS map sizes')
+	args = parser.parse_args()
+
+	print(f"{'map':>10} {'players':>8} {'usec/state':>12}")
+	for size in args.sizes.split(','):
+		columns, rows = (int(v) for v in size.split('x'))
+		n_players = max(4, min(64, (columns * rows) // 600))
+		usec = run(columns, rows, n_players, args.ticks)
+		print(f"{size:>10} {n_players:>8} {usec:>12.1f}")
+
+
+if __name__ == "__main__":
+	main()
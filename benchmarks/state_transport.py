@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+ Agent IPC benchmark.
+ Plays a game with agents running in separate processes, the way matches are run, and reports the time a tick takes
+ from sending the state to all agents until all of them have answered. Agents read the map and entity positions of
+ every state they get. Game states are either pickled into the agent queues, pickled as deltas against the previous state,
+ or written once into the shared-memory ring.
+
+ Usage: python benchmarks/state_transport.py [--ticks N] [--sizes 12x10,50x50,200x200] [--agents 2,8]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from coderone.dungeon.game import Game
+from coderone.dungeon.agent_driver.multiproc_driver import Driver
+
+AGENT_MODULE = 'state_transport'
+
+
+class Agent:
+	""" Agent that looks at the state like a simple bot would and walks around """
+
+	def next_move(self, game_state, player_state):
+		game_state.is_occupied(player_state.location)
+		game_state.bombs, game_state.ammo, game_state.treasure, game_state.all_blocks, game_state.opponents(player_state.id)
+		return random.choice(['', 'u', 'd', 'l', 'r'])
+
+
+def run(columns:int, rows:int, n_agents:int, ticks:int, shared_state:bool, state_delta:bool=False, seed:int=1) -> float:
+	""" Run a match and return the average time of a tick in milliseconds
+	"""
+	config = {'shared_state': shared_state, 'state_delta': state_delta}
+	with Driver(AGENT_MODULE, config=config) as driver:
+		game = Game(row_count=rows, column_count=columns, seed=seed)
+		scale = (rows * columns) / (Game.ROW_COUNT * Game.COLUMN_COUNT)
+		game.STATIC_BLOCK_COUNT = int(Game.STATIC_BLOCK_COUNT * scale)
+		game.SOFT_BLOCK_COUNT = int(Game.SOFT_BLOCK_COUNT * scale)
+		game.ORE_BLOCK_COUNT = int(Game.ORE_BLOCK_COUNT * scale)
+
+		agents = [driver.agent() for _ in range(n_agents)]
+		for agent in agents:
+			game.add_agent(agent, None)
+		game.generate_map()
+
+		while not all(agent.is_ready for agent in agents):
+			time.sleep(0.01)
+
+		# First tick only sends out the states
+		game.tick(0)
+		start = time.perf_counter()
+		for _ in range(ticks):
+			for agent in agents:
+				agent.wait_move(1.0)
+			game.tick(0)
+		elapsed = time.perf_counter() - start
+
+	return elapsed / ticks * 1e3
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Agent IPC benchmark')
+	parser.add_argument('--ticks', type=int, default=200, help='number of ticks to run')
+	parser.add_argument('--sizes', type=str, default='12x10,50x50,200x200', help='comma-separated list of COLUMNSxROWS map sizes')
+	parser.add_argument('--agents', type=str, default='2,8', help='comma-separated list of numbers of agents')
+	args = parser.parse_args()
+
+	print(f"{'map':>10} {'agents':>8} {'queue ms/tick':>14} {'delta ms/tick':>14} {'shared ms/tick':>15}")
+	for size in args.sizes.split(','):
+		columns, rows = (int(v) for v in size.split('x'))
+		for n_agents in (int(v) for v in args.agents.split(',')):
+			queue_ms = run(columns, rows, n_agents, args.ticks, shared_state=False)
+			delta_ms = run(columns, rows, n_agents, args.ticks, shared_state=True, state_delta=True)
+			shared_ms = run(columns, rows, n_agents, args.ticks, shared_state=True)
+			print(f"{size:>10} {n_agents:>8} {queue_ms:>14.3f} {delta_ms:>14.3f} {shared_ms:>15.3f}")
+
+
+if __name__ == "__main__":
+	main()
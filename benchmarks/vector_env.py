@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""
+ VectorEnv throughput benchmark.
+ Steps a vector of games with random actions and reports the number of env steps per second
+ summed over all games, in-process and with worker processes.
+
+ Usage: python benchmarks/vector_env.py [--envs 1,16,64] [--workers 0,2] [--ticks N] [--players N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from coderone.dungeon.vector_env import VectorEnv
+from coderone.dungeon.batch_game import ACTIONS
+
+
+def run(n_envs:int, n_workers:int, n_players:int, ticks:int, seed:int=1) -> float:
+	action_rng = np.random.default_rng(seed)
+	actions = action_rng.integers(0, len(ACTIONS), size=(ticks, n_envs, n_players))
+
+	with VectorEnv(n_envs, n_players, max_iterations=1800, seed=seed, n_workers=n_workers) as env:
+		env.reset()
+		start = time.perf_counter()
+		for tick in range(ticks):
+			env.step(actions[tick])
+		elapsed = time.perf_counter() - start
+
+	return n_envs * ticks / elapsed
+
+
+def main():
+	parser = argparse.ArgumentParser(description='VectorEnv throughput benchmark')
+	parser.add_argument('--envs', type=str, default='1,16,64', help='comma-separated list of numbers of games')
+	parser.add_argument('--workers', type=str, default=f'0,{os.cpu_count()}', help='comma-separated list of numbers of worker processes, 0 to play in-process')
+	parser.add_argument('--players', type=int, default=2, help='number of players per game')
+	parser.add_argument('--ticks', type=int, default=1000, help='number of ticks to run')
+	args = parser.parse_args()
+
+	print(f"{'envs':>8} {'workers':>8} {'env steps/sec':>16}")
+	for n_envs in (int(v) for v in args.envs.split(',')):
+		for n_workers in (int(v) for v in args.workers.split(',')):
+			rate = run(n_envs, n_workers, args.players, args.ticks)
+			print(f"{n_envs:>8} {n_workers:>8} {rate:>16.1f}")
+
+
+if __name__ == "__main__":
+	main()
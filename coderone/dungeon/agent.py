@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Dict, List, Tuple, Union, NamedTuple, Any, Optional
+from typing import Dict, List, Sequence, Tuple, Union, NamedTuple, Any, Optional
 
 Point = Tuple[int, int]
 PID = int
@@ -18,15 +18,18 @@ class EntityTags(Enum):
 class GameState:
 	""" A state of the game as viewed by an agent.
 	All agent receive the state game state each step to base their decisions on.
+	The state is an immutable snapshot: it may share data with the game and states of other ticks, so it must not be modified.
+	Games created with `observation=True` also provide a dense NumPy observation of the state, see `coderone.dungeon.observation`.
 	"""
 
 	def __init__(self, is_over:bool, tick_number:int, size:Point, 
 				game_map:Dict,
-				ammo:List[Point],
-				treasure:List[Point],
-				bombs:List[Point],
-				blocks:List[Tuple[EntityTags, Point]],
-				players:List[Tuple[PID, Point]],
+				ammo:Sequence[Point],
+				treasure:Sequence[Point],
+				bombs:Sequence[Point],
+				blocks:Sequence[Tuple[EntityTags, Point]],
+				players:Sequence[Tuple[PID, Point]],
+				observation=None,
 				):
 		self.is_over = is_over
 		self.tick_number = tick_number
@@ -37,6 +40,7 @@ class GameState:
 		self._bombs = bombs
 		self._blocks = blocks
 		self._players = players
+		self._observation = observation
 
 
 	@property
@@ -46,15 +50,15 @@ class GameState:
 		return self._size
 
 	@property
-	def ammo(self) -> List[Point]:
+	def ammo(self) -> Sequence[Point]:
 		return self._ammo
 
 	@property
-	def treasure(self) -> List[Point]:
+	def treasure(self) -> Sequence[Point]:
 		return self._treasure
 	
 	@property
-	def bombs(self) -> List[Point]:
+	def bombs(self) -> Sequence[Point]:
 		"""Get a list of bombs placed on the map.
 		"""
 		return self._bombs
@@ -91,6 +95,30 @@ class GameState:
 	def is_occupied(self, location:Point) -> bool:
 		return self.entity_at(location) is not None
 
+	@property
+	def observation(self):
+		"""Get a read-only (channels, columns, rows) NumPy array encoding the state, None if the game doesn't provide it.
+		See `coderone.dungeon.observation` for the channels.
+		"""
+		return self._observation
+
+	def egocentric_observation(self, pid:PID, radius:int=None):
+		"""Get a read-only view of the observation centered on the given player, None if the game doesn't provide observations
+		or the player has no position on the map. Raise ValueError if there is no player with the pid.
+		See `coderone.dungeon.observation` for the channels.
+		"""
+		if self._observation is None:
+			return None
+
+		from .observation import egocentric, EGO_RADIUS
+
+		index, pos = next(((i, pos) for i, (player_pid, pos) in enumerate(self._players) if player_pid == pid), (None, None))
+		if index is None:
+			raise ValueError(f"No player with pid {pid} in the game")
+		if pos is None:
+			return None
+		return egocentric(self._observation, pos, index, EGO_RADIUS if radius is None else radius)
+
 	def opponents(self, excluding_player_pid:PID=None):
 		return [pos for pid, pos in self._players if excluding_player_pid is not None and pid != excluding_player_pid or excluding_player_pid is None]
 
@@ -0,0 +1,26 @@
+"""
+ Agent drivers run agent modules for the game. A driver is selected by name with the `driver` config option:
+	multiproc	each agent in a separate process, default
+	thread		agents in a thread pool of the game process, for agents whose compute releases the GIL
+	inproc		agents called synchronously in the game process, for lightweight bots
+	async		agents with coroutine `next_move` on an event loop in a thread of the game process
+	batch		all agents of a module in one process, answered in batches
+"""
+
+import importlib
+
+DRIVERS = {
+	'multiproc': 'multiproc_driver',
+	'thread': 'thread_driver',
+	'inproc': 'inproc_driver',
+	'async': 'async_driver',
+	'batch': 'batch_driver',
+}
+
+
+def get_driver(name:str):
+	""" Driver class registered under the name. Driver modules are only imported when selected """
+	if name not in DRIVERS:
+		raise ValueError(f"Unknown agent driver '{name}', expected one of: {', '.join(DRIVERS)}")
+
+	return importlib.import_module(f'.{DRIVERS[name]}', __name__).Driver
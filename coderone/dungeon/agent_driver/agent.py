@@ -1,13 +1,112 @@
 import logging
+import time
+from typing import List, Optional, Sequence
+
 from ..agent import Agent as AIAgent, GameState, PlayerState
+from ..game import AgentStat
 
 logger = logging.getLogger(__name__)
 
 
+class AgentAccounting:
+	""" Timing of an agent over a match, times are in seconds.
+	CPU budgets are enforced by drivers: a move that has taken more than `tick_budget` of CPU time is dropped,
+	and once the agent has used `match_budget` of CPU time in total it is out of budget: it gets no more states and plays NO-OP.
+	An agent whose process has breached its resource limits, or has ended, is `disqualified` and plays NO-OP the same way.
+	"""
+
+	def __init__(self, name:str, tick_budget:Optional[float]=None, match_budget:Optional[float]=None):
+		self.name = name
+		self.tick_budget = tick_budget
+		self.match_budget = match_budget
+		self.latencies:List[float] = []
+		self.cpu_time = None
+		self.max_ticks_behind = 0
+		self.skipped_states = 0
+		self.late_moves = 0
+		self.dropped_moves = 0
+		self.over_budget_moves = 0
+		self.peak_rss_mb:Optional[float] = None
+		self.disqualified:Optional[str] = None # Reason the agent has been disqualified for
+
+	@property
+	def out_of_budget(self) -> bool:
+		return self.match_budget is not None and self.cpu_time is not None and self.cpu_time > self.match_budget
+
+	def move(self, tick:int, last_tick:int, latency:float, cpu_time:Optional[float]=None, skipped:int=0, peak_rss_mb:Optional[float]=None) -> bool:
+		""" Account for a move made for the state of `tick`, when `last_tick` is the latest state sent to the agent
+		and it has skipped `skipped` states since its last move. Return False if the move is over the tick budget and has to be dropped
+		"""
+		self.latencies.append(latency)
+		self.skipped_states += skipped
+		self.memory(peak_rss_mb)
+		if tick is not None and last_tick is not None:
+			self.max_ticks_behind = max(self.max_ticks_behind, last_tick - tick)
+
+		if cpu_time is None:
+			return True
+
+		was_in_budget = not self.out_of_budget
+		self.cpu_time = (self.cpu_time or 0) + cpu_time
+		if was_in_budget and self.out_of_budget:
+			logger.info(f"agent '{self.name}' has used up the match CPU budget of {self.match_budget}sec, it plays NO-OP for the rest of the match")
+		if self.tick_budget is not None and cpu_time > self.tick_budget:
+			self.over_budget_moves += 1
+			return False
+		return True
+
+	def memory(self, peak_rss_mb:Optional[float]):
+		""" Account for peak resident memory of the agent process reported by the agent """
+		if peak_rss_mb is not None:
+			self.peak_rss_mb = max(self.peak_rss_mb or 0, peak_rss_mb)
+
+	def disqualify(self, reason:str):
+		if self.disqualified is None:
+			self.disqualified = reason
+			logger.warning(f"agent '{self.name}' is disqualified: {reason}. It plays NO-OP for the rest of the match")
+
+	def _latency_ms(self, latencies:List[float], q:float) -> Optional[float]:
+		if not latencies:
+			return None
+		return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 3)
+
+	def stat(self) -> AgentStat:
+		latencies = sorted(self.latencies)
+		return AgentStat(
+			moves=len(latencies),
+			latency_p50_ms=self._latency_ms(latencies, 0.5),
+			latency_p95_ms=self._latency_ms(latencies, 0.95),
+			latency_p99_ms=self._latency_ms(latencies, 0.99),
+			max_ticks_behind=self.max_ticks_behind,
+			skipped_states=self.skipped_states,
+			late_moves=self.late_moves,
+			dropped_moves=self.dropped_moves,
+			over_budget_moves=self.over_budget_moves,
+			cpu_time=round(self.cpu_time, 6) if self.cpu_time is not None else None,
+			out_of_budget=self.out_of_budget,
+			peak_rss_mb=round(self.peak_rss_mb, 1) if self.peak_rss_mb is not None else None,
+			disqualified=self.disqualified,
+		)
+
+	def restart(self) -> 'AgentAccounting':
+		""" Fresh accounting with the same budgets, for a new game """
+		return AgentAccounting(self.name, self.tick_budget, self.match_budget)
+
+	@staticmethod
+	def from_config(name:str, config) -> 'AgentAccounting':
+		return AgentAccounting(name, config.get('agent_tick_budget'), config.get('agent_match_budget'))
+
+
 class Agent:
+	accounting:Optional[AgentAccounting] = None # Timing of the agent in the current match, if the driver keeps it
+	ready_signal = None # Connection that becomes readable when an agent that is not ready yet may have become ready
 	
 	def next_move(self):
 		pass
+
+	def wait_move(self, timeout:float) -> bool:
+		""" Wait at most `timeout` seconds for the answer to the last update. Agents answering in `next_move` are always ready """
+		return True
 	
 	def update(self, game_state:GameState, player_state:PlayerState):
 		pass 
@@ -15,8 +114,34 @@ class Agent:
 	def on_game_over(self, game_state:GameState, player_state:PlayerState):
 		pass
 
+	def reset(self):
+		""" Start a new game with a fresh instance of the agent """
+		pass
+
+
+def wait_ready(agents:Sequence[Agent], timeout:float, poll_interval:float=0.01) -> List[Agent]:
+	""" Block until all agents are ready, but no longer than `timeout` seconds. Return the agents that are still not ready.
+	The wait wakes up as soon as an agent reports ready through its `ready_signal`. Agents without one are polled every `poll_interval` seconds
+	"""
+	deadline = time.time() + timeout
+	not_ready = [a for a in agents if not a.is_ready]
+	while not_ready and time.time() < deadline:
+		signals = list({id(a.ready_signal): a.ready_signal for a in not_ready if a.ready_signal is not None}.values())
+		wait_time = max(0, deadline - time.time())
+		if any(a.ready_signal is None for a in not_ready):
+			wait_time = min(wait_time, poll_interval)
+		if signals:
+			import multiprocessing.connection
+			multiprocessing.connection.wait(signals, wait_time)
+		else:
+			time.sleep(wait_time)
+		not_ready = [a for a in not_ready if not a.is_ready]
+	return not_ready
+
 
 class AgentProxy(AIAgent):
+	fatal_errors:tuple = () # Errors of the agent passed on to the driver rather than logged, e.g. breaches of the limits of an agent process
+
 	def __init__(self, module):
 		self.agent = None
 		self.reload(module)
@@ -24,6 +149,8 @@ class AgentProxy(AIAgent):
 	def next_move(self, game_state:GameState, player_state:PlayerState):
 		try: 
 			return self.agent.next_move(game_state, player_state) if self.agent else None
+		except self.fatal_errors:
+			raise
 		except Exception as e:
 			# self.agent = None
 			if not self.silinced:
@@ -34,6 +161,8 @@ class AgentProxy(AIAgent):
 	def on_game_over(self, game_state:GameState, player_state:PlayerState):
 		try: 
 			return self.agent.on_game_over(game_state, player_state) if self.agent else None
+		except self.fatal_errors:
+			raise
 		except Exception as e:
 			# self.agent = None
 			if not self.silinced:
@@ -41,8 +170,13 @@ class AgentProxy(AIAgent):
 				logger.error(f"Agent game_over error: {e}", exc_info=True)
 		return None
 
+	def reset(self):
+		""" Replace the agent with a fresh instance for a new game """
+		self.reload(self.module)
+
 	def reload(self, module):
 		logger.debug("Re-loading proxy agent for module '%s'", module.__name__)
+		self.module = module
 		try:
 			self.silinced = False
 			if hasattr(module, 'agent'):
@@ -52,6 +186,8 @@ class AgentProxy(AIAgent):
 			else:
 				self.agent = None
 				logger.warn(f"No agent definition found in module '%'", module.__name__)
+		except self.fatal_errors:
+			raise
 		except Exception as e:
 			self.agent = None
 			logger.error(f"Failed to reload agent: {e}", exc_info=True)
@@ -0,0 +1,199 @@
+import asyncio
+import inspect
+import threading
+import time
+import logging
+
+from ..agent import GameState, PlayerState
+from .agent import Agent, AgentAccounting
+from .simple_driver import Driver as SimpleDriver
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAgent(Agent):
+	""" Game side of an agent with a coroutine `next_move`, run on the event loop shared by all async agents.
+	A call that doesn't return within `move_deadline` seconds of the state update is cancelled and counts as NO-OP.
+	Same as with agent processes, an agent that is slower than the game answers only the latest state it has been sent.
+	Agents with a plain `next_move` are called on the loop too, and hold up the other agents while they think.
+	Calls of agents interleave on the loop, so their CPU time is not measured and CPU budgets don't apply: the move deadline bounds them.
+	Moves the agent was still thinking about when it was reset are dropped, same as with `ThreadAgent`.
+	"""
+	is_ready = True
+	MOVE_DEADLINE_SEC = 0.1
+
+	def __init__(self, agent, loop:asyncio.AbstractEventLoop, name:str, lockstep:bool=False, move_deadline:float=MOVE_DEADLINE_SEC, accounting:AgentAccounting=None):
+		self.agent = agent
+		self.loop = loop
+		self.name = name
+		self.lockstep = lockstep
+		self.move_deadline = move_deadline
+		self.accounting = accounting or AgentAccounting(name)
+		self.generation = 0 # Number of resets the agent has been through
+
+		self.__lock = threading.Lock()
+		self.__answered = threading.Condition(self.__lock)
+		self.__busy = False	# A call of the agent is running on the loop
+		self.__pending = None	# Latest update the agent has not been called with: generation, tick, deadline, game and player state
+		self.__tick = None
+		self.__deadline = 0
+		self.__skipped = 0	# Updates replaced by newer ones before the agent was called with them, since its last move
+		self.__awaiting_move = False
+		self.__move = None	# Last move made by the agent and not played yet: tick, action
+
+	async def __think(self):
+		while True:
+			with self.__lock:
+				update, self.__pending = self.__pending, None
+				if update is None:
+					self.__busy = False
+					return
+			generation, tick, deadline, game_state, player_state = update
+			start_time = time.time()
+			action = await self.__call(tick, deadline, game_state, player_state)
+			with self.__lock:
+				if generation == self.generation:
+					self.__take_move(tick, action, time.time() - start_time)
+				else:
+					logger.debug(f"Agent {self.name}: dropping move for tick {tick} made before the reset")
+
+	async def __call(self, tick:int, deadline:float, game_state:GameState, player_state:PlayerState):
+		try:
+			move = self.agent.next_move(game_state, player_state)
+			if inspect.isawaitable(move):
+				move = await asyncio.wait_for(move, max(0, deadline - time.time()))
+			return move
+		except asyncio.TimeoutError:
+			logger.debug(f"Agent {self.name}: call for tick {tick} cancelled at the deadline")
+		except Exception as e:
+			logger.error(f"Agent update error: {e}", exc_info=True)
+		return None
+
+	def __take_move(self, tick:int, action, latency:float):
+		skipped, self.__skipped = self.__skipped, 0
+		self.accounting.move(tick, self.__tick, latency, skipped=skipped)
+		if not self.lockstep or tick == self.__tick:
+			self.__awaiting_move = False
+			self.__move = (tick, action)
+			self.__answered.notify_all()
+		else:
+			logger.debug(f"Agent {self.name}: dropping move for tick {tick} that has arrived after the deadline")
+			self.accounting.dropped_moves += 1
+
+	def update(self, game_state:GameState, player_state:PlayerState):
+		with self.__lock:
+			self.__tick = game_state.tick_number
+			self.__deadline = time.time() + self.move_deadline
+			self.__awaiting_move = True
+			if self.__pending:
+				self.__skipped += 1
+			self.__pending = (self.generation, self.__tick, self.__deadline, game_state, player_state)
+			if not self.__busy:
+				self.__busy = True
+				asyncio.run_coroutine_threadsafe(self.__think(), self.loop)
+
+	def wait_move(self, timeout:float) -> bool:
+		""" Wait at most `timeout` seconds for the agent to answer the last state update. Return True if it has answered.
+		The wait never goes past the move deadline, when the call is cancelled.
+		"""
+		deadline = min(time.time() + timeout, self.__deadline)
+		with self.__lock:
+			return self.__answered.wait_for(lambda: not self.__awaiting_move, max(0, deadline - time.time()))
+
+	def next_move(self):
+		if self.lockstep and not self.wait_move(max(0, self.__deadline - time.time())):
+			logger.debug(f"Agent {self.name}: no move for tick {self.__tick} before the deadline")
+			with self.__lock:
+				self.__awaiting_move = False
+			self.accounting.late_moves += 1
+
+		with self.__lock:
+			move, self.__move = self.__move, None
+		if not move or (self.lockstep and move[0] != self.__tick):
+			return None
+		return move[1]
+
+	def on_game_over(self, game_state:GameState, player_state:PlayerState):
+		result = self.agent.on_game_over(game_state, player_state)
+		if inspect.isawaitable(result):
+			asyncio.run_coroutine_threadsafe(result, self.loop).add_done_callback(self.__log_game_over_error)
+
+	def __log_game_over_error(self, future):
+		if not future.cancelled() and future.exception() is not None:
+			e = future.exception()
+			logger.error(f"Agent {self.name} game over error: {e}", exc_info=e)
+
+	def reset(self):
+		with self.__lock:
+			self.generation += 1
+			self.__pending = None
+			self.__skipped = 0
+			self.__awaiting_move = False
+			self.__move = None
+			self.accounting = self.accounting.restart()
+		self.agent.reset()
+
+
+async def _cancel_tasks():
+	tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+	for t in tasks:
+		t.cancel()
+	await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class Driver(SimpleDriver):
+	""" Runs agents of a module on an event loop in a thread of the game process. Drivers of all agents share the loop,
+	so agents waiting on I/O, e.g. an inference server, wait concurrently
+	"""
+	JOIN_TIMEOUT_SEC = 5
+
+	_loop = None
+	_loop_thread = None
+	_loop_users = 0
+
+	def __init__(self, name:str, watch: bool = False, config={}):
+		super().__init__(name, watch, config)
+		self.config = config
+		self._agents = []
+		Driver._acquire_loop()
+		self._has_loop = True
+
+	@staticmethod
+	def _acquire_loop():
+		if Driver._loop is None:
+			Driver._loop = asyncio.new_event_loop()
+			Driver._loop_thread = threading.Thread(target=Driver._loop.run_forever, name='agent-event-loop', daemon=True)
+			Driver._loop_thread.start()
+		Driver._loop_users += 1
+
+	@staticmethod
+	def _release_loop():
+		Driver._loop_users -= 1
+		if not Driver._loop_users:
+			loop, thread = Driver._loop, Driver._loop_thread
+			Driver._loop = Driver._loop_thread = None
+			try:
+				asyncio.run_coroutine_threadsafe(_cancel_tasks(), loop).result(Driver.JOIN_TIMEOUT_SEC)
+			except Exception:
+				logger.warn("agent calls have not finished gracefully")
+			loop.call_soon_threadsafe(loop.stop)
+			thread.join(Driver.JOIN_TIMEOUT_SEC)
+			if not thread.is_alive():
+				loop.close()
+
+	def stop(self):
+		for a in self._agents:
+			if a.accounting.late_moves:
+				logger.info(f"agent '{self.name}' has missed the move deadline {a.accounting.late_moves} times")
+		self._agents = []
+		if self._has_loop:
+			self._has_loop = False
+			Driver._release_loop()
+		super().stop()
+
+	def agent(self) -> AsyncAgent:
+		agent = AsyncAgent(super().agent(), Driver._loop, self.name,
+			lockstep=self.config.get('lockstep', False), move_deadline=self.config.get('move_deadline', AsyncAgent.MOVE_DEADLINE_SEC),
+			accounting=AgentAccounting(self.name)) # CPU time is not measured, so budgets of the config don't apply: main warns about them
+		self._agents.append(agent)
+		return agent
@@ -0,0 +1,302 @@
+import collections
+import multiprocessing
+import queue
+import time
+import logging
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from ..agent import GameState, PlayerState
+from .agent import AgentProxy as ModuleAgentProxy
+from .simple_driver import Driver as SimpleDriver
+from .shared_state import SharedStateReader, shared_memory
+from .multiproc_driver import (AgentDisqualified, AgentProxy, AgentReady, AgentReset, Consumer, Driver as MultiprocDriver,
+	_AgentInbox, _match_proxy, _start_consumer)
+from .sandbox import peak_rss_mb
+from .state_delta import DeltaCache
+
+logger = logging.getLogger(__name__)
+
+
+class BatchItem(NamedTuple):
+	""" A seat that has a state to answer, as passed to the `next_moves` hook of an agent """
+	agent: object
+	game_state: GameState
+	player_state: PlayerState
+
+
+class _CachedStateReader:
+	""" Shared ring reader for one batch: seats that have been sent the same state share the one read """
+	def __init__(self, state_reader:SharedStateReader):
+		self.state_reader = state_reader
+		self.states = {}
+
+	def read(self, ref) -> GameState:
+		if ref not in self.states:
+			self.states[ref] = self.state_reader.read(ref)
+		return self.states[ref]
+
+
+class BatchConsumer(Consumer):
+	""" Agent side of the batch driver: one process serves all seats of a module, each seat with its own agent instance.
+	The process answers all seats that have a state pending at once. If the agent class has a `next_moves(batch)` hook,
+	it is called once with a `BatchItem` per seat and returns their moves in order, otherwise `next_move` is called for each seat.
+	Commands and messages of the seats are tagged with the seat number.
+	Resource limits apply to the process as a whole: a breach disqualifies all seats.
+	"""
+	def __init__(self, task_queue, result_queue, ready_channel, module_name:str, watch:bool, config):
+		super().__init__(task_queue, result_queue, ready_channel, module_name, watch, config)
+		self.inboxes:Dict[int, _AgentInbox] = {}
+		self.agents:Dict[int, ModuleAgentProxy] = {}
+
+	def _process_cmd(self, cmd):
+		if not cmd: # Poison pill means shutdown
+			self.inboxes = {}
+			self._stop()
+			return False
+
+		seat, cmd = cmd
+		if cmd is None: # Seat has left
+			self.inboxes.pop(seat, None)
+			self.agents.pop(seat, None)
+		elif seat in self.inboxes:
+			self.inboxes[seat].take(cmd)
+		elif isinstance(cmd, AgentReset): # A new seat gets its agent the same way a reset one gets a fresh instance
+			self.inboxes[seat] = _AgentInbox(f"{self.module_name}[{seat}]")
+			self.inboxes[seat].take(cmd)
+		else:
+			logger.error(f"Command {cmd} for unknown seat {seat}")
+
+		return True
+
+	def _serve(self, driver:SimpleDriver):
+		while self.is_not_done:
+			self._wait_commands()
+
+			for seat, inbox in self.inboxes.items():
+				if inbox.game_over and seat in self.agents:
+					game_over, inbox.game_over = inbox.game_over, None
+					self.agents[seat].on_game_over(game_over.game, game_over.player)
+
+				if inbox.agent_reset:
+					reset, inbox.agent_reset = inbox.agent_reset, None
+					self._reset_limits()
+					if seat in self.agents:
+						self.agents[seat].reset()
+					else:
+						self.agents[seat] = driver.agent()
+					self.ready_channel.send((seat, AgentReady(reset.generation)))
+
+			state_reader = _CachedStateReader(self.state_reader) if any(i.state_ref is not None for i in self.inboxes.values()) else None
+			batch = []
+			for seat, inbox in self.inboxes.items():
+				game_state = inbox.pop_state(state_reader)
+				if game_state:
+					batch.append((seat, BatchItem(self.agents[seat], game_state, inbox.player_state)))
+
+			if batch:
+				self._answer(batch)
+
+	def _disqualify(self, reason:str):
+		logger.warning(f"Agent {self.name}: {reason}")
+		if self.is_not_done:
+			message = AgentDisqualified(reason, peak_rss_mb())
+			for seat in self.inboxes:
+				self.result_queue.put((seat, message))
+			self._stop()
+
+	def _answer(self, batch:List[Tuple[int, BatchItem]]):
+		agents = [item.agent.agent for _, item in batch]
+		next_moves = getattr(agents[0], 'next_moves', None) if all(a is not None for a in agents) else None
+		if next_moves is None:
+			for seat, item in batch:
+				start_time, start_cpu = time.time(), time.process_time()
+				action = item.agent.next_move(item.game_state, item.player_state)
+				self.result_queue.put((seat, self.inboxes[seat].answer(action, time.time() - start_time, time.process_time() - start_cpu)))
+			return
+
+		start_time, start_cpu = time.time(), time.process_time()
+		try:
+			actions = list(next_moves([BatchItem(a, item.game_state, item.player_state) for a, (_, item) in zip(agents, batch)]))
+			if len(actions) != len(batch):
+				raise ValueError(f"{len(actions)} moves for a batch of {len(batch)}")
+		except ModuleAgentProxy.fatal_errors:
+			raise
+		except Exception as e:
+			logger.error(f"Agent batch update error: {e}", exc_info=True)
+			actions = [None] * len(batch)
+
+		# Seats share the time of the batch: each is accounted for the whole wait and an equal part of the CPU time
+		latency, cpu_time = time.time() - start_time, (time.process_time() - start_cpu) / len(batch)
+		for (seat, _), action in zip(batch, actions):
+			self.result_queue.put((seat, self.inboxes[seat].answer(action, latency, cpu_time)))
+
+
+class _ZygoteBatchConsumer(BatchConsumer):
+	""" Batch consumer forked from the zygote """
+
+	@staticmethod
+	def _Popen(process_obj):
+		return multiprocessing.get_context('forkserver').Process._Popen(process_obj)
+
+
+class _SeatTasks:
+	""" Task queue of a seat: commands are tagged with the seat and put into the queue of the server process """
+	def __init__(self, task_queue, seat:int):
+		self.task_queue = task_queue
+		self.seat = seat
+
+	def put(self, cmd, block:bool=True, timeout:Optional[float]=None):
+		self.task_queue.put((self.seat, cmd), block, timeout)
+
+	def put_nowait(self, cmd):
+		self.task_queue.put_nowait((self.seat, cmd))
+
+
+class _SeatResults:
+	""" Result queue of a seat: messages of the server process, sorted by seat """
+	def __init__(self, server:'_BatchServer', seat:int):
+		self.server = server
+		self.seat = seat
+
+	def empty(self) -> bool:
+		return self.server.empty(self.seat)
+
+	def get(self, block:bool=True, timeout:Optional[float]=None):
+		return self.server.get(self.seat, timeout if block else 0)
+
+	def get_nowait(self):
+		return self.get(False)
+
+
+class _SeatReady:
+	""" Ready channel of a seat: ready reports of the server process, sorted by seat """
+	def __init__(self, server:'_BatchServer', seat:int):
+		self.server = server
+		self.seat = seat
+		self.ready_signal = server.process.ready_reader
+
+	def poll(self) -> bool:
+		return self.server.poll_ready(self.seat)
+
+	def recv(self) -> AgentReady:
+		return self.server.ready[self.seat].popleft()
+
+
+class _BatchServer:
+	""" Game side of the process serving all seats of a module """
+
+	def __init__(self, name:str, watch:bool, config):
+		self.name = name
+		self.users = 0 # Drivers using the server
+		self.process = _start_consumer(name, watch, config, BatchConsumer, _ZygoteBatchConsumer)
+		self._inboxes:Dict[int, collections.deque] = {}
+		self.ready:Dict[int, collections.deque] = {}
+
+	def join(self) -> Tuple[_SeatTasks, _SeatResults, _SeatReady]:
+		""" Queues of a new seat. The seat is ready once its agent has been made """
+		seat = len(self._inboxes)
+		self._inboxes[seat] = collections.deque()
+		self.ready[seat] = collections.deque()
+		tasks = _SeatTasks(self.process.task_queue, seat)
+		tasks.put(AgentReset(0))
+		return tasks, _SeatResults(self, seat), _SeatReady(self, seat)
+
+	def poll_ready(self, seat:int) -> bool:
+		""" Whether the seat has a ready report to receive. Reports for other seats received meanwhile are kept for them """
+		ready_reader = self.process.ready_reader
+		while ready_reader.poll():
+			ready_seat, message = ready_reader.recv()
+			self.ready[ready_seat].append(message)
+		return bool(self.ready[seat])
+
+	def _receive(self, timeout:Optional[float]):
+		seat, message = self.process.result_queue.get(timeout=timeout)
+		self._inboxes[seat].append(message)
+
+	def empty(self, seat:int) -> bool:
+		try:
+			while True:
+				self._receive(0)
+		except queue.Empty:
+			pass
+		return not self._inboxes[seat]
+
+	def get(self, seat:int, timeout:Optional[float]=None):
+		""" Next message for the seat. Messages for other seats received meanwhile are kept for them """
+		inbox = self._inboxes[seat]
+		deadline = time.time() + timeout if timeout is not None else None
+		while not inbox:
+			self._receive(max(0, deadline - time.time()) if deadline is not None else None)
+		return inbox.popleft()
+
+	def stop(self, timeout:float):
+		if self.process.is_alive():
+			self.process.task_queue.put(None)
+			self.process.join(timeout)
+		if self.process.is_alive():
+			logger.warn(f"process for agent '{self.name}' has not finished gracefully. Terminating")
+			self.process.terminate()
+			self.process.join()
+		self.process.close()
+		self.process.close_ready_pipe()
+
+
+class Driver:
+	""" Runs all agents of a module in one process, so they share the module, e.g. a loaded model, and can be answered in batches.
+	Drivers of the same module share the process, it stops when the last of them stops
+	"""
+
+	JOIN_TIMEOUT_SEC = 5
+
+	_servers:Dict[Tuple[str, bool], _BatchServer] = {}
+
+	def __init__(self, name:str, watch: bool = False, config={}, delta_cache:DeltaCache=None):
+		self.name = name
+		self.watch = watch
+		self.config = config
+		self.delta_cache = delta_cache or DeltaCache()
+		self._proxies = []
+		self._server = None
+
+		self.shared_state = config.get('shared_state', True) and shared_memory is not None
+		if self.shared_state:
+			MultiprocDriver._acquire_state_ring()
+
+	def stop(self):
+		for p in self._proxies:
+			if p.accounting.late_moves:
+				logger.info(f"agent '{self.name}' has missed the move deadline {p.accounting.late_moves} times")
+			p.stop()
+		self._proxies = []
+
+		if self._server:
+			server, self._server = self._server, None
+			server.users -= 1
+			if not server.users:
+				del Driver._servers[(self.name, self.watch)]
+				server.stop(self.JOIN_TIMEOUT_SEC)
+
+		if self.shared_state:
+			self.shared_state = False
+			MultiprocDriver._release_state_ring()
+
+	def agent(self) -> AgentProxy:
+		if self._server is None:
+			key = (self.name, self.watch)
+			if key not in Driver._servers:
+				Driver._servers[key] = _BatchServer(self.name, self.watch, self.config)
+			self._server = Driver._servers[key]
+			self._server.users += 1
+
+		task_queue, result_queue, ready_channel = self._server.join()
+		proxy = _match_proxy(task_queue, result_queue, ready_channel, self.name, self.config, process=self._server.process,
+			delta_cache=self.delta_cache)
+		self._proxies.append(proxy)
+		return proxy
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.stop()
@@ -0,0 +1,56 @@
+import logging
+import time
+
+from ..agent import GameState, PlayerState
+from .agent import Agent, AgentAccounting
+from .simple_driver import Driver as SimpleDriver
+
+logger = logging.getLogger(__name__)
+
+
+class InProcAgent(Agent):
+	""" Game side of an agent running in the game process. The agent moves as soon as it gets a state update,
+	so it never misses a tick, but the game waits for it. Exceptions raised by the agent are logged and count as NO-OP.
+	CPU budgets in `accounting` are enforced the same as for agent processes: moves over the tick budget are dropped,
+	and the agent is not called once it has used up the match budget.
+	"""
+	is_ready = True
+
+	def __init__(self, agent, name:str, accounting:AgentAccounting=None):
+		self.agent = agent
+		self.name = name
+		self.accounting = accounting or AgentAccounting(name)
+		self.__move = None
+
+	def update(self, game_state:GameState, player_state:PlayerState):
+		self.__move = None
+		if self.accounting.out_of_budget:
+			return
+
+		start_time, start_cpu = time.time(), time.thread_time()
+		move = self.agent.next_move(game_state, player_state)
+		if self.accounting.move(game_state.tick_number, game_state.tick_number, time.time() - start_time, time.thread_time() - start_cpu):
+			self.__move = move
+
+	def next_move(self):
+		move, self.__move = self.__move, None
+		return move
+
+	def on_game_over(self, game_state:GameState, player_state:PlayerState):
+		self.agent.on_game_over(game_state, player_state)
+
+	def reset(self):
+		self.__move = None
+		self.accounting = self.accounting.restart()
+		self.agent.reset()
+
+
+class Driver(SimpleDriver):
+	""" Runs agents of a module synchronously in the game process """
+
+	def __init__(self, name:str, watch: bool = False, config={}):
+		super().__init__(name, watch, config)
+		self.config = config
+
+	def agent(self) -> InProcAgent:
+		return InProcAgent(super().agent(), self.name, AgentAccounting.from_config(self.name, self.config))
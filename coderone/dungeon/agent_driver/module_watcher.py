@@ -1,48 +1,192 @@
+import ast
 import logging
 import importlib
-from importlib.util import find_spec
+import threading
+import time
+from importlib.util import find_spec, resolve_name
 import os, sys
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
 
 
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-from watchdog.events import RegexMatchingEventHandler
 
 logger = logging.getLogger(__name__)
 # logger.setLevel(logging.DEBUG)
 
+
+class ReloadStat(NamedTuple):
+	""" A reload of changed modules of an agent, times are in ms """
+	modules: Tuple[str, ...]	# Modules reloaded, in the order they have been reloaded
+	reload_ms: float	# Time it took to reload the modules and reset agents
+	latency_ms: float	# Time from the first file change until agents have been reset, including the debounce delay
+
+
+class ImportGraph:
+	""" Imports between modules of a package, parsed from their source. Sources are only parsed again once they have changed """
+
+	def __init__(self, package:str):
+		self.package = package
+		self._imports:Dict[str, Tuple[Tuple[str, int], Set[str]]] = {}	# Module: (file, mtime) of the source parsed, modules it imports
+
+	def modules(self) -> Dict[str, str]:
+		""" Loaded modules of the package and their source files """
+		return {
+			name: os.path.realpath(module.__file__)
+			for name, module in list(sys.modules.items())
+			if (name == self.package or name.startswith(self.package + '.')) and getattr(module, '__file__', None)
+		}
+
+	def _parse(self, name:str, file_name:str) -> Set[str]:
+		is_package = os.path.splitext(os.path.basename(file_name))[0] == '__init__'
+		parent = name if is_package else name.rpartition('.')[0]
+		with open(file_name, 'rb') as f:
+			tree = ast.parse(f.read(), file_name)
+
+		imported = set()
+		for node in ast.walk(tree):
+			if isinstance(node, ast.Import):
+				imported.update(alias.name for alias in node.names)
+			elif isinstance(node, ast.ImportFrom):
+				try:
+					base = resolve_name('.' * node.level + (node.module or ''), parent) if node.level else node.module
+				except (ImportError, ValueError):
+					continue
+				imported.add(base)
+				imported.update(f"{base}.{alias.name}" for alias in node.names)
+
+		# Importing a submodule imports its parent packages too
+		return {'.'.join(parts[:i]) for parts in (m.split('.') for m in imported) for i in range(1, len(parts) + 1)}
+
+	def imports(self, name:str, file_name:str) -> Set[str]:
+		""" Modules the module imports, of any package """
+		try:
+			key = (file_name, os.stat(file_name).st_mtime_ns)
+			if self._imports.get(name, (None,))[0] != key:
+				self._imports[name] = (key, self._parse(name, file_name))
+			return self._imports[name][1]
+		except (OSError, SyntaxError, ValueError):
+			# The module is reloaded anyway if it has changed, and its reload reports the error
+			return set()
+
+	def reload_order(self, changed_files:Set[str]) -> List[str]:
+		""" Modules to reload when the files have changed: modules of the files and the modules that import them, directly or not.
+		A module comes after all the modules it imports
+		"""
+		modules = self.modules()
+		deps = {name: self.imports(name, file_name) & modules.keys() for name, file_name in modules.items()}
+
+		importers:Dict[str, Set[str]] = {}
+		for name, imported in deps.items():
+			for dep in imported:
+				importers.setdefault(dep, set()).add(name)
+
+		stale = {name for name, file_name in modules.items() if file_name in changed_files}
+		pending = list(stale)
+		while pending:
+			for importer in importers.get(pending.pop(), ()):
+				if importer not in stale:
+					stale.add(importer)
+					pending.append(importer)
+
+		order, visited = [], set()
+		def visit(name:str):
+			if name in visited:
+				return
+			visited.add(name)	# Marked before its imports: an import cycle is broken where it is entered
+			for dep in sorted(deps[name] & stale):
+				visit(dep)
+			order.append(name)
+
+		for name in sorted(stale):
+			visit(name)
+		return order
+
+
 class FileEventHandler(FileSystemEventHandler):
-# class FileEventHandler(RegexMatchingEventHandler):
-	PY_REGEX = [r".*\.py$"]
+	""" Reloads modules of an agent when their source files change.
+	Changes are debounced: a reload starts once no file has changed for `debounce` seconds, so an editor saving a file
+	in several steps triggers one reload. Only modules of the changed files and the modules importing them are reloaded.
+	"""
+	DEBOUNCE_SEC = 0.2
 
-	def __init__(self, module, callback):
-		# super().__init__(self.PY_REGEX)
+	def __init__(self, module, callback, debounce:float=DEBOUNCE_SEC):
 		self.module = module
 		self.callback = callback
+		self.debounce = debounce
+		self.graph = ImportGraph(module.__name__)
+		self.last_reload:Optional[ReloadStat] = None
+		self.reload_count = 0
+
+		self.__lock = threading.Lock()
+		self.__changed:Set[str] = set()
+		self.__first_change = None
+		self.__timer = None
+
+	def _on_change(self, path:str):
+		if not path.endswith('.py'):
+			return
+
+		with self.__lock:
+			self.__changed.add(os.path.realpath(path))
+			if self.__timer:
+				self.__timer.cancel()
+			else:
+				self.__first_change = time.time()
+			self.__timer = threading.Timer(self.debounce, self.__reload)
+			self.__timer.daemon = True
+			self.__timer.start()
 
 	def on_modified(self, event):
 		"A file of interest has changed"
 		logger.debug(f"Changes {event.event_type}: {event.src_path}")
-		# if event.path not in self.mod_map: # Is it a file I know about?
-		# 	return
-		if event.src_path.endswith('.py'):
-			self.__reload(event)
-
-	def __reload(self, event):
-		# # Find out which module is using that file
-		module_name = self.module.__name__ #self.mod_map[event.path]
-		
-		# Try to reload the module
+		if not event.is_directory:
+			self._on_change(event.src_path)
+
+	def on_created(self, event):
+		if not event.is_directory:
+			self._on_change(event.src_path)
+
+	def on_moved(self, event):
+		# Editors often save by writing a temporary file and moving it over the source
+		if not event.is_directory:
+			self._on_change(event.dest_path)
+
+	def cancel(self):
+		""" Drop a pending reload """
+		with self.__lock:
+			if self.__timer:
+				self.__timer.cancel()
+			self.__timer = None
+			self.__changed = set()
+
+	def __reload(self):
+		with self.__lock:
+			changed, self.__changed = self.__changed, set()
+			first_change, self.__timer = self.__first_change, None
+
+		start = time.time()
+		module_name = self.module.__name__
+		order = self.graph.reload_order(changed)
+		if not order:
+			logger.debug(f"no modules of '{module_name}' use the changed files")
+			return
+
+		# Try to reload the modules
 		try:
-			logger.info(f"re-loading module: '{module_name}'")
-			new_module = importlib.reload(self.module)
+			logger.info(f"re-loading modules: {order}")
+			for name in order:
+				importlib.reload(sys.modules[name])
 			if self.callback:
 				logger.debug("re-setting agents")
-				self.callback(new_module)
+				self.callback(sys.modules[module_name])
 
-			logger.info(f"module '{module_name}' reloaded")
+			end = time.time()
+			self.last_reload = ReloadStat(tuple(order), round((end - start) * 1000, 3), round((end - first_change) * 1000, 3))
+			self.reload_count += 1
+			logger.info(f"module '{module_name}' reloaded: {len(order)} modules in {self.last_reload.reload_ms:.1f}ms")
 		except Exception as e:
-			logger.warning(f"Failed to re-load module: '{self.module}'")
+			logger.warning(f"Failed to re-load module: '{module_name}'")
 			logger.error(e, exc_info=True)
 
 
@@ -50,7 +194,9 @@ class ModuleWatcher():
 	""" Automatically reload any modules or packages as they change
 	"""
 
-	def __init__(self):
+	def __init__(self, debounce:float=FileEventHandler.DEBOUNCE_SEC):
+		self.debounce = debounce
+		self.handlers:List[FileEventHandler] = []	# A handler per watched module, with the timing of its last reload
 		self.__event_observer = Observer()
 
 	def _watch_file(self, module, callback, file_name:str, search_locations):
@@ -63,12 +209,14 @@ class ModuleWatcher():
 
 		logger.debug(f"watching for {file_name} changes, recursive={recursive}")
 
+		handler = FileEventHandler(module, callback, self.debounce)
+		self.handlers.append(handler)
 		self.__event_observer.schedule(
-			FileEventHandler(module, callback),
+			handler,
 			file_name,
 			recursive=recursive
 		)
-		
+
 	def watch_module(self, module, callback):
 		"Load module spec, determine which files it uses, and watch them"
 		logger.info(f"setting up module watcher for '{module}'")
@@ -94,3 +242,5 @@ class ModuleWatcher():
 		logger.debug("stopping file watcher")
 		self.__event_observer.stop()
 		self.__event_observer.join()
+		for handler in self.handlers:
+			handler.cancel()
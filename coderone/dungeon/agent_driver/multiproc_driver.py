@@ -1,20 +1,39 @@
+import errno
 import multiprocessing
+import multiprocessing.connection
+import os
+import queue
+import signal
 import time
 import logging
 
-from ..agent import Agent as AIAgent, GameState, PlayerState
-from .agent import Agent
+from typing import Dict, List, Tuple
+
+from ..agent import GameState, PlayerState
+from .agent import Agent, AgentAccounting, AgentProxy as ModuleAgentProxy
+from .sandbox import ResourceLimitExceeded, apply_limits, arm_cpu_limit, peak_rss_mb, release_memory_headroom
 from .simple_driver import Driver as SimpleDriver
+from .shared_state import SharedStateRing, SharedStateReader, StaleStateError, shared_memory
+from .state_delta import DeltaCache, StateDelta, apply_delta
 
 
 logger = logging.getLogger(__name__)
 # logger.setLevel(logging.DEBUG)
 
+# Modules the zygote imports before forking agent processes, in addition to the ones given by `zygote_preload` config
+ZYGOTE_PRELOAD = ['coderone.dungeon.agent_driver.multiproc_driver', 'coderone.dungeon.game']
+
 
 class StateUpdate:
-	def __init__(self, game=None, player=None):
+	""" State of the game for the agent to make a move. The game state is either sent as is, as a `delta` against the previous state sent,
+	or written into a shared ring referenced by `state_ref`
+	"""
+	def __init__(self, game=None, player=None, tick:int=None, state_ref=None, delta:StateDelta=None):
 		self.game = game
 		self.player = player
+		self.tick = tick
+		self.state_ref = state_ref
+		self.delta = delta
 
 class GameOver:
 	def __init__(self, game=None, player=None):
@@ -22,141 +41,487 @@ class GameOver:
 		self.player = player
 
 class AgentReady:
-	pass
+	""" Agent is ready to play. `generation` tells which reset of the agent it has completed.
+	Agents report ready through a pipe of their own rather than the queue of moves, so the game can wait on it
+	"""
+	def __init__(self, generation:int=0):
+		self.generation = generation
+
+class AgentReset:
+	""" Replace the agent with a fresh instance for a new game and report ready for the given generation """
+	def __init__(self, generation:int):
+		self.generation = generation
+
+class AgentMove:
+	""" Agent's answer to the state update of the given tick, with the wall and CPU time it took and the number of states skipped since the last move.
+	`generation` tells which reset of the agent has made the move, `peak_rss_mb` is the peak resident memory of the agent process so far
+	"""
+	def __init__(self, tick:int=None, action=None, latency:float=0, cpu_time:float=None, skipped:int=0, generation:int=0, peak_rss_mb:float=None):
+		self.tick = tick
+		self.action = action
+		self.latency = latency
+		self.cpu_time = cpu_time
+		self.skipped = skipped
+		self.generation = generation
+		self.peak_rss_mb = peak_rss_mb
+
+class AgentDisqualified:
+	""" Agent has breached a resource limit of its process and the process has stopped """
+	def __init__(self, reason:str, peak_rss_mb:float=None):
+		self.reason = reason
+		self.peak_rss_mb = peak_rss_mb
 
 class AgentProxy(Agent):
+	""" Game side of an agent running in a separate process.
+	By default the proxy plays whichever move the agent has sent last.
+	In lockstep mode each state update is tagged with the game tick and the proxy waits, no longer than `move_deadline` seconds
+	after the update was sent, for the move answering that exact tick. Moves that miss the deadline count as NO-OP and are dropped when they arrive.
+	After a reset the proxy is not ready until the agent reports ready for its new generation, through `ready_channel`. Moves made before the reset are dropped.
+	With `state_delta` states sent through the queue, rather than the shared ring, are deltas against the previous one after the first,
+	taken from `delta_cache` when another proxy of the match has already made the same delta.
+	Timing of the agent is kept in `accounting`. The proxy waits for a move no longer than the tick CPU budget, drops moves over it,
+	and stops sending states to an agent that has used up the match CPU budget.
+	An agent that reports a breach of its resource limits, or whose `process` has ended, is disqualified: it gets no more states and plays NO-OP.
+	"""
 	MAX_READY_SPAM = 3
+	MOVE_DEADLINE_SEC = 0.1
 
-	def __init__(self, task_queue, result_queue, name:str):
+	def __init__(self, task_queue, result_queue, ready_channel, name:str, lockstep:bool=False, move_deadline:float=MOVE_DEADLINE_SEC, state_ring:SharedStateRing=None,
+			generation:int=0, ready:bool=False, accounting:AgentAccounting=None, state_delta:bool=False, process:multiprocessing.Process=None,
+			delta_cache:DeltaCache=None):
 		logger.debug("Creating multiproc agent proxy for %s", name)
 		self.name = name
 		self.task_queue = task_queue
 		self.result_queue = result_queue
+		self.ready_channel = ready_channel
+		self.ready_signal = getattr(ready_channel, 'ready_signal', ready_channel)
+		self.process = process # Agent process, to find out that it has ended
+		self.state_ring = state_ring
+		self.state_delta = state_delta
+		self.delta_cache = delta_cache or DeltaCache()
 		self.silenced = False
-
-		self.__is_ready = False
+		self.lockstep = lockstep
+		self.move_deadline = move_deadline
+		self.accounting = accounting or AgentAccounting(name)
+		self.generation = generation # Number of resets the agent has been through
+
+		self.__is_ready = ready
+		self.__tick = None
+		self.__deadline = 0
+		self.__budget_deadline = 0 # No point waiting for a move past the tick budget
+		self.__sent_state = None # Last state sent through the queue that the next delta is based on
+		self.__awaiting_move = False
+		self.__has_move = False
 		self.__last_move = None
 
+	def __take_message(self, agent_message:AgentMove):
+		""" Keep a move received from the agent """
+		if isinstance(agent_message, AgentDisqualified):
+			self.accounting.memory(agent_message.peak_rss_mb)
+			self.__disqualify(agent_message.reason)
+		elif agent_message.generation != self.generation:
+			logger.debug(f"Agent {self.name}: dropping move for tick {agent_message.tick} made before the reset")
+		elif not self.accounting.move(agent_message.tick, self.__tick, agent_message.latency, agent_message.cpu_time, agent_message.skipped, agent_message.peak_rss_mb):
+			logger.debug(f"Agent {self.name}: dropping move for tick {agent_message.tick} that is over the tick CPU budget")
+			if agent_message.tick == self.__tick:
+				self.__awaiting_move = False
+		elif not self.lockstep or agent_message.tick == self.__tick:
+			self.__awaiting_move = False
+			self.__has_move = True
+			self.__last_move = agent_message.action
+		else:
+			logger.debug(f"Agent {self.name}: dropping move for tick {agent_message.tick} that has arrived after the deadline")
+			self.accounting.dropped_moves += 1
+
+	def __disqualify(self, reason:str):
+		self.accounting.disqualify(reason)
+		self.__awaiting_move = self.__has_move = False
+
+	def __check_process(self) -> bool:
+		""" Disqualify the agent if its process has ended. Return True if the agent is disqualified """
+		if self.accounting.disqualified is None and self.process is not None and multiprocessing.connection.wait([self.process.sentinel], 0):
+			# The agent reports the limit it has breached before its process ends
+			while self.accounting.disqualified is None and not self.result_queue.empty():
+				self.__take_message(self.result_queue.get_nowait())
+			if self.accounting.disqualified is None:
+				exitcode = self.process.exitcode
+				self.__disqualify(f"agent process has been killed by {signal.Signals(-exitcode).name}" if exitcode and exitcode < 0
+					else f"agent process has exited with code {exitcode}")
+		return self.accounting.disqualified is not None
+
 	@property
 	def is_ready(self):
-		if not self.__is_ready:
-			# Pick a message:
-			agent_message = self.result_queue.get_nowait() if not self.result_queue.empty() else None
-			if isinstance(agent_message, AgentReady):
-				self.__is_ready = True
-			else:
-				self.__last_move = agent_message
+		while not self.__is_ready and self.ready_channel.poll():
+			self.__is_ready = self.ready_channel.recv().generation == self.generation
 
 		return self.__is_ready
 
-		
-	
 	def stop(self):
 		# Put a poison pill to signal the stop to the agent driver
 		self.task_queue.put(None)
 
+	def reset(self):
+		self.generation += 1
+		self.__is_ready = False
+		self.__awaiting_move = False
+		self.__has_move = False
+		self.accounting = self.accounting.restart()
+		self.__sent_state = None
+		self.task_queue.put_nowait(AgentReset(self.generation))
+
+	def wait_move(self, timeout:float) -> bool:
+		""" Wait at most `timeout` seconds for the agent to answer the last state update. Return True if it has answered.
+		In lockstep mode the wait never goes past the move deadline, and it never goes past the tick budget.
+		"""
+		deadline = min(time.time() + timeout, self.__budget_deadline)
+		if self.lockstep:
+			deadline = min(deadline, self.__deadline)
+		while self.__awaiting_move and not self.__has_move:
+			try:
+				self.__take_message(self.result_queue.get(timeout=max(0, deadline - time.time())))
+			except queue.Empty:
+				return self.__check_process()
+
+		return True
+
 	def next_move(self):
-		for _ in range(self.MAX_READY_SPAM):  # Give agent at most MAX_READY_SPAM attempts to report ready_state and start moving
-			agent_message = self.result_queue.get_nowait() if not self.result_queue.empty() else None
-			if isinstance(agent_message, AgentReady):
-				self.__is_ready = True
-				continue
-			
-			return agent_message
-			
-		return None
+		if self.lockstep:
+			if not self.wait_move(max(0, self.__deadline - time.time())):
+				logger.debug(f"Agent {self.name}: no move for tick {self.__tick} before the deadline")
+				self.__awaiting_move = False
+				self.accounting.late_moves += 1
+		else:
+			for _ in range(self.MAX_READY_SPAM):  # Take at most MAX_READY_SPAM moves queued since the last tick
+				if self.__has_move or self.result_queue.empty():
+					break
+				self.__take_message(self.result_queue.get_nowait())
+
+		if not self.__has_move:
+			return None
+
+		self.__has_move = False
+		return self.__last_move
 	
 	def update(self, game_state:GameState, player_state:PlayerState):
-		self.task_queue.put_nowait(StateUpdate(game=game_state, player=player_state))
+		self.__tick = game_state.tick_number
+		if self.accounting.out_of_budget or self.__check_process():
+			self.__awaiting_move = self.__has_move = False
+			return
+
+		now = time.time()
+		self.__deadline = now + self.move_deadline
+		self.__budget_deadline = now + self.accounting.tick_budget if self.accounting.tick_budget is not None else float('inf')
+		self.__awaiting_move = True
+		self.__has_move = False
+		state_ref = self.state_ring.write(game_state) if self.state_ring else None
+		if state_ref is not None:
+			self.__sent_state = None
+			self.task_queue.put_nowait(StateUpdate(player=player_state, tick=self.__tick, state_ref=state_ref))
+		elif self.__sent_state is not None:
+			delta = self.delta_cache.delta(self.__sent_state, game_state)
+			self.__sent_state = game_state
+			self.task_queue.put_nowait(StateUpdate(player=player_state, tick=self.__tick, delta=delta))
+		else:
+			self.__sent_state = game_state if self.state_delta else None
+			self.task_queue.put_nowait(StateUpdate(game=game_state, player=player_state, tick=self.__tick))
 
 	def on_game_over(self, game_state:GameState, player_state:PlayerState):
 		self.task_queue.put_nowait(GameOver(game=game_state, player=player_state))
 
 
+class _AgentInbox:
+	""" Commands the game has sent to an agent that it has not acted on yet.
+	When agent is slower than the game, states queued while it was thinking are skipped and it answers only the latest one.
+	"""
+	def __init__(self, name:str):
+		self.name = name
+		self.game_state = None
+		self.state_ref = None
+		self.player_state = None
+		self.tick = None
+		self.game_over = None
+		self.agent_reset = None
+		self.skipped = 0 # States skipped since the last move
+		self.base_state = None # Last state received through the queue, deltas are applied to it
+		self.generation = 0 # Reset the agent's moves are made by
+
+	def take(self, cmd):
+		if isinstance(cmd, StateUpdate):
+			if self.game_state is not None or self.state_ref is not None:
+				self.skipped += 1
+			self.game_state = cmd.game
+			self.state_ref = cmd.state_ref
+			if cmd.delta is not None:
+				# Every delta is applied, even to states that are skipped, to keep up with the game
+				self.game_state = self._apply_delta(cmd.delta)
+			elif cmd.game is not None:
+				self.base_state = cmd.game
+			self.player_state = cmd.player
+			self.tick = cmd.tick
+		elif isinstance(cmd, GameOver):
+			# No moves are expected for the states of a game that is over
+			self.game_state = None
+			self.state_ref = None
+			self.game_over = cmd
+		elif isinstance(cmd, AgentReset):
+			# States queued before the reset belong to the previous game
+			self.game_state = None
+			self.state_ref = None
+			self.base_state = None
+			self.agent_reset = cmd
+			self.generation = cmd.generation
+		else:
+			logger.error(f"Unexpected command {cmd}")
+
+	def clear(self):
+		self.game_state = None
+		self.state_ref = None
+		self.game_over = None
+		self.agent_reset = None
+
+	def _apply_delta(self, delta:StateDelta) -> GameState:
+		if self.base_state is None or self.base_state.tick_number != delta.base_tick:
+			logger.error(f"Agent {self.name}: dropping state delta of tick {delta.tick_number}: no state of tick {delta.base_tick} to apply it to")
+			return None
+		self.base_state = apply_delta(self.base_state, delta)
+		return self.base_state
+
+	def pop_state(self, state_reader:SharedStateReader=None) -> GameState:
+		""" Take the latest state to answer, None if there is none. States in the shared ring are read with `state_reader`,
+		None if they have already been overwritten by newer states
+		"""
+		game_state, state_ref = self.game_state, self.state_ref
+		self.game_state = self.state_ref = None
+		if state_ref is not None:
+			try:
+				game_state = state_reader.read(state_ref)
+			except StaleStateError:
+				logger.debug(f"Agent {self.name}: skipping state of tick {self.tick} overwritten in the shared ring")
+				self.skipped += 1
+				return None
+
+		return game_state if self.player_state else None
+
+	def answer(self, action, latency:float, cpu_time:float) -> AgentMove:
+		""" Move answering the last state taken """
+		skipped, self.skipped = self.skipped, 0
+		return AgentMove(tick=self.tick, action=action, latency=latency, cpu_time=cpu_time, skipped=skipped, generation=self.generation,
+			peak_rss_mb=peak_rss_mb())
+
+
 class Consumer(multiprocessing.Process):
-	def __init__(self, task_queue, result_queue, module_name:str, watch:bool, config):
+	""" Agent side of the multiproc driver. The process sleeps until the game sends a command.
+	Resource limits of the config are applied when the process starts, see `sandbox`. On a breach the process reports it and stops
+	"""
+	def __init__(self, task_queue, result_queue, ready_channel, module_name:str, watch:bool, config):
 		multiprocessing.Process.__init__(self, daemon=True)
 		self.task_queue = task_queue
 		self.result_queue = result_queue
+		self.ready_channel = ready_channel # Writing end of the pipe the agent reports ready through
 		self.module_name = module_name
 		self.watch = watch
 		self.config = config
 
 		self.is_not_done = True
-		self.game_state = None
-		self.player_state = None
+		self.inbox = _AgentInbox(module_name)
+		self._state_reader = None
+
+	def _stop(self):
+		self.is_not_done = False
+		self.task_queue.close()
+		self.result_queue.close()
+		self.ready_channel.close()
+		logger.debug(f'Agent {self.name}: Exiting')
 
 	def _process_cmd(self, cmd):
 		if not cmd: # Poison pill means shutdown
-			self.is_not_done = True
-			self.task_queue.close()
-			self.result_queue.close()
-			logger.debug(f'Agent {self.name}: Exiting')
+			self.inbox.clear()
+			self._stop()
 			return False
 
-		if isinstance(cmd, StateUpdate):
-			self.game_state = cmd.game
-			self.player_state = cmd.player
-		else:
-			logger.error(f"Unexpected command {cmd}")
-
+		self.inbox.take(cmd)
 		return True
 
+	def _wait_commands(self):
+		""" Block until the game sends a command, then take all the commands queued since """
+		cmd = self.task_queue.get()
+		while self._process_cmd(cmd):
+			try:
+				cmd = self.task_queue.get_nowait()
+			except queue.Empty:
+				break
+
+	def _disqualify(self, reason:str):
+		""" Report a breach of the resource limits to the game and stop """
+		logger.warning(f"Agent {self.name}: {reason}")
+		if self.is_not_done:
+			self.result_queue.put(AgentDisqualified(reason, peak_rss_mb()))
+			self._stop()
+
+	def _reset_limits(self):
+		""" Give the agent the full CPU time limit for a new match """
+		if self.config.get('agent_cpu_limit_sec') is not None:
+			arm_cpu_limit(self.config['agent_cpu_limit_sec'])
+
+	def close_ready_pipe(self):
+		""" Close the ends of the ready pipe the game holds """
+		self.ready_reader.close()
+		self.ready_channel.close()
 
-	def run(self):
-		driver = SimpleDriver(self.module_name, watch=self.watch, config=self.config)
-		
-		try:
-			agent = driver.agent()
+	@property
+	def state_reader(self) -> SharedStateReader:
+		if self._state_reader is None:
+			self._state_reader = SharedStateReader()
+		return self._state_reader
 
-			# Report agent-ready status:
-			self.result_queue.put(AgentReady())
+	def _serve(self, driver:SimpleDriver):
+		agent = driver.agent()
+		inbox = self.inbox
 
-			time_posted = time.time()
-			while self.is_not_done:
-				while not self.task_queue.empty():
-					cmd = self.task_queue.get()
-					if not self._process_cmd(cmd):
-						continue
+		# Report agent-ready status:
+		self.ready_channel.send(AgentReady())
 
-				if self.game_state and self.player_state:
-					cycle_start_time = time.time()
-	
-					agent_action = agent.next_move(self.game_state, self.player_state)
+		while self.is_not_done:
+			self._wait_commands()
 
-					self.game_map = None
-					self.game_state = None
+			if inbox.game_over:
+				game_over, inbox.game_over = inbox.game_over, None
+				agent.on_game_over(game_over.game, game_over.player)
 
-					self.result_queue.put(agent_action)				
+			if inbox.agent_reset:
+				reset, inbox.agent_reset = inbox.agent_reset, None
+				self._reset_limits()
+				agent.reset()
+				self.ready_channel.send(AgentReady(reset.generation))
 
-					logger.debug(f"Time since last post: {cycle_start_time - time_posted}")
-					time_posted = cycle_start_time
+			game_state = inbox.pop_state(self.state_reader if inbox.state_ref is not None else None)
+			if game_state:
+				start_time, start_cpu = time.time(), time.process_time()
 
-		except OSError:
-			pass
+				agent_action = agent.next_move(game_state, inbox.player_state)
+
+				self.result_queue.put(inbox.answer(agent_action, time.time() - start_time, time.process_time() - start_cpu))
+
+	def run(self):
+		driver = SimpleDriver(self.module_name, watch=self.watch, config=self.config)
+		breach = None
+		
+		try:
+			apply_limits(self.config)
+			if self.config.get('agent_memory_limit_mb') is not None:
+				ModuleAgentProxy.fatal_errors = (MemoryError,)
+			self._serve(driver)
+
+		except ResourceLimitExceeded as e:
+			breach = str(e)
+
+		except MemoryError:
+			limit = self.config.get('agent_memory_limit_mb')
+			breach = f"memory limit of {limit}MB exceeded" if limit is not None else "out of memory"
+
+		except OSError as e:
+			# Mapping memory, e.g. the shared ring, fails rather than raising MemoryError
+			if e.errno == errno.ENOMEM and self.config.get('agent_memory_limit_mb') is not None:
+				breach = f"memory limit of {self.config['agent_memory_limit_mb']}MB exceeded"
 		
 		except KeyboardInterrupt:
 			pass
 
+		# Reported once the frames of the agent that has breached the limit are gone
+		if breach:
+			release_memory_headroom()
+			self._disqualify(breach)
+
+		if self._state_reader:
+			self._state_reader.close()
+
 		logger.debug(f"{self.name} loop is over")
 		return
 
 
+class _ZygoteConsumer(Consumer):
+	""" Consumer forked from the zygote, a server process that has imported the engine and preloaded modules once """
+
+	@staticmethod
+	def _Popen(process_obj):
+		return multiprocessing.get_context('forkserver').Process._Popen(process_obj)
+
+
+def _start_consumer(name:str, watch:bool, config, consumer=Consumer, zygote_consumer=_ZygoteConsumer) -> Consumer:
+	""" Start an agent process. With `zygote` config it is forked from the zygote, which is started on first use """
+	context = multiprocessing
+	if config.get('zygote', False):
+		if 'forkserver' in multiprocessing.get_all_start_methods():
+			context, consumer = multiprocessing.get_context('forkserver'), zygote_consumer
+			# Preloaded modules are fixed once the zygote is running
+			context.set_forkserver_preload(ZYGOTE_PRELOAD + list(config.get('zygote_preload', [])))
+		else:
+			logger.warning(f"Zygote is not supported on this platform, starting agent '{name}' from scratch")
+
+	ready_reader, ready_writer = context.Pipe(duplex=False)
+	worker = consumer(context.Queue(), context.Queue(), ready_writer, name, watch, config)
+	worker.start()
+	# The game keeps the writing end open, so a pipe of an agent that has crashed doesn't wake up the game
+	worker.ready_reader = ready_reader
+	return worker
+
+
+def _match_proxy(task_queue, result_queue, ready_channel, name:str, config, **kwargs) -> AgentProxy:
+	""" Game side of an agent process, set up for a match of the given config """
+	# Deltas are smaller than records of the ring, so they are sent instead
+	state_ring = Driver._state_ring if config.get('shared_state', True) and not config.get('state_delta', False) else None
+	return AgentProxy(task_queue, result_queue, ready_channel, name,
+		lockstep=config.get('lockstep', False), move_deadline=config.get('move_deadline', AgentProxy.MOVE_DEADLINE_SEC),
+		state_ring=state_ring, accounting=AgentAccounting.from_config(name, config), state_delta=config.get('state_delta', False), **kwargs)
+
+
 class Driver:
+	""" Runs agents of a module in separate processes. With a `pool`, warm agent processes are leased from it and returned on stop.
+	Drivers of a match share `delta_cache`, so a delta of states is made once for all of their agents
+	"""
 
 	JOIN_TIMEOUT_SEC = 5
 
-	def __init__(self, name:str, watch: bool = False, config={}):
+	# Drivers of all agents share the ring, so the state of a tick is written once for all agents
+	_state_ring = None
+	_state_ring_users = 0
+
+	def __init__(self, name:str, watch: bool = False, config={}, pool:'WorkerPool'=None, delta_cache:DeltaCache=None):
 		self.name = name
 		self.is_ready = False
 		self.watch = watch
 		self.config = config
+		self.pool = pool
+		self.delta_cache = delta_cache or DeltaCache()
 		self._proxies = []
 		self._workers = []
 
+		self.shared_state = config.get('shared_state', True) and shared_memory is not None
+		if self.shared_state:
+			Driver._acquire_state_ring()
+
+	@staticmethod
+	def _acquire_state_ring():
+		if Driver._state_ring is None:
+			Driver._state_ring = SharedStateRing()
+		Driver._state_ring_users += 1
+
+	@staticmethod
+	def _release_state_ring():
+		Driver._state_ring_users -= 1
+		if not Driver._state_ring_users:
+			Driver._state_ring.close()
+			Driver._state_ring = None
+
 	def stop(self):
 		for p in self._proxies:
-			p.stop()
+			if p.accounting.late_moves:
+				logger.info(f"agent '{self.name}' has missed the move deadline {p.accounting.late_moves} times")
+			if self.pool:
+				self.pool.release(p)
+			else:
+				p.stop()
+		self._proxies = []
 
 		for w in self._workers:
 			try:
@@ -165,14 +530,22 @@ class Driver:
 			except ValueError:
 				logger.warn(f"process for agent '{self.name}' has not finished gracefully. Terminating")
 				w.terminate()
+			w.close_ready_pipe()
+		self._workers = []
+
+		if self.shared_state:
+			self.shared_state = False
+			Driver._release_state_ring()
 
 	def agent(self) -> AgentProxy:
-		tasks_queue = multiprocessing.Queue()
-		agent_result_queue = multiprocessing.Queue()
-		proxy = AgentProxy(tasks_queue, agent_result_queue, self.name)
+		if self.pool:
+			proxy = self.pool.lease(self.name, self.watch, self.config, delta_cache=self.delta_cache)
+			self._proxies.append(proxy)
+			return proxy
 
-		worker = Consumer(tasks_queue, agent_result_queue, self.name, self.watch, self.config)
-		worker.start()
+		worker = _start_consumer(self.name, self.watch, self.config)
+		proxy = _match_proxy(worker.task_queue, worker.result_queue, worker.ready_reader, self.name, self.config, process=worker,
+			delta_cache=self.delta_cache)
 
 		self._workers.append(worker)
 		self._proxies.append(proxy)
@@ -184,3 +557,131 @@ class Driver:
 
 	def __exit__(self, exc_type, exc_value, traceback):
 		self.stop()
+
+
+class _PooledWorker:
+	""" Agent process of a WorkerPool, its queues and ready pipe """
+
+	def __init__(self, name:str, watch:bool, config):
+		self.name = name
+		self.watch = watch
+		self.generation = 0
+		self.matches = 0
+		self.process = _start_consumer(name, watch, config)
+		self.task_queue = self.process.task_queue
+		self.result_queue = self.process.result_queue
+		self.ready_reader = self.process.ready_reader
+
+	def wait_ready(self, timeout:float) -> bool:
+		""" Wait for the agent to report ready for the current generation. Moves left from the last match are dropped by the proxy """
+		deadline = time.time() + timeout
+		while multiprocessing.connection.wait([self.ready_reader, self.process.sentinel], max(0, deadline - time.time())):
+			if not self.ready_reader.poll(): # The process has ended
+				return False
+			if self.ready_reader.recv().generation == self.generation:
+				return True
+		return False
+
+	def memory_mb(self):
+		""" Resident memory of the process in MB, None where it can not be read from /proc """
+		try:
+			with open(f'/proc/{self.process.pid}/statm') as f:
+				return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1 << 20)
+		except (OSError, ValueError, AttributeError):
+			return None
+
+	def stop(self, timeout:float):
+		if self.process.is_alive():
+			self.task_queue.put(None)
+			self.process.join(timeout)
+		if self.process.is_alive():
+			logger.warn(f"process for agent '{self.name}' has not finished gracefully. Terminating")
+			self.process.terminate()
+			self.process.join()
+		self.process.close()
+		self.process.close_ready_pipe()
+
+
+class WorkerPool:
+	""" Warm agent processes kept across matches, so a match doesn't pay for process start and agent module import.
+	A driver created with the pool leases a process per agent and returns it when stopped. Returned agents are reset:
+	the process replaces the agent with a fresh instance and is leased again once it has reported ready.
+	Workers that have crashed, don't report ready within `RESET_TIMEOUT_SEC`, have played `max_matches` matches
+	or use more than `max_memory_mb` of resident memory are stopped and replaced by new ones.
+	"""
+	RESET_TIMEOUT_SEC = 3
+
+	def __init__(self, config={}, max_matches:int=None, max_memory_mb:float=None):
+		self.config = config
+		self.max_matches = max_matches
+		self.max_memory_mb = max_memory_mb
+		self._idle:Dict[Tuple[str, bool], List[_PooledWorker]] = {}
+		self._leased:Dict[AgentProxy, _PooledWorker] = {}
+		self.started = 0 # Number of agent processes started by the pool
+		self.recycled = 0 # Number of agent processes stopped before the pool was closed
+
+		# The ring outlives matches, and has to exist before agent processes are started
+		self.shared_state = config.get('shared_state', True) and shared_memory is not None
+		if self.shared_state:
+			Driver._acquire_state_ring()
+
+	def _recycle(self, worker:_PooledWorker, reason:str):
+		logger.info(f"recycling process of agent '{worker.name}': {reason}")
+		self.recycled += 1
+		worker.stop(Driver.JOIN_TIMEOUT_SEC)
+
+	def lease(self, name:str, watch:bool=False, config={}, delta_cache:DeltaCache=None) -> AgentProxy:
+		""" Get an agent of the module for a match of the given config, sharing `delta_cache` with the other agents of the match """
+		idle = self._idle.get((name, watch), [])
+		while idle:
+			worker = idle.pop()
+			if worker.wait_ready(self.RESET_TIMEOUT_SEC):
+				proxy = _match_proxy(worker.task_queue, worker.result_queue, worker.ready_reader, name, config, generation=worker.generation, ready=True,
+					process=worker.process, delta_cache=delta_cache)
+				break
+			self._recycle(worker, "crashed" if not worker.process.is_alive() else "not ready after reset")
+		else:
+			worker = _PooledWorker(name, watch, self.config)
+			self.started += 1
+			proxy = _match_proxy(worker.task_queue, worker.result_queue, worker.ready_reader, name, config, process=worker.process,
+				delta_cache=delta_cache)
+
+		self._leased[proxy] = worker
+		return proxy
+
+	def release(self, proxy:AgentProxy):
+		""" Return the agent after the match """
+		worker = self._leased.pop(proxy)
+		worker.matches += 1
+
+		memory = worker.memory_mb() if self.max_memory_mb else None
+		if proxy.accounting.disqualified:
+			self._recycle(worker, f"disqualified: {proxy.accounting.disqualified}")
+		elif not worker.process.is_alive():
+			self._recycle(worker, "crashed")
+		elif self.max_matches and worker.matches >= self.max_matches:
+			self._recycle(worker, f"played {worker.matches} matches")
+		elif memory and memory > self.max_memory_mb:
+			self._recycle(worker, f"uses {memory:.0f}MB of memory")
+		else:
+			proxy.reset()
+			worker.generation = proxy.generation
+			self._idle.setdefault((worker.name, worker.watch), []).append(worker)
+
+	def close(self):
+		""" Stop all agent processes """
+		workers = list(self._leased.values()) + [w for idle in self._idle.values() for w in idle]
+		self._leased = {}
+		self._idle = {}
+		for worker in workers:
+			worker.stop(Driver.JOIN_TIMEOUT_SEC)
+
+		if self.shared_state:
+			self.shared_state = False
+			Driver._release_state_ring()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
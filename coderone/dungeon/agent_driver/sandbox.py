@@ -0,0 +1,122 @@
+"""
+ Resource limits of agent processes.
+ Limits are applied by the agent process itself when it starts, before it imports the agent module:
+	agent_memory_limit_mb	address space the process may add to what it has at start (RLIMIT_AS), allocations over it raise MemoryError.
+							Processes forked from the game start with its address space, which is not counted
+	agent_cpu_limit_sec		CPU time of the process per match (RLIMIT_CPU), SIGXCPU raises ResourceLimitExceeded once over
+	agent_cpu_affinity		CPUs the process may run on, so agents can be kept off the CPUs of the game and of other matches
+ The CPU limit, rounded up to whole seconds, is a soft limit re-armed on every reset of the agent, so processes kept across matches get the full limit for each match.
+ Limits the platform doesn't support are logged and not applied: none of them on Windows, affinity and usually the address space on macOS.
+"""
+
+import math
+import os
+import signal
+import sys
+import logging
+
+from typing import Optional
+
+try:
+	import resource
+except ImportError: # Windows
+	resource = None
+
+logger = logging.getLogger(__name__)
+
+# Address space allowed over the memory limit once it has been breached, for the process to report the breach
+MEMORY_HEADROOM_MB = 64
+
+
+class ResourceLimitExceeded(BaseException):
+	""" The agent process has used up its CPU time limit. Not an Exception, so that agents catching errors of their own don't swallow it """
+
+
+def has_limits(config) -> bool:
+	""" Whether the config sets any resource limit for agent processes """
+	return any(config.get(key) is not None for key in ('agent_memory_limit_mb', 'agent_cpu_limit_sec', 'agent_cpu_affinity'))
+
+
+def apply_limits(config):
+	""" Apply resource limits of the config to the current process """
+	cpus = config.get('agent_cpu_affinity')
+	if cpus is not None:
+		try:
+			os.sched_setaffinity(0, cpus)
+		except AttributeError:
+			logger.warning("CPU affinity is not supported on this platform, agent_cpu_affinity is ignored")
+		except (ValueError, OSError) as e:
+			logger.warning(f"CPU affinity {cpus} can not be set, agent_cpu_affinity is ignored: {e}")
+
+	memory_mb = config.get('agent_memory_limit_mb')
+	cpu_sec = config.get('agent_cpu_limit_sec')
+	if memory_mb is None and cpu_sec is None:
+		return
+	if resource is None:
+		logger.warning("Resource limits are not supported on this platform, agent limits are ignored")
+		return
+
+	if memory_mb is not None:
+		base = _address_space()
+		soft, hard = base + int(memory_mb * (1 << 20)), base + int((memory_mb + MEMORY_HEADROOM_MB) * (1 << 20))
+		_, max_hard = resource.getrlimit(resource.RLIMIT_AS)
+		if max_hard != resource.RLIM_INFINITY:
+			soft, hard = min(soft, max_hard), min(hard, max_hard)
+		try:
+			resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+		except (ValueError, OSError) as e:
+			logger.warning(f"Memory limit is not supported on this platform, agent_memory_limit_mb is ignored: {e}")
+
+	if cpu_sec is not None:
+		def on_cpu_limit(signum, frame):
+			raise ResourceLimitExceeded(f"CPU time limit of {cpu_sec}sec exceeded")
+
+		if arm_cpu_limit(cpu_sec):
+			signal.signal(signal.SIGXCPU, on_cpu_limit)
+		else:
+			logger.warning("CPU time limit is not supported on this platform, agent_cpu_limit_sec is ignored")
+
+
+def _address_space() -> int:
+	""" Address space of the current process in bytes, 0 where it can not be read from /proc """
+	try:
+		with open('/proc/self/statm') as f:
+			return int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+	except (OSError, ValueError):
+		return 0
+
+
+def release_memory_headroom():
+	""" Raise the memory limit to the headroom left for reporting a breach """
+	if resource is not None:
+		_, hard = resource.getrlimit(resource.RLIMIT_AS)
+		try:
+			resource.setrlimit(resource.RLIMIT_AS, (hard, hard))
+		except (ValueError, OSError):
+			pass
+
+
+def arm_cpu_limit(cpu_sec:float) -> bool:
+	""" Allow the process `cpu_sec` more seconds of CPU time from now. Return False if the platform doesn't support the limit """
+	if resource is None:
+		return False
+	usage = resource.getrusage(resource.RUSAGE_SELF)
+	soft = math.ceil(usage.ru_utime + usage.ru_stime + cpu_sec)
+	_, hard = resource.getrlimit(resource.RLIMIT_CPU)
+	if hard != resource.RLIM_INFINITY:
+		soft = min(soft, hard)
+	try:
+		resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+	except (ValueError, OSError):
+		return False
+	return True
+
+
+def peak_rss_mb() -> Optional[float]:
+	""" Peak resident memory of the current process in MB, None where it can not be measured.
+	Processes forked from the game start with its peak
+	"""
+	if resource is None:
+		return None
+	max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return max_rss / (1 << 20) if sys.platform == 'darwin' else max_rss / (1 << 10) # Bytes on macOS, KB elsewhere
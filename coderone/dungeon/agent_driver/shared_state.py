@@ -0,0 +1,311 @@
+"""
+ Shared-memory transport of game states to agent processes.
+ The game process encodes the state of a tick once into a ring buffer in shared memory and sends agent processes
+ only a small reference to it. Agent processes take the record out of the ring with a single copy and decode fields
+ of the state when they are first accessed. Occupancy queries, such as `entity_at`, read the encoded map directly.
+
+ A record of a state is a header followed by sections, each padded to 4 bytes:
+	header		tick, is_over, columns, rows and numbers of ammo, treasure, bombs, blocks, players and observation channels
+	ammo		int32 (x, y) pairs
+	treasure	int32 (x, y) pairs
+	bombs		int32 (x, y) pairs
+	block tags	uint8 index into EntityTags per block
+	blocks		int32 (x, y) pairs
+	players		int32 (pid, x, y) triples, (-1, -1) for players without a position
+	map			int16 per cell, indexed by x * rows + y: 0 for empty cells, index into EntityTags + 1 for entities, -(pid + 1) for players
+	observation	float32 channels x columns x rows values
+"""
+
+import struct
+import logging
+
+from array import array
+from itertools import chain
+from typing import Dict, NamedTuple, Optional
+
+try:
+	from multiprocessing import shared_memory
+except ImportError: # Python < 3.8
+	shared_memory = None
+
+from ..agent import EntityTags, GameState, Point
+
+logger = logging.getLogger(__name__)
+
+_TAGS = [tag.value for tag in EntityTags]
+_TAG_INDEX = {tag: i for i, tag in enumerate(_TAGS)}
+
+_HEAD = struct.Struct('<q')	# Ring header: end of the last reserved record, as a number of bytes ever written
+_CAPACITY = struct.Struct('<q')	# Then the capacity of the ring: shared memory blocks may be larger than asked for, e.g. rounded up to pages on macOS
+_RING_HEADER_SIZE = _HEAD.size + _CAPACITY.size
+_RECORD_HEADER = struct.Struct('<qBxHHIIIIIIxx') # Padded to keep sections aligned
+
+
+def _padded(size:int) -> int:
+	return (size + 3) & ~3
+
+
+def _section_sizes(counts, columns:int, rows:int):
+	""" Byte sizes of the record sections for the given header counts """
+	n_ammo, n_treasure, n_bombs, n_blocks, n_players, channels = counts
+	return (8 * n_ammo, 8 * n_treasure, 8 * n_bombs, _padded(n_blocks), 8 * n_blocks, 12 * n_players, _padded(2 * columns * rows), 4 * channels * columns * rows)
+
+
+def _positions(positions) -> bytes:
+	return array('i', chain.from_iterable(positions)).tobytes()
+
+
+class StateRef(NamedTuple):
+	""" Location of a state record in a shared ring buffer """
+	ring: str	# Name of the shared memory block
+	start: int	# Position of the record as a number of bytes written to the ring before it
+	size: int
+
+
+class StaleStateError(Exception):
+	""" The record of a state has been overwritten before it was read """
+	pass
+
+
+class SharedStateRing:
+	""" Writer side of the ring buffer, used by the game process. It has to be created before agent processes are started.
+	The shared memory block is allocated on the first write, sized to keep at least `MIN_RECORDS` records twice the first state's size.
+	States that are too large for the ring are not written and have to be sent by other means.
+	"""
+	MIN_RECORDS = 64
+	MIN_CAPACITY = 1 << 20
+
+	def __init__(self):
+		# Agent processes started after this share the resource tracker of the game process and leave unlinking of the block to it.
+		# With a tracker of their own, the block would be unlinked as soon as one of them exits
+		from multiprocessing import resource_tracker
+		resource_tracker.ensure_running()
+
+		self._shm = None
+		self._capacity = 0
+		self._end = 0
+		self._last_state = None
+		self._last_ref = None
+
+		# Entity positions are shared between states until they change, so encoded sections are reused while they are the same objects
+		self._encoded:Dict[str, tuple] = {}
+
+		# Map is kept encoded and updated from columns of the game map that are not the same objects as on the last write
+		self._size = None
+		self._map = array('h')
+		self._columns:Dict[int, dict] = {}
+
+	def _encode_cached(self, key:str, value, encode) -> bytes:
+		cached = self._encoded.get(key)
+		if cached is None or cached[0] is not value:
+			cached = self._encoded[key] = (value, encode(value))
+		return cached[1]
+
+	def _encode_map(self, game_state:GameState) -> bytes:
+		columns, rows = game_state.size
+		if self._size != game_state.size:
+			self._size = game_state.size
+			self._map = array('h', bytes(2 * columns * rows))
+			self._columns = {}
+
+		game_map = game_state._game_map
+		for x in [x for x in self._columns if x not in game_map]:
+			self._map[x * rows:(x + 1) * rows] = array('h', bytes(2 * rows))
+			del self._columns[x]
+
+		for x, column in game_map.items():
+			if self._columns.get(x) is not column:
+				self._map[x * rows:(x + 1) * rows] = array('h', bytes(2 * rows))
+				for y, tag in column.items():
+					index = _TAG_INDEX.get(tag)
+					self._map[x * rows + y] = index + 1 if index is not None else -(tag + 1)
+				self._columns[x] = column
+
+		return self._map.tobytes()
+
+	def _encode(self, game_state:GameState) -> list:
+		observation = game_state.observation
+		channels = observation.shape[0] if observation is not None else 0
+		columns, rows = game_state.size
+		blocks = game_state._blocks
+		players = game_state._players
+
+		header = _RECORD_HEADER.pack(game_state.tick_number, game_state.is_over, columns, rows,
+			len(game_state.ammo), len(game_state.treasure), len(game_state.bombs), len(blocks), len(players), channels)
+
+		sections = [
+			header,
+			self._encode_cached('ammo', game_state.ammo, _positions),
+			self._encode_cached('treasure', game_state.treasure, _positions),
+			self._encode_cached('bombs', game_state.bombs, _positions),
+			self._encode_cached('tags', blocks, lambda blocks: bytes(_TAG_INDEX[tag] for tag, _ in blocks).ljust(_padded(len(blocks)), b'\0')),
+			self._encode_cached('blocks', blocks, lambda blocks: _positions(pos for _, pos in blocks)),
+			array('i', chain.from_iterable((pid, *(pos if pos is not None else (-1, -1))) for pid, pos in players)).tobytes(),
+			self._encode_map(game_state).ljust(_padded(2 * columns * rows), b'\0'),
+		]
+		if channels:
+			sections.append(observation.astype('<f4', copy=False).tobytes())
+
+		return sections
+
+	def write(self, game_state:GameState) -> Optional[StateRef]:
+		""" Write the state into the ring unless it is the state written last. Return the reference to its record, None if it doesn't fit """
+		if game_state is self._last_state:
+			return self._last_ref
+
+		sections = self._encode(game_state)
+		size = sum(len(section) for section in sections)
+		if self._shm is None:
+			self._capacity = max(self.MIN_CAPACITY, 2 * self.MIN_RECORDS * size) # Room for states to grow
+			self._shm = shared_memory.SharedMemory(create=True, size=_RING_HEADER_SIZE + self._capacity)
+			_CAPACITY.pack_into(self._shm.buf, _HEAD.size, self._capacity)
+
+		ref = None
+		if size <= self._capacity // self.MIN_RECORDS:
+			# Records are never split: skip to the beginning of the ring if the record doesn't fit in the rest of it
+			offset = self._end % self._capacity
+			if offset + size > self._capacity:
+				self._end += self._capacity - offset
+				offset = 0
+
+			# Reserve the space first, so readers can tell that the records there are being overwritten
+			start, self._end = self._end, self._end + size
+			_HEAD.pack_into(self._shm.buf, 0, self._end)
+			offset += _RING_HEADER_SIZE
+			for section in sections:
+				self._shm.buf[offset:offset + len(section)] = section
+				offset += len(section)
+			ref = StateRef(self._shm.name, start, size)
+		else:
+			logger.debug(f"State of {size} bytes is too large for the shared ring of {self._capacity} bytes")
+
+		self._last_state, self._last_ref = game_state, ref
+		return ref
+
+	def close(self):
+		self._last_state = self._last_ref = None
+		self._encoded = {}
+		self._columns = {}
+		if self._shm is not None:
+			self._shm.close()
+			try:
+				self._shm.unlink()
+			except FileNotFoundError: # A reader that has failed to map the ring unlinks it
+				pass
+			self._shm = None
+
+
+class SharedStateReader:
+	""" Reader side of the ring buffer, used by agent processes """
+
+	def __init__(self):
+		self._shm = None
+		self._capacity = 0
+
+	def _attach(self, name:str):
+		if self._shm is not None and self._shm.name == name:
+			return
+
+		self.close()
+		self._shm = shared_memory.SharedMemory(name=name)
+		self._capacity, = _CAPACITY.unpack_from(self._shm.buf, _HEAD.size)
+
+	def _check(self, ref:StateRef):
+		end, = _HEAD.unpack_from(self._shm.buf, 0)
+		if end > ref.start + self._capacity:
+			raise StaleStateError(f"State record at {ref.start} has been overwritten")
+
+	def read(self, ref:StateRef) -> GameState:
+		""" Get the state referenced by `ref`. Raise StaleStateError if its record has already been overwritten by newer states """
+		self._attach(ref.ring)
+		self._check(ref)
+		offset = _RING_HEADER_SIZE + ref.start % self._capacity
+		record = bytes(self._shm.buf[offset:offset + ref.size])
+		self._check(ref)
+
+		return _SharedGameState(record)
+
+	def close(self):
+		if self._shm is not None:
+			self._shm.close()
+			self._shm = None
+
+
+class _SharedGameState(GameState):
+	""" GameState decoded from a record of the ring buffer. Fields of the state are decoded on first access
+	"""
+	_SECTIONS = ('_ammo', '_treasure', '_bombs', '_block_tags', '_blocks', '_players', '_map', '_observation')
+
+	def __init__(self, record:bytes):
+		tick, is_over, columns, rows, *counts = _RECORD_HEADER.unpack_from(record)
+		self.is_over = bool(is_over)
+		self.tick_number = tick
+		self._size = (columns, rows)
+		self._record = memoryview(record)
+		self._channels = counts[-1]
+
+		self._sections = {}
+		offset = _RECORD_HEADER.size
+		for name, size in zip(self._SECTIONS, _section_sizes(counts, columns, rows)):
+			self._sections[name] = (offset, size)
+			offset += size
+
+	def _section(self, name:str) -> memoryview:
+		offset, size = self._sections[name]
+		return self._record[offset:offset + size]
+
+	def _decode_positions(self, name:str):
+		ints = self._section(name).cast('i').tolist()
+		return tuple(zip(ints[0::2], ints[1::2]))
+
+	def __getattr__(self, name):
+		# Only called for fields that have not been decoded yet
+		if name in ('_ammo', '_treasure', '_bombs'):
+			value = self._decode_positions(name)
+		elif name == '_blocks':
+			n_blocks = self._sections['_blocks'][1] // 8
+			tags = self._section('_block_tags')[:n_blocks]
+			value = tuple(zip(map(_TAGS.__getitem__, tags), self._decode_positions('_blocks')))
+		elif name == '_players':
+			ints = self._section('_players').cast('i').tolist()
+			value = tuple((pid, (x, y) if x >= 0 else None) for pid, x, y in zip(ints[0::3], ints[1::3], ints[2::3]))
+		elif name == '_map':
+			columns, rows = self._size
+			value = self._section('_map')[:2 * columns * rows].cast('h')
+		elif name == '_game_map':
+			value = {}
+			rows = self._size[1]
+			for cell, code in enumerate(self._map):
+				if code:
+					value.setdefault(cell // rows, {})[cell % rows] = self._tag(code)
+		elif name == '_observation':
+			value = None
+			if self._channels:
+				try:
+					import numpy as np
+				except ImportError as e:
+					raise ImportError("Dense observation needs NumPy in agent processes, install it with: pip install 'coderone-challenge-dungeon[ml]'") from e
+				value = np.frombuffer(self._section('_observation'), dtype='<f4').reshape(self._channels, *self._size)
+		else:
+			raise AttributeError(name)
+
+		setattr(self, name, value)
+		return value
+
+	@staticmethod
+	def _tag(code:int):
+		return _TAGS[code - 1] if code > 0 else -code - 1
+
+	def _has_occupancy(self, location:Point) -> bool:
+		return self._map[location[0] * self._size[1] + location[1]] != 0
+
+	def entity_at(self, location:Point):
+		if not self.is_in_bounds(location):
+			return None
+
+		code = self._map[location[0] * self._size[1] + location[1]]
+		return self._tag(code) if code else None
+
+	def __reduce__(self):
+		# Pickled states are plain GameState
+		return (GameState, (self.is_over, self.tick_number, self._size, self._game_map, self._ammo, self._treasure, self._bombs, self._blocks, self._players, self._observation))
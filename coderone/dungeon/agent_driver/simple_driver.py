@@ -2,7 +2,6 @@ import importlib
 
 from ..agent import Agent as AIAgent
 from .agent import ModuleProxy
-from .module_watcher import ModuleWatcher
 
 class Driver:
 
@@ -21,7 +20,9 @@ class Driver:
 			module = importlib.import_module(self.name)
 			self.agent_module = ModuleProxy(module)
 		
-			if self.watch:			
+			if self.watch:
+				# Watchdog is only imported when agents are watched
+				from .module_watcher import ModuleWatcher
 				self.watcher = ModuleWatcher()
 				self.watcher.watch_module(module, self.agent_module.on_reload)
 				self.watcher.start_watching()
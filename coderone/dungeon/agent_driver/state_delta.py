@@ -0,0 +1,164 @@
+"""
+ Delta encoding of game states sent to agent processes through their queues.
+ An agent gets a full state, the keyframe, first and then a `StateDelta` against the previous state it has been sent.
+ Deltas only carry the map cells that have changed and the entity sequences that are not the same as before.
+ Dense observations are sent as the values that have changed, by index into the flattened array.
+ The agent side applies every delta to the last state it has, in order, and gets a `GameState` equal to the one of the game.
+
+ Deltas are cheap to make as the game shares unchanged map columns and entity tuples between states of consecutive ticks.
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from ..agent import GameState
+
+# Sequences shorter than this are sent whole when they change, longer ones as removed items and appended ones
+_SEQUENCE_DIFF_MIN = 32
+
+
+class SequenceDiff(NamedTuple):
+	""" Change of an entity sequence: items removed from it, with the order of the rest kept, and items appended after them """
+	removed: frozenset
+	appended: tuple
+
+
+class ObservationDiff(NamedTuple):
+	""" Change of a dense observation: indices into the flattened array and their new values """
+	indices: object
+	values: object
+
+
+class StateDelta(NamedTuple):
+	""" Difference between the state of `base_tick` and a newer state. Fields set to None have not changed """
+	base_tick: int
+	is_over: bool
+	tick_number: int
+	cells: Dict[int, Tuple[Dict[int, object], List[int]]]	# Per changed column: cells set, cells cleared
+	ammo: Optional[object]
+	treasure: Optional[object]
+	bombs: Optional[object]
+	blocks: Optional[object]
+	players: Optional[object]
+	observation: Optional[object]
+
+
+def _diff_map(base:Dict[int, dict], game_map:Dict[int, dict]):
+	cells = {}
+	for x in base.keys() | game_map.keys():
+		base_column, column = base.get(x, {}), game_map.get(x, {})
+		if column is base_column:
+			continue
+		changed = {y: tag for y, tag in column.items() if base_column.get(y) != tag}
+		cleared = [y for y in base_column if y not in column]
+		if changed or cleared:
+			cells[x] = (changed, cleared)
+	return cells
+
+
+def _diff_sequence(base:Sequence, sequence:Sequence):
+	if sequence is base or sequence == base:
+		return None
+	if len(sequence) < _SEQUENCE_DIFF_MIN:
+		return sequence
+
+	removed = frozenset(base) - frozenset(sequence)
+	kept = tuple(item for item in base if item not in removed)
+	if tuple(sequence[:len(kept)]) != kept: # Reordered, not worth a diff
+		return sequence
+	return SequenceDiff(removed, tuple(sequence[len(kept):]))
+
+
+def _diff_observation(base, observation):
+	if observation is base:
+		return None
+	if base is None or observation is None or observation.shape != base.shape:
+		return observation
+
+	indices = (observation != base).reshape(-1).nonzero()[0]
+	if not len(indices):
+		return None
+	if len(indices) > observation.size // 4: # Most of it has changed, not worth a diff
+		return observation
+	return ObservationDiff(indices, observation.reshape(-1)[indices])
+
+
+def encode_delta(base:GameState, state:GameState) -> StateDelta:
+	""" Delta that turns `base` into `state` """
+	return StateDelta(
+		base_tick=base.tick_number,
+		is_over=state.is_over,
+		tick_number=state.tick_number,
+		cells=_diff_map(base._game_map, state._game_map),
+		ammo=_diff_sequence(base._ammo, state._ammo),
+		treasure=_diff_sequence(base._treasure, state._treasure),
+		bombs=_diff_sequence(base._bombs, state._bombs),
+		blocks=_diff_sequence(base._blocks, state._blocks),
+		players=_diff_sequence(base._players, state._players),
+		observation=_diff_observation(base._observation, state._observation),
+	)
+
+
+class DeltaCache:
+	""" Delta of the last state sent, shared by proxies of the agents of a match, as they are all sent the same states.
+	Deltas are looked up by identity of the states: the game builds a new state every tick and never changes one that has been sent,
+	and the cache holds on to the states of its delta, so a state it has can not be confused with another one.
+	"""
+	def __init__(self):
+		self._base = self._state = self._delta = None
+
+	def delta(self, base:GameState, game_state:GameState) -> StateDelta:
+		if self._base is not base or self._state is not game_state:
+			self._base, self._state, self._delta = base, game_state, encode_delta(base, game_state)
+		return self._delta
+
+
+def _apply_map(base:Dict[int, dict], cells) -> Dict[int, dict]:
+	if not cells:
+		return base
+
+	game_map = dict(base)
+	for x, (changed, cleared) in cells.items():
+		column = dict(base.get(x, {}))
+		for y in cleared:
+			del column[y]
+		column.update(changed)
+		if column:
+			game_map[x] = column
+		else:
+			game_map.pop(x, None)
+	return game_map
+
+
+def _apply_sequence(base:Sequence, change) -> Sequence:
+	if change is None:
+		return base
+	if isinstance(change, SequenceDiff):
+		return tuple(item for item in base if item not in change.removed) + change.appended
+	return change
+
+
+def _apply_observation(base, change):
+	if change is None:
+		return base
+	if isinstance(change, ObservationDiff):
+		observation = base.copy()
+		observation.reshape(-1)[change.indices] = change.values
+		observation.flags.writeable = False
+		return observation
+	return change
+
+
+def apply_delta(base:GameState, delta:StateDelta) -> GameState:
+	""" New state from the state of the delta's base tick. Columns and sequences that haven't changed are shared with `base` """
+	return GameState(
+		is_over=delta.is_over,
+		tick_number=delta.tick_number,
+		size=base._size,
+		game_map=_apply_map(base._game_map, delta.cells),
+		ammo=_apply_sequence(base._ammo, delta.ammo),
+		treasure=_apply_sequence(base._treasure, delta.treasure),
+		bombs=_apply_sequence(base._bombs, delta.bombs),
+		blocks=_apply_sequence(base._blocks, delta.blocks),
+		players=_apply_sequence(base._players, delta.players),
+		observation=_apply_observation(base._observation, delta.observation),
+	)
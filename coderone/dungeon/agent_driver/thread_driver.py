@@ -0,0 +1,159 @@
+import threading
+import time
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+
+from ..agent import GameState, PlayerState
+from .agent import Agent, AgentAccounting
+from .simple_driver import Driver as SimpleDriver
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadAgent(Agent):
+	""" Game side of an agent running in a thread pool of the game process.
+	Same as with agent processes, an agent that is slower than the game answers only the latest state it has been sent,
+	and in lockstep mode moves that miss `move_deadline` count as NO-OP. Exceptions raised by the agent are logged and count as NO-OP.
+	CPU budgets in `accounting` are enforced the same as for agent processes, with CPU time of the agent's thread.
+	Moves the agent was still thinking about when it was reset are dropped, same as moves made before a reset of an agent process.
+	"""
+	is_ready = True
+	MOVE_DEADLINE_SEC = 0.1
+
+	def __init__(self, agent, executor:ThreadPoolExecutor, name:str, lockstep:bool=False, move_deadline:float=MOVE_DEADLINE_SEC, accounting:AgentAccounting=None):
+		self.agent = agent
+		self.executor = executor
+		self.name = name
+		self.lockstep = lockstep
+		self.move_deadline = move_deadline
+		self.accounting = accounting or AgentAccounting(name)
+		self.generation = 0 # Number of resets the agent has been through
+
+		self.__lock = threading.Lock()
+		self.__answered = threading.Condition(self.__lock)
+		self.__busy = False	# The agent is thinking in a thread of the pool
+		self.__pending = None	# Latest update the agent has not started on: generation, tick, game and player state
+		self.__tick = None
+		self.__deadline = 0
+		self.__budget_deadline = 0 # No point waiting for a move past the tick budget
+		self.__skipped = 0	# Updates replaced by newer ones before the agent started on them, since its last move
+		self.__awaiting_move = False
+		self.__move = None	# Last move made by the agent and not played yet: tick, action
+
+	def __think(self):
+		while True:
+			with self.__lock:
+				update, self.__pending = self.__pending, None
+				if update is None:
+					self.__busy = False
+					return
+			generation, tick, game_state, player_state = update
+			start_time, start_cpu = time.time(), time.thread_time()
+			try:
+				action = self.agent.next_move(game_state, player_state)
+			except BaseException:
+				with self.__lock:
+					self.__busy = False
+				raise
+			with self.__lock:
+				if generation == self.generation:
+					self.__take_move(tick, action, time.time() - start_time, time.thread_time() - start_cpu)
+				else:
+					logger.debug(f"Agent {self.name}: dropping move for tick {tick} made before the reset")
+
+	def __take_move(self, tick:int, action, latency:float, cpu_time:float):
+		skipped, self.__skipped = self.__skipped, 0
+		if not self.accounting.move(tick, self.__tick, latency, cpu_time, skipped):
+			logger.debug(f"Agent {self.name}: dropping move for tick {tick} that is over the tick CPU budget")
+			if tick == self.__tick:
+				self.__awaiting_move = False
+				self.__answered.notify_all()
+		elif not self.lockstep or tick == self.__tick:
+			self.__awaiting_move = False
+			self.__move = (tick, action)
+			self.__answered.notify_all()
+		else:
+			logger.debug(f"Agent {self.name}: dropping move for tick {tick} that has arrived after the deadline")
+			self.accounting.dropped_moves += 1
+
+	def update(self, game_state:GameState, player_state:PlayerState):
+		with self.__lock:
+			self.__tick = game_state.tick_number
+			if self.accounting.out_of_budget:
+				self.__awaiting_move = False
+				return
+
+			now = time.time()
+			self.__deadline = now + self.move_deadline
+			self.__budget_deadline = now + self.accounting.tick_budget if self.accounting.tick_budget is not None else float('inf')
+			self.__awaiting_move = True
+			if self.__pending:
+				self.__skipped += 1
+			self.__pending = (self.generation, self.__tick, game_state, player_state)
+			if not self.__busy:
+				self.__busy = True
+				self.executor.submit(self.__think)
+
+	def wait_move(self, timeout:float) -> bool:
+		""" Wait at most `timeout` seconds for the agent to answer the last state update. Return True if it has answered.
+		In lockstep mode the wait never goes past the move deadline, and it never goes past the tick budget.
+		"""
+		deadline = min(time.time() + timeout, self.__budget_deadline)
+		if self.lockstep:
+			deadline = min(deadline, self.__deadline)
+		with self.__lock:
+			return self.__answered.wait_for(lambda: not self.__awaiting_move, max(0, deadline - time.time()))
+
+	def next_move(self):
+		if self.lockstep and not self.wait_move(max(0, self.__deadline - time.time())):
+			logger.debug(f"Agent {self.name}: no move for tick {self.__tick} before the deadline")
+			with self.__lock:
+				self.__awaiting_move = False
+			self.accounting.late_moves += 1
+
+		with self.__lock:
+			move, self.__move = self.__move, None
+		if not move or (self.lockstep and move[0] != self.__tick):
+			return None
+		return move[1]
+
+	def on_game_over(self, game_state:GameState, player_state:PlayerState):
+		self.agent.on_game_over(game_state, player_state)
+
+	def reset(self):
+		with self.__lock:
+			self.generation += 1
+			self.__pending = None
+			self.__skipped = 0
+			self.__awaiting_move = False
+			self.__move = None
+			self.accounting = self.accounting.restart()
+		self.agent.reset()
+
+
+class Driver(SimpleDriver):
+	""" Runs agents of a module in a pool of threads of the game process. Agents don't share the GIL with the game
+	only while their compute releases it, e.g. in NumPy or torch. Threads can not be stopped: an agent stuck in a loop keeps the game process from exiting
+	"""
+
+	def __init__(self, name:str, watch: bool = False, config={}):
+		super().__init__(name, watch, config)
+		self.config = config
+		self._agents = []
+		self._executor = ThreadPoolExecutor(thread_name_prefix=f'agent-{name}')
+
+	def stop(self):
+		for a in self._agents:
+			if a.accounting.late_moves:
+				logger.info(f"agent '{self.name}' has missed the move deadline {a.accounting.late_moves} times")
+		self._agents = []
+		self._executor.shutdown(wait=False)
+		super().stop()
+
+	def agent(self) -> ThreadAgent:
+		agent = ThreadAgent(super().agent(), self._executor, self.name,
+			lockstep=self.config.get('lockstep', False), move_deadline=self.config.get('move_deadline', ThreadAgent.MOVE_DEADLINE_SEC),
+			accounting=AgentAccounting.from_config(self.name, self.config))
+		self._agents.append(agent)
+		return agent
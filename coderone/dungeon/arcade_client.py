@@ -268,6 +268,8 @@ class Client(arcade.Window):
 
 	def _reset_game(self):
 		self.end_game_timer = self.end_game_wait_time or 0
+		# Every game, either of an endless session or restarted with "R", is played by fresh agents
+		self.game.reset_agents()
 		self.game.generate_map()
 		self._map_game()
 
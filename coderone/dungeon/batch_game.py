@@ -0,0 +1,519 @@
+"""
+ Vectorized game engine.
+ BatchGame implements the same rules as `Game.tick` but holds the state of many independent games
+ in NumPy arrays and advances all of them in lockstep with batched array operations.
+ It is meant for generating self-play data where per-match `Game` objects are too slow.
+"""
+
+import random
+
+from typing import List, Optional, Sequence
+
+try:
+	import numpy as np
+except ImportError as e:
+	raise ImportError("BatchGame needs NumPy, install it with: pip install 'coderone-challenge-dungeon[ml]'") from e
+
+from .game import Game, PlayerActions, DelayedEffectType, GameStats, PlayerStat
+
+# Actions are encoded as an index into this list
+ACTIONS: List[PlayerActions] = list(PlayerActions)
+
+NO_OP = ACTIONS.index(PlayerActions.NO_OP)
+PLACE_BOMB = ACTIONS.index(PlayerActions.PLACE_BOMB)
+
+# Per-action displacement, matches Game._apply_action
+_MOVE_DX = np.array([{PlayerActions.MOVE_LEFT: -1, PlayerActions.MOVE_RIGHT: +1}.get(a, 0) for a in ACTIONS], dtype=np.int32)
+_MOVE_DY = np.array([{PlayerActions.MOVE_DOWN: -1, PlayerActions.MOVE_UP: +1}.get(a, 0) for a in ACTIONS], dtype=np.int32)
+_IS_MOVE = (_MOVE_DX != 0) | (_MOVE_DY != 0)
+
+# Fire propagation directions in the order used by Game._start_fire
+_FIRE_DIRECTIONS = ((-1, 0), (+1, 0), (0, -1), (0, +1))
+
+# Value block kinds
+BLOCK_NONE = 0
+BLOCK_SOFT = 1
+BLOCK_ORE = 2
+
+
+def action_code(action: PlayerActions) -> int:
+	""" Get an integer code of the player action as expected by BatchGame.step
+	"""
+	return ACTIONS.index(action)
+
+
+class BatchGame:
+	""" A batch of N games of the same map size and number of players that are advanced together.
+	Cells are addressed by a flat index `x * row_count + y`, players by their index in the order of player ids.
+	"""
+
+	def __init__(self, n_games:int, column_count:int, row_count:int, n_players:int, max_iterations:int=None, seed=None, shuffle_actions:bool=True, rules=Game):
+		""" Create a batch of empty games. Use `from_games` or `generate` to get a batch with a populated map.
+		`rules` is a Game class or instance to take game rule constants from.
+		"""
+		self.n_games = n_games
+		self.column_count = column_count
+		self.row_count = row_count
+		self.n_players = n_players
+		self.max_iterations = max_iterations
+		self.shuffle_actions = shuffle_actions
+		self.rules = rules
+		self.rng = np.random.default_rng(seed)
+
+		N, C, P = n_games, column_count * row_count, n_players
+		self._rows = np.arange(N)
+
+		self.static_blocks = np.zeros((N, C), dtype=bool)
+
+		self.block_present = np.zeros((N, C), dtype=bool)
+		self.block_kind = np.zeros((N, C), dtype=np.int8)
+		self.block_hp = np.zeros((N, C), dtype=np.int32)
+		self.block_reward = np.zeros((N, C), dtype=np.int32)
+
+		self.bomb_present = np.zeros((N, C), dtype=bool)
+		self.bomb_ttl = np.zeros((N, C), dtype=np.int32)
+		self.bomb_owner = np.zeros((N, C), dtype=np.int32)
+		self.bomb_power = np.zeros((N, C), dtype=np.int32)
+		self.bomb_seq = np.zeros((N, C), dtype=np.int64) # Bomb placement order, decides the order of fires
+		self._bomb_counter = 0
+
+		self.ammo_present = np.zeros((N, C), dtype=bool)
+		self.ammo_ttl = np.zeros((N, C), dtype=np.int32)
+		self.ammo_value = np.zeros((N, C), dtype=np.int32)
+
+		self.treasure_present = np.zeros((N, C), dtype=bool)
+		self.treasure_value = np.zeros((N, C), dtype=np.int32)
+
+		# Fire is an ordered list of (cell, owner) per game. All fires live for exactly one tick.
+		self.fire_cell = np.zeros((N, 0), dtype=np.int64)
+		self.fire_owner = np.zeros((N, 0), dtype=np.int32)
+		self.fire_valid = np.zeros((N, 0), dtype=bool)
+
+		self.player_x = np.zeros((N, P), dtype=np.int32)
+		self.player_y = np.zeros((N, P), dtype=np.int32)
+		self.player_hp = np.full((N, P), rules.PLAYER_START_HP, dtype=np.int32)
+		self.player_ammo = np.full((N, P), rules.PLAYER_START_AMMO, dtype=np.int32)
+		self.player_power = np.full((N, P), rules.PLAYER_START_POWER, dtype=np.int32)
+		self.player_reward = np.zeros((N, P), dtype=np.int32)
+
+		self.tick_counter = np.zeros(N, dtype=np.int64)
+		self.is_over = np.zeros(N, dtype=bool)
+		self.winner = np.full(N, -1, dtype=np.int32)
+
+		# Delayed effects. All ammo respawn delays are the same so a ring buffer of pending counts
+		# indexed by the due step is enough. There is at most one pending treasure spawn per game.
+		self._step = 0
+		self._effect_ring = rules.AMMO_RESPAWN_TTL + 1
+		self.ammo_effects = np.zeros((N, self._effect_ring), dtype=np.int32)
+		self.treasure_due = np.full(N, -1, dtype=np.int64)
+
+	@classmethod
+	def from_games(cls, games:Sequence[Game], seed=None, shuffle_actions:bool=True) -> 'BatchGame':
+		""" Create a batch from the current state of existing games.
+		All games must have the same map size and number of players.
+		"""
+		first = games[0]
+		n_players = len(first.players)
+		for game in games:
+			if (game.column_count, game.row_count, len(game.players)) != (first.column_count, first.row_count, n_players):
+				raise ValueError("All games in a batch must have the same map size and number of players")
+
+		batch = cls(len(games), first.column_count, first.row_count, n_players,
+			max_iterations=first.max_iterations, seed=seed, shuffle_actions=shuffle_actions, rules=first)
+
+		for i, game in enumerate(games):
+			batch._load_game(i, game)
+
+		return batch
+
+	@classmethod
+	def generate(cls, n_games:int, n_players:int, column_count:int=Game.COLUMN_COUNT, row_count:int=Game.ROW_COUNT, max_iterations:int=None, seed=None, shuffle_actions:bool=True) -> 'BatchGame':
+		""" Create a batch of new games with maps generated by the Game
+		"""
+		map_rng = random.Random(seed)
+		games = []
+		for _ in range(n_games):
+			game = Game(row_count=row_count, column_count=column_count, max_iterations=max_iterations, seed=map_rng.getrandbits(64))
+			for _ in range(n_players):
+				game.add_player(None)
+			game.generate_map()
+			games.append(game)
+
+		return cls.from_games(games, seed=seed, shuffle_actions=shuffle_actions)
+
+	def _cell(self, pos) -> int:
+		return pos[0] * self.row_count + pos[1]
+
+	def _load_game(self, i:int, game:Game):
+		pids = sorted(game.players)
+		player_index = {pid: p for p, pid in enumerate(pids)}
+
+		for block in game.static_block_list:
+			self.static_blocks[i, self._cell(block.pos)] = True
+
+		for block in game.value_block_list:
+			c = self._cell(block.pos)
+			self.block_present[i, c] = True
+			self.block_kind[i, c] = BLOCK_ORE if isinstance(block, Game._OreBlock) else BLOCK_SOFT
+			self.block_hp[i, c] = block.hp
+			self.block_reward[i, c] = block.reward
+
+		for bomb in game.bomb_list:
+			c = self._cell(bomb.pos)
+			self.bomb_present[i, c] = True
+			self.bomb_ttl[i, c] = bomb.hp
+			self.bomb_owner[i, c] = player_index[bomb.owner_id]
+			self.bomb_power[i, c] = bomb.power
+			self.bomb_seq[i, c] = self._bomb_counter
+			self._bomb_counter += 1
+
+		for ammo in game.ammunition_list:
+			c = self._cell(ammo.pos)
+			self.ammo_present[i, c] = True
+			self.ammo_ttl[i, c] = ammo.hp
+			self.ammo_value[i, c] = ammo.value
+
+		for treasure in game.treasure_list:
+			c = self._cell(treasure.pos)
+			self.treasure_present[i, c] = True
+			self.treasure_value[i, c] = treasure.value
+
+		fires = list(game.fire_list)
+		if len(fires) > self.fire_cell.shape[1]:
+			self._resize_fire(len(fires))
+		for j, fire in enumerate(fires):
+			self.fire_cell[i, j] = self._cell(fire.pos)
+			self.fire_owner[i, j] = player_index[fire.owner_id]
+			self.fire_valid[i, j] = True
+
+		for p, pid in enumerate(pids):
+			player = game.players[pid]
+			self.player_x[i, p], self.player_y[i, p] = player.pos
+			self.player_hp[i, p] = player.hp
+			self.player_ammo[i, p] = player.ammo
+			self.player_power[i, p] = player.power
+			self.player_reward[i, p] = player.reward
+
+		# An effect with ttl=t is applied on the t-th tick from now
+		for effect in game._effect_timers.pending():
+			due = self._step + effect.hp - 1
+			if effect.effect == DelayedEffectType.SPAWN_AMMO:
+				self.ammo_effects[i, due % self._effect_ring] += 1
+			elif self.treasure_due[i] < 0:
+				self.treasure_due[i] = due
+			else:
+				raise ValueError("Only one pending treasure spawn per game is supported")
+
+		self.tick_counter[i] = game.tick_counter
+		self.is_over[i] = game.is_over
+		self.winner[i] = player_index[game.winner[0]] if game.winner else -1
+
+	def _resize_fire(self, size:int):
+		pad = size - self.fire_cell.shape[1]
+		self.fire_cell = np.pad(self.fire_cell, ((0, 0), (0, pad)))
+		self.fire_owner = np.pad(self.fire_owner, ((0, 0), (0, pad)))
+		self.fire_valid = np.pad(self.fire_valid, ((0, 0), (0, pad)))
+
+	@property
+	def player_cell(self) -> np.ndarray:
+		return self.player_x * self.row_count + self.player_y
+
+	@property
+	def player_alive(self) -> np.ndarray:
+		return self.player_hp > 0
+
+	def step(self, actions:np.ndarray):
+		""" Advance all games by one tick.
+		`actions` is an (n_games, n_players) array of action codes, see `ACTIONS`.
+		"""
+		actions = np.asarray(actions, dtype=np.int64)
+		if actions.shape != (self.n_games, self.n_players):
+			raise ValueError(f"Expected actions of shape {(self.n_games, self.n_players)}, got {actions.shape}")
+
+		active = ~self.is_over
+		if active.any():
+			self._apply_actions(actions, active)
+			self._apply_fire(active)
+			self._pickup(active)
+
+		exploding = self._update_timers()
+		self._start_fires(exploding)
+		self._apply_effects()
+
+		# Remove expired entities
+		self.block_present &= self.block_hp > 0
+		self.bomb_present &= ~exploding
+		self.ammo_present &= (self.ammo_ttl > 0) & (self.ammo_value > 0)
+		self.treasure_present &= self.treasure_value > 0
+
+		self._check_game_over(active)
+
+		self.tick_counter += 1
+		self._step += 1
+
+	def _apply_actions(self, actions:np.ndarray, active:np.ndarray):
+		rows = self._rows
+		H = self.row_count
+
+		# Randomize the order in which actions are applied, same as Game.tick does
+		if self.shuffle_actions:
+			order = np.argsort(self.rng.random((self.n_games, self.n_players)), axis=1)
+		else:
+			order = np.broadcast_to(np.arange(self.n_players), (self.n_games, self.n_players))
+
+		for slot in range(self.n_players):
+			p = order[:, slot]
+			act = actions[rows, p]
+			can_act = active & (self.player_hp[rows, p] > 0)
+
+			# Moves
+			moving = can_act & _IS_MOVE[act]
+			if moving.any():
+				x = np.clip(self.player_x[rows, p] + _MOVE_DX[act], 0, self.column_count - 1)
+				y = np.clip(self.player_y[rows, p] + _MOVE_DY[act], 0, self.row_count - 1)
+				cell = x * H + y
+				blocked = self.static_blocks[rows, cell] | self.block_present[rows, cell] | self.bomb_present[rows, cell] | \
+					(self.player_cell == cell[:, None]).any(axis=1)
+
+				moving &= ~blocked
+				self.player_x[rows[moving], p[moving]] = x[moving]
+				self.player_y[rows[moving], p[moving]] = y[moving]
+
+			# Bombs
+			placing = can_act & (act == PLACE_BOMB) & (self.player_ammo[rows, p] > 0)
+			if placing.any():
+				cell = self.player_x[rows, p] * H + self.player_y[rows, p]
+				placing &= ~self.bomb_present[rows, cell]
+
+				g, c, pp = rows[placing], cell[placing], p[placing]
+				self.player_ammo[g, pp] -= 1
+				self.bomb_present[g, c] = True
+				self.bomb_ttl[g, c] = self.rules.BOMB_TTL
+				self.bomb_owner[g, c] = pp
+				self.bomb_power[g, c] = self.player_power[g, pp]
+				self.bomb_seq[g, c] = self._bomb_counter
+				self._bomb_counter += 1
+
+				# Ammo respawn is enqueued before timers update, so it fires one tick earlier
+				self._enqueue_ammo(g, self.rules.AMMO_RESPAWN_TTL - 1)
+
+	def _apply_fire(self, active:np.ndarray):
+		if not self.fire_valid.any():
+			return
+
+		rows = self._rows
+		N, P = self.n_games, self.n_players
+		fire_valid = self.fire_valid & active[:, None]
+		fire_cell = self.fire_cell
+		fire_owner = self.fire_owner
+
+		# Check if any player stepped into a fire-zone
+		player_cell = self.player_cell
+		alive = self.player_alive
+		owner_key = rows[:, None] * P + fire_owner
+		for p in range(P):
+			hit = fire_valid & (fire_cell == player_cell[:, p, None]) & alive[:, p, None]
+			hits = hit.sum(axis=1)
+			self.player_hp[:, p] -= hits * self.rules.FIRE_HIT
+			self.player_reward[:, p] -= hits * self.rules.FIRE_PENALTY
+
+			owner_hits = np.bincount(owner_key[hit], minlength=N * P).reshape(N, P)
+			owner_hits[:, p] = 0
+			self.player_reward += owner_hits * self.rules.FIRE_REWARD
+
+		# Apply fire damage to static entities in the order the fires were started:
+		# each fire that hits an already destroyed block still collects the reward
+		for j in np.nonzero(fire_valid.any(axis=0))[0]:
+			valid = fire_valid[:, j]
+			cell = fire_cell[:, j]
+
+			hit = valid & self.block_present[rows, cell]
+			if hit.any():
+				g, c = rows[hit], cell[hit]
+				self.block_hp[g, c] -= self.rules.FIRE_HIT
+				destroyed = self.block_hp[g, c] <= 0
+				g, c = g[destroyed], c[destroyed]
+				self.player_reward[g, fire_owner[g, j]] += self.block_reward[g, c]
+
+			# Fire sets off other bombs
+			hit = valid & self.bomb_present[rows, cell]
+			self.bomb_ttl[rows[hit], cell[hit]] = 0
+
+	def _pickup(self, active:np.ndarray):
+		rows = self._rows
+		player_cell = self.player_cell
+		for p in range(self.n_players):
+			cell = player_cell[:, p]
+			can_pickup = active & (self.player_hp[:, p] > 0)
+
+			found = can_pickup & self.ammo_present[rows, cell]
+			g, c = rows[found], cell[found]
+			self.player_ammo[g, p] += self.ammo_value[g, c]
+			self.ammo_value[g, c] = 0
+
+			found = can_pickup & self.treasure_present[rows, cell]
+			g, c = rows[found], cell[found]
+			self.player_reward[g, p] += self.treasure_value[g, c]
+			self.treasure_value[g, c] = 0
+
+	def _update_timers(self) -> np.ndarray:
+		""" Count down bombs and ammo, return a mask of bombs that are going off
+		"""
+		self.bomb_ttl[self.bomb_present] -= 1
+		exploding = self.bomb_present & (self.bomb_ttl <= 0)
+
+		self.ammo_ttl[self.ammo_present] -= 1
+		perished = (self.ammo_present & (self.ammo_ttl == 0)).sum(axis=1)
+		g = np.nonzero(perished)[0]
+		if len(g):
+			self.ammo_effects[g, (self._step + self.rules.AMMO_RESPAWN_TTL) % self._effect_ring] += perished[g]
+
+		return exploding
+
+	def _start_fires(self, exploding:np.ndarray):
+		""" Turn expired bombs into fire. Fires replace the fires of the previous tick, which all expire now.
+		"""
+		g, c = np.nonzero(exploding)
+		max_power = int(self.bomb_power[g, c].max()) if len(g) else 0
+		fires_per_bomb = 1 + len(_FIRE_DIRECTIONS) * max_power
+
+		# Order bombs of each game by placement, the same order Game.bomb_list keeps
+		order = np.lexsort((self.bomb_seq[g, c], g))
+		g, c = g[order], c[order]
+		rank = np.arange(len(g)) - np.searchsorted(g, g)
+		n_fires = (rank.max() + 1) * fires_per_bomb if len(g) else 0
+
+		self.fire_cell = np.zeros((self.n_games, n_fires), dtype=np.int64)
+		self.fire_owner = np.zeros((self.n_games, n_fires), dtype=np.int32)
+		self.fire_valid = np.zeros((self.n_games, n_fires), dtype=bool)
+		if not len(g):
+			return
+
+		H = self.row_count
+		owner = self.bomb_owner[g, c]
+		power = self.bomb_power[g, c]
+		bx, by = c // H, c % H
+		base = rank * fires_per_bomb
+
+		def __add_fire(slot, mask, cell):
+			self.fire_cell[g[mask], base[mask] + slot] = cell[mask]
+			self.fire_owner[g[mask], base[mask] + slot] = owner[mask]
+			self.fire_valid[g[mask], base[mask] + slot] = True
+
+		__add_fire(0, np.ones(len(g), dtype=bool), c)
+
+		obstacles = self.static_blocks | self.block_present | self.bomb_present
+		slot = 1
+		for dx, dy in _FIRE_DIRECTIONS:
+			spreading = np.ones(len(g), dtype=bool)
+			for i in range(1, max_power + 1):
+				x, y = bx + dx * i, by + dy * i
+				spreading &= (i <= power) & (x >= 0) & (x < self.column_count) & (y >= 0) & (y < self.row_count)
+				cell = np.where(spreading, x * H + y, 0)
+				__add_fire(slot, spreading, cell)
+
+				# Fire stops at the first block or bomb
+				spreading &= ~obstacles[g, cell]
+				slot += 1
+
+	def _free_cells(self) -> np.ndarray:
+		""" A mask of cells where new items can be spawned, same as Game._free_cells
+		"""
+		free = ~(self.static_blocks | self.block_present | self.bomb_present | self.ammo_present | self.treasure_present)
+		players = self.player_cell
+		free[self._rows[:, None], players] = False
+		return free
+
+	def _choose_spawn_cells(self, games:np.ndarray, free:np.ndarray, kind:DelayedEffectType) -> np.ndarray:
+		""" Pick a random free cell for each of the given games, -1 if there are no free cells
+		"""
+		candidates = free[games]
+		counts = candidates.sum(axis=1)
+		target = (self.rng.random(len(games)) * counts).astype(np.int64)
+		cells = np.argmax(np.cumsum(candidates, axis=1) > target[:, None], axis=1)
+		return np.where(counts > 0, cells, -1)
+
+	def _treasure_spawn_delay(self, games:np.ndarray, spawned:np.ndarray) -> np.ndarray:
+		""" Random number of ticks until the next treasure spawn, retry sooner if there was no place for the treasure
+		"""
+		rules = self.rules
+		return np.where(spawned,
+			self.rng.integers(rules.TREASURE_SPAWN_FREQUENCY_MIN, rules.TREASURE_SPAWN_FREQUENCY_MAX + 1, len(games)),
+			self.rng.integers(1, rules.TREASURE_SPAWN_FREQUENCY_MIN + 1, len(games)))
+
+	def _apply_effects(self):
+		rules = self.rules
+		free = None
+
+		games = np.nonzero(self.treasure_due == self._step)[0]
+		if len(games):
+			free = self._free_cells()
+			cells = self._choose_spawn_cells(games, free, DelayedEffectType.SPAWN_TREASURE)
+			spawned = cells >= 0
+			g, c = games[spawned], cells[spawned]
+			self.treasure_present[g, c] = True
+			self.treasure_value[g, c] = rules.TREASURE_REWARD
+			free[g, c] = False
+
+			self.treasure_due[games] = self._step + self._treasure_spawn_delay(games, spawned)
+
+		slot = self._step % self._effect_ring
+		pending = self.ammo_effects[:, slot].copy()
+		self.ammo_effects[:, slot] = 0
+		for k in range(pending.max()):
+			games = np.nonzero(pending > k)[0]
+			if free is None:
+				free = self._free_cells()
+			cells = self._choose_spawn_cells(games, free, DelayedEffectType.SPAWN_AMMO)
+			spawned = cells >= 0
+			g, c = games[spawned], cells[spawned]
+			self.ammo_present[g, c] = True
+			self.ammo_ttl[g, c] = rules.AMMO_PERISH_TTL
+			self.ammo_value[g, c] = 1
+			free[g, c] = False
+
+			# No place for ammo - try again later
+			self._enqueue_ammo(games[~spawned], rules.AMMO_RESPAWN_TTL)
+
+	def _enqueue_ammo(self, games:np.ndarray, delay:int):
+		np.add.at(self.ammo_effects, (games, (self._step + delay) % self._effect_ring), 1)
+
+	def _check_game_over(self, active:np.ndarray):
+		alive = self.player_alive
+		has_opponents = alive.sum(axis=1) > 1
+		over_iter_limit = self.tick_counter > self.max_iterations if self.max_iterations else np.zeros(self.n_games, dtype=bool)
+
+		game_over = active & (~has_opponents | over_iter_limit)
+		if not game_over.any():
+			return
+
+		self.is_over |= game_over
+
+		# Picking winners: last player standing or highest scoring player, the last one by pid among equals
+		reward = self.player_reward
+		top_score = reward.max(axis=1)
+		score_range = top_score - reward.min(axis=1)
+		P = self.n_players
+		top_player = P - 1 - np.argmax((reward == top_score[:, None])[:, ::-1], axis=1)
+		by_score = np.where(score_range != 0, top_player, -1)
+		last_standing = np.where(alive.any(axis=1), np.argmax(alive, axis=1), -1)
+
+		self.winner = np.where(game_over, np.where(has_opponents, by_score, last_standing), self.winner).astype(np.int32)
+
+	def stats(self, i:int, names:Optional[List[str]]=None) -> GameStats:
+		""" Get stats of the i-th game in the batch in the same form as Game.stats
+		"""
+		return GameStats(
+			is_over=bool(self.is_over[i]),
+			iteration=int(self.tick_counter[i]),
+			winner_pid=int(self.winner[i]) if self.winner[i] >= 0 else None,
+			players={p: PlayerStat(
+					name=names[p] if names else f"P[{p}]",
+					is_bot=True,
+					score=int(self.player_reward[i, p]),
+					hp=int(self.player_hp[i, p]),
+					ammo=int(self.player_ammo[i, p]),
+					position=(int(self.player_x[i, p]), int(self.player_y[i, p]))
+				) for p in range(self.n_players)},
+			agents={}
+		)
@@ -2,7 +2,7 @@ import random
 import logging
 
 from enum import Enum
-from typing import Dict, List, Tuple, Union, NamedTuple, Any, Optional
+from typing import Dict, Iterable, Iterator, List, Set, Tuple, Union, NamedTuple, Any, Optional
 # from dataclasses import dataclass
 from collections import defaultdict
 
@@ -48,18 +48,334 @@ class PlayerStat(NamedTuple):
 	ammo: int
 	position: Point
 
+class AgentStat(NamedTuple):
+	""" Timing of an agent over a match, see `agent_driver.agent.AgentAccounting` """
+	moves: int						# Moves the agent has made
+	latency_p50_ms: Optional[float]	# Percentiles of time the agent took to decide on a move
+	latency_p95_ms: Optional[float]
+	latency_p99_ms: Optional[float]
+	max_ticks_behind: int			# Most ticks the game was ahead of the state the agent answered
+	skipped_states: int				# States the agent never got to answer, as it was busy or they went stale
+	late_moves: int					# Lockstep moves that missed the move deadline
+	dropped_moves: int				# Moves dropped as they arrived after the deadline
+	over_budget_moves: int			# Moves dropped as they used more CPU time than the tick budget
+	cpu_time: Optional[float]		# CPU seconds used by the agent to decide on moves, None if not measured
+	out_of_budget: bool				# The agent has used up the match CPU budget and played NO-OP since
+	peak_rss_mb: Optional[float]	# Peak resident memory of the agent process in MB, None if not measured
+	disqualified: Optional[str]		# Reason the agent has been disqualified for breaching its resource limits, None if it has not
+
 # @dataclass
 class GameStats(NamedTuple):
 	is_over: bool
 	iteration:int
 	winner_pid: PID
 	players: Dict[PID, PlayerStat]
+	agents: Dict[PID, AgentStat]	# Timing of agents whose driver keeps it. No default: a NamedTuple would share one dict between all stats
+	start_latency_ms: Optional[float] = None	# Time from the start of the match until all agents are ready, if the match has been started by `main.run`
+	ticks_per_sec: Optional[float] = None	# Ticks per second achieved in turbo headless mode, if the match has been started by `main.run`
+
+
+class GameSnapshot(NamedTuple):
+	""" Mutable simulation state of a game in a compact form of plain tuples.
+	Snapshot does not include agents, recorder or game configuration: it is restored into a game of the same configuration.
+	"""
+	tick_counter: int
+	is_over: bool
+	winner_pid: Optional[PID]
+	pid_counter: int
+	players: Tuple[Tuple[PID, str, Point, int, int, int, int], ...]	# (pid, name, pos, hp, ammo, power, reward)
+	action_queue: Tuple[Tuple[PID, Tuple[PlayerActions, ...]], ...]
+	static_blocks: Tuple[Point, ...]
+	value_blocks: Tuple[Tuple[type, Point, int], ...]				# (block class, pos, hp)
+	ammo: Tuple[Tuple[Point, int, int, bool], ...]					# (pos, ttl, value, respawns on perish)
+	treasure: Tuple[Tuple[Point, int], ...]							# (pos, value)
+	bombs: Tuple[Tuple[PID, Point, int, int], ...]					# (owner, pos, ttl, power)
+	fire: Tuple[Tuple[PID, Point, int], ...]						# (owner, pos, ttl)
+	delayed_effects: Tuple[Tuple[DelayedEffectType, int], ...]		# (effect, ttl)
+	dead_bodies: Tuple[Tuple[PID, Point], ...]
+	rng_state: Any													# State of the game's random stream
+	free_cells: Tuple[Point, ...]									# Cells where items can spawn, in the order random choices are made from
 
 
 def collide(pos1:Point, pos2:Point) -> bool: 
 	return (pos1[0] == pos2[0]) and (pos1[1] == pos2[1])
 
 
+class _EntityLayer:
+	""" A collection of game entities of the same kind indexed by the cell they occupy.
+	Per-cell index turns collision queries into a single dictionary lookup and removal of an entity into an update of its cell.
+	The index is the only storage of the layer: entities are iterated cell by cell in the order cells were occupied,
+	entities sharing a cell in the order they were added. A layer must not be modified while it is iterated.
+	Layers that `track_changes` remember cells where entities appeared or disappeared since the last `take_changes` call.
+	Layers given `free_cells` take cells they occupy out of that set and return them once the last entity has left the cell.
+	"""
+	__slots__ = ('_cells', '_count', '_changes', '_free_cells', '_positions', '_tagged_positions')
+
+	def __init__(self, track_changes:bool=False, free_cells:'_FreeCells'=None):
+		self._cells:Dict[Point, Tuple[Any, ...]] = {}
+		self._count = 0
+		self._changes = set() if track_changes else None
+		self._free_cells = free_cells
+		self._positions = None
+		self._tagged_positions = None
+
+	def __iter__(self):
+		return (item for cell in self._cells.values() for item in cell)
+
+	def __len__(self):
+		return self._count
+
+	def __bool__(self):
+		return bool(self._cells)
+
+	def add(self, item):
+		""" Add an entity. Entities without a position can't be looked up and are not stored """
+		if item.pos is not None:
+			self._index(item)
+			self._count += 1
+
+	def at(self, pos:Point) -> Tuple[Any, ...]:
+		""" Get all the entities at the given location """
+		return self._cells.get(pos, ())
+
+	def move(self, item, pos:Point):
+		""" Update the location of an entity and keep cell index in sync """
+		self._unindex(item)
+		item.pos = pos
+		self._index(item)
+
+	def positions(self) -> Tuple[Point, ...]:
+		""" Positions of all the entities. The result is cached until the layer changes """
+		if self._positions is None:
+			self._positions = tuple(item.pos for item in self)
+		return self._positions
+
+	def tagged_positions(self) -> Tuple[Tuple[str, Point], ...]:
+		""" (Tag, position) pairs of all the entities. The result is cached until the layer changes """
+		if self._tagged_positions is None:
+			self._tagged_positions = tuple((item.Tag, item.pos) for item in self)
+		return self._tagged_positions
+
+	def take_changes(self) -> Set[Point]:
+		""" Get cells that have changed since the last call """
+		changes, self._changes = self._changes, set()
+		return changes
+
+	def remove(self, items:Iterable[Any]):
+		""" Remove given entities. Entities that are not in the layer (any more) are ignored """
+		for item in items:
+			if item in self._cells.get(item.pos, ()):
+				self._unindex(item)
+				self._count -= 1
+
+	def clear(self):
+		if self._free_cells is not None:
+			for pos in self._cells:
+				self._free_cells.vacate(pos)
+		self._cells = {}
+		self._count = 0
+		self._positions = self._tagged_positions = None
+		if self._changes is not None:
+			self._changes = set()
+
+	# Cells are tuples as most of them hold a single entity
+	def _index(self, item):
+		self._positions = self._tagged_positions = None
+		cell = self._cells.get(item.pos, ())
+		if not cell and self._free_cells is not None:
+			self._free_cells.occupy(item.pos)
+		self._cells[item.pos] = cell + (item,)
+		if self._changes is not None:
+			self._changes.add(item.pos)
+
+	def _unindex(self, item):
+		self._positions = self._tagged_positions = None
+		if self._changes is not None:
+			self._changes.add(item.pos)
+
+		cell = tuple(i for i in self._cells[item.pos] if i is not item)
+		if cell:
+			self._cells[item.pos] = cell
+		else:
+			del self._cells[item.pos]
+			if self._free_cells is not None:
+				self._free_cells.vacate(item.pos)
+
+
+class _CellSet:
+	""" A set of cells with O(1) add, discard and uniform random choice.
+	Cells are kept in a list for random access and each cell maps to its place in the list:
+	a cell is discarded by moving the last cell of the list into its place.
+	"""
+	__slots__ = ('_cells', '_places')
+
+	def __init__(self, cells:Iterable[Point]=()):
+		self.replace(cells)
+
+	def __len__(self):
+		return len(self._cells)
+
+	def __bool__(self):
+		return bool(self._cells)
+
+	def __contains__(self, pos:Point):
+		return pos in self._places
+
+	def __iter__(self):
+		return iter(self._cells)
+
+	def add(self, pos:Point):
+		if pos not in self._places:
+			self._places[pos] = len(self._cells)
+			self._cells.append(pos)
+
+	def discard(self, pos:Point):
+		place = self._places.pop(pos, None)
+		if place is not None:
+			last = self._cells.pop()
+			if place < len(self._cells):
+				self._cells[place] = last
+				self._places[last] = place
+
+	def replace(self, cells:Iterable[Point]):
+		""" Replace all the cells of the set. Random choices depend on the order of cells, which is kept as given """
+		self._cells = list(cells)
+		self._places = {pos: place for place, pos in enumerate(self._cells)}
+
+	def choice(self, rng:random.Random) -> Point:
+		return rng.choice(self._cells)
+
+	def sample(self, rng:random.Random, k:int) -> List[Point]:
+		return rng.sample(self._cells, k)
+
+
+class _FreeCells(_CellSet):
+	""" Cells where new items can be spawned: cells not occupied by players, blocks, ammo, treasure or bombs.
+	Entity layers report cells they start and stop occupying and a cell is free while no layer occupies it.
+	"""
+	__slots__ = ('_occupied',)
+
+	def __init__(self, cells:Iterable[Point]=()):
+		super().__init__(cells)
+		self._occupied:Dict[Point, int] = {} # Number of layers occupying a cell
+
+	def occupy(self, pos:Point):
+		count = self._occupied.get(pos, 0)
+		if not count:
+			self.discard(pos)
+		self._occupied[pos] = count + 1
+
+	def vacate(self, pos:Point):
+		count = self._occupied.pop(pos) - 1
+		if count:
+			self._occupied[pos] = count
+		else:
+			self.add(pos)
+
+
+class _TimerWheel:
+	""" Schedule of perishable entities bucketed by the tick they are due to expire on.
+	Advancing the wheel only touches entities expiring on that tick, so the cost of a tick doesn't depend on the number of pending timers.
+	Rescheduled entities are not searched for in their old bucket: bucket entries remember the due tick they were made for
+	and the ones that no longer match the entity are skipped.
+	"""
+	__slots__ = ('now', '_buckets')
+
+	def __init__(self):
+		self.now = 0
+		self._buckets:Dict[int, List[Tuple[Any, int]]] = {}
+
+	def schedule(self, item, ttl:int):
+		""" Schedule an entity to expire in `ttl` ticks """
+		item._timers = self
+		item._due = None
+		self.reschedule(item, self.now + ttl)
+		return item
+
+	def reschedule(self, item, due:int):
+		""" Change the tick an entity expires on. Entities that are overdue expire on the next tick """
+		if item._due == due and due <= self.now:
+			return # Already expiring on the next tick
+
+		item._due = due
+		self._buckets.setdefault(max(due, self.now + 1), []).append((item, due))
+
+	def cancel(self, item):
+		""" Stop the timer of an entity removed from the game before it has expired """
+		item._due = self.now
+
+	def advance(self) -> List[Any]:
+		""" Move to the next tick and return entities expiring on it in the order they were scheduled """
+		self.now += 1
+		return [item for item, due in self._buckets.pop(self.now, ()) if item._due == due]
+
+	def pending(self) -> Iterator[Any]:
+		""" All scheduled entities in the order they will expire """
+		for tick in sorted(self._buckets):
+			for item, due in self._buckets[tick]:
+				if item._due == due:
+					yield item
+
+
+class _ReadOnlyDict(dict):
+	""" Dictionary of a snapshot that agents in the game process can read but not change. The game writes it through `dict` methods.
+	Pickled as a plain dictionary, so agent processes get a copy of their own
+	"""
+	__slots__ = ()
+
+	def _read_only(self, *args, **kwargs):
+		raise TypeError("game state is read-only, copy it to make changes")
+
+	__setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _read_only
+
+	def __reduce__(self):
+		return (dict, (dict(self),))
+
+
+class _OccupancyMap:
+	""" Occupancy map of the game as nested dictionaries: column -> row -> entity tag.
+	Snapshots share columns with the map. A column is copied on the first write after a snapshot was taken,
+	so taking a snapshot costs O(columns) and only columns that have changed are copied.
+	Snapshots and their columns are read-only, so agents in the game process can not change the map of the game.
+	"""
+	__slots__ = ('_columns', '_owned', '_snapshot')
+
+	def __init__(self):
+		self._columns:Dict[int, Dict[int, Any]] = {}
+		self._owned:Set[int] = set()	# Columns not shared with any snapshot
+		self._snapshot = None
+
+	def set(self, pos:Point, tag):
+		""" Set a tag of the cell. None tag marks the cell as free """
+		x, y = pos
+		column = self._columns.get(x)
+		if tag is None and (column is None or y not in column):
+			return
+		if column is not None and column.get(y) == tag:
+			return
+
+		self._snapshot = None
+		if column is None:
+			column = self._columns[x] = _ReadOnlyDict()
+			self._owned.add(x)
+		elif x not in self._owned:
+			column = self._columns[x] = _ReadOnlyDict(column)
+			self._owned.add(x)
+
+		if tag is not None:
+			dict.__setitem__(column, y, tag)
+		else:
+			dict.__delitem__(column, y)
+			if not column:
+				del self._columns[x]
+
+	def snapshot(self) -> Dict[int, Dict[int, Any]]:
+		if self._snapshot is None:
+			self._snapshot = _ReadOnlyDict(self._columns)
+			self._owned.clear()
+		return self._snapshot
+
+
 class Recorder:
 	def record(self, tick:int, event:GameEvent):
 		pass
@@ -121,10 +437,14 @@ class Game:
 		}
 
 	class _Positioned:
+		__slots__ = ('pos',)
+
 		def __init__(self, pos: Point):
 			self.pos = pos
 
 	class _Destructable(_Positioned):
+		__slots__ = ('_ttl',)
+
 		def __init__(self, ttl:int, pos: Point):
 			super().__init__(pos)
 			self._ttl = ttl
@@ -144,28 +464,54 @@ class Game:
 		def update(self) -> int:
 			return self._ttl
 
-	class _Perishable(_Destructable):
-		def update(self) -> int:
-			return self.apply_hit(1)
+	class _Perishable(_Positioned):
+		""" An entity that expires after a number of ticks. Time-to-live is kept by the timer wheel the entity is scheduled on """
+		__slots__ = ('_timers', '_due')
+
+		def __init__(self, pos: Point):
+			super().__init__(pos)
+			self._timers = None
+			self._due = 0
+
+		@property
+		def is_alive(self):
+			return self.hp > 0
+
+		@property
+		def hp(self):
+			return self._due - self._timers.now
+
+		def apply_hit(self, delta_ttl:int) -> int:
+			self._timers.reschedule(self, self._due - delta_ttl)
+			return self.hp
 
 	class _DelayedEffect(_Perishable):
-		def __init__(self, effect: DelayedEffectType, ttl:int):
-			super().__init__(ttl=ttl, pos=None)
+		__slots__ = ('effect',)
+
+		def __init__(self, effect: DelayedEffectType):
+			super().__init__(pos=None)
 			self.effect = effect
 
 	class _OwnedPositionedPerishable(_Perishable):
-		def __init__(self, owner_id, pos: Point, ttl:int=1):
-			super().__init__(pos=pos, ttl=ttl)
+		__slots__ = ('owner_id',)
+
+		def __init__(self, owner_id, pos: Point):
+			super().__init__(pos=pos)
 			self.owner_id = owner_id
 
 	class _DeadBody(_Positioned):
+		__slots__ = ('pid',)
+
 		def __init__(self, pid, pos: Point):
 			super().__init__(pos=pos)
 			self.pid = pid
 
 	class _Player(_Destructable):
-		def __init__(self, hp:int, pos:Point, ammo:int, name:str, power:int, reward:int=0):
+		__slots__ = ('name', 'ammo', 'reward', 'power', 'pid')
+
+		def __init__(self, hp:int, pos:Point, ammo:int, name:str, power:int, reward:int=0, pid:PID=None):
 			super().__init__(pos=pos, ttl=hp)
+			self.pid = pid
 			self.name = name
 			self.ammo = ammo
 			self.reward = reward
@@ -173,10 +519,11 @@ class Game:
 			
 
 	class _Ammunitation(_Perishable):
+		__slots__ = ('value', 'on_perish')
 		Tag = EntityTags.Ammo.value
 
-		def __init__(self, pos: Point, ttl: int, value: int=1, on_perish=None):
-			super().__init__(pos=pos, ttl=ttl)
+		def __init__(self, pos: Point, value: int=1, on_perish=None):
+			super().__init__(pos=pos)
 			self.value = value
 			self.on_perish = on_perish
 
@@ -184,13 +531,9 @@ class Game:
 		def is_alive(self):
 			return super().is_alive and self.value > 0
 
-		def update(self):
-			super().update()
-			if not self.hp and self.on_perish:
-				self.on_perish()
-
 
 	class _Treasure(_Destructable):
+		__slots__ = ('value',)
 		Tag = EntityTags.Treasure.value
 
 		def __init__(self, pos: Point, value: int=None, ttl=1):
@@ -206,19 +549,22 @@ class Game:
 
 
 	class _Bomb(_OwnedPositionedPerishable):
+		__slots__ = ('power',)
 		Tag = EntityTags.Bomb.value
 
-		def __init__(self, owner_id:PID, pos:Point, ttl:int, power:int):
-			super().__init__(owner_id=owner_id, pos=pos, ttl=ttl)
+		def __init__(self, owner_id:PID, pos:Point, power:int):
+			super().__init__(owner_id=owner_id, pos=pos)
 			self.power = power
 
 	class _Fire(_OwnedPositionedPerishable):
-		pass
+		__slots__ = ()
 
 	class _IndestructibleBlock(_Positioned):
+		__slots__ = ()
 		Tag = EntityTags.IndestructibleBlock.value
 
 	class _SoftBlock(_Destructable):
+		__slots__ = ('reward',)
 		Tag = EntityTags.SoftBlock.value
 
 		def __init__(self, pos:Point, hp:int):
@@ -226,6 +572,7 @@ class Game:
 			self.reward = Game.SOFT_BLOCK_REWARD
 
 	class _OreBlock(_Destructable):
+		__slots__ = ('reward',)
 		Tag = EntityTags.OreBlock.value
 
 		def __init__(self, pos:Point, hp:int):
@@ -233,11 +580,20 @@ class Game:
 			self.reward = Game.ORE_BLOCK_REWARD
 
 
-	def __init__(self, row_count=ROW_COUNT, column_count=COLUMN_COUNT, max_iterations=None, recorder=Recorder()):
+	def __init__(self, row_count=ROW_COUNT, column_count=COLUMN_COUNT, max_iterations=None, recorder=Recorder(), seed=None, observation=False):
 		self.row_count = row_count
 		self.column_count = column_count
 		self.recorder = recorder
 
+		# Dense observation for agents is optional, as it needs NumPy
+		self._encode_observation = None
+		if observation:
+			from .observation import encode
+			self._encode_observation = encode
+
+		# Each game owns its random stream, so games running side by side don't affect each other's randomness
+		self._rng = random.Random(seed)
+
 		self.ACTION_CODES.setdefault(None)
 
 		self.max_iterations = max_iterations
@@ -263,12 +619,18 @@ class Game:
 		"""
 		player_id = self._next_pid()
 		name = name or f"P[{player_id}]"
-		self.players[player_id] = self._Player(hp=self.PLAYER_START_HP, pos=None, ammo=self.PLAYER_START_AMMO, name=name, power=self.PLAYER_START_POWER)
+		self.players[player_id] = self._Player(hp=self.PLAYER_START_HP, pos=None, ammo=self.PLAYER_START_AMMO, name=name, power=self.PLAYER_START_POWER, pid=player_id)
 
 		self.recorder.record(self.tick_counter, GameSysAction(GameSysActions.PLAYER_ADDED, name))
 
 		return player_id
 
+	def reset_agents(self):
+		""" Reset all agents of the game, so that the next game is played by fresh agents
+		"""
+		for agent in self._agents.values():
+			agent.reset()
+
 	def is_bot(self, pid:int) -> bool:
 		""" Test if a give player_id belongs to the bot or a human player
 		"""
@@ -290,6 +652,8 @@ class Game:
 		Then all enqueed player actions are applied first and object positions are updated accordingly.
 
 		"""
+		# Entities destroyed or picked up on this tick, removed at the end of the tick
+		destroyed_blocks, picked_ammo, picked_treasure = [], [], []
 		if not self.is_over:
 			# Gather commands from agents
 			for pid, agent in self._agents.items():
@@ -306,15 +670,14 @@ class Game:
 			
 			# Randomize the order in which actions appied.
 			# This compemsates for low resolution of 100ms where informaion about exact timing of commands is lost.
-			random.shuffle(orders_for_tick)
+			self._rng.shuffle(orders_for_tick)
 			for pid, action in orders_for_tick:
 				self._apply_action(pid, action)
 
 			# Apply fire!
 			## Check if any player stepped into a fire-zone
 			for pid, player in self._alive_players():
-				hit_list = self._collision_list(player.pos, self.fire_list)
-				for hit in hit_list:
+				for hit in self.fire_list.at(player.pos):
 					fire_owner = self.players[hit.owner_id] if hit.owner_id in self.players else None
 
 					# Apply fire damage to the player
@@ -330,63 +693,67 @@ class Game:
 				fire_owner = self.players[fire.owner_id] if fire.owner_id in self.players else None
 				
 				## Check for fire damage of static blocks and collect rewads
-				hitblock_list = self._collision_list(fire.pos, self.value_block_list)
-				for block in hitblock_list:
+				for block in self.value_block_list.at(fire.pos):
 					block.apply_hit(self.FIRE_HIT)
-					if not block.is_alive and fire_owner:
-						fire_owner.reward += block.reward
+					if not block.is_alive:
+						destroyed_blocks.append(block)
+						if fire_owner:
+							fire_owner.reward += block.reward
 				
 				## Check for fire damage of nearby bombs and set them off
-				hitbomb_list = self._collision_list(fire.pos, self.bomb_list)
-				for bomb in hitbomb_list:
+				for bomb in self.bomb_list.at(fire.pos):
 					bomb.apply_hit(bomb.hp)
 
 			# Alive players get to pickup static rewards:
 			for pid, player in self._alive_players():
 				if player.is_alive: # Dead players are not allowed to pickup items
 					# Pickup ammo:
-					ammo_found = self._collision_list(player.pos, self.ammunition_list)
-					for am in ammo_found:
+					for am in self.ammunition_list.at(player.pos):
 						player.ammo += am.value
 						am.value = 0
+						picked_ammo.append(am)
 
 					# Pickup treasures:
-					treasure_found = self._collision_list(player.pos, self.treasure_list)
-					for treasure in treasure_found:
+					for treasure in self.treasure_list.at(player.pos):
 						player.reward += treasure.value
 						treasure.value = 0
-
-		# Update effects and lists
-		self.__update_list(self._delayed_effects)
-		self.__update_list(self.bomb_list)
-		self.__update_list(self.fire_list)
-		self.__update_list(self.ammunition_list)
-		self.__update_list(self.value_block_list)
-		self.__update_list(self.players.values())
+						picked_treasure.append(treasure)
+
+		# Advance timers: only effects, bombs, fire and ammo running out of time on this tick are touched.
+		# Blocks, treasures and players don't perish with time
+		expired_effects = self._effect_timers.advance()
+		expired_bombs = self._bomb_timers.advance()
+		expired_fire = self._fire_timers.advance()
+		expired_ammo = self._ammo_timers.advance()
+		for ammo in expired_ammo:
+			if ammo.on_perish:
+				ammo.on_perish()
 		
 		# Turn not alive player into dead bodies:
 		for pid, player in self.players.items():
 			if not player.is_alive:
 				self.dead_player_list.append(self._DeadBody(pid, player.pos))
 
-		# Convert expired bomb into fire
-		for p in self.bomb_list:
-			if not p.is_alive: # Start a fire
-				self._start_fire(p.owner_id, p.pos, p.power)
+		# Convert expired bomb into fire, in the order bombs were placed
+		if expired_bombs:
+			expired = set(expired_bombs)
+			for p in self.bomb_list:
+				if p in expired:
+					self._start_fire(p.owner_id, p.pos, p.power)
 
 		# Apply delayed effects
-		for p in self._delayed_effects:
-			if not p.is_alive: # Apply delayed effect
-				self._apply_effect(p.effect)
+		for p in expired_effects:
+			self._apply_effect(p.effect)
 
 		# Remove expired entiries
-		self._delayed_effects = self._only_alive(self._delayed_effects)
-
-		self.ammunition_list =	self._only_alive(self.ammunition_list)
-		self.treasure_list = 	self._only_alive(self.treasure_list)
-		self.bomb_list = 		self._only_alive(self.bomb_list)
-		self.fire_list =		self._only_alive(self.fire_list)
-		self.value_block_list =	self._only_alive(self.value_block_list)
+		for ammo in picked_ammo:
+			self._ammo_timers.cancel(ammo)
+		self.ammunition_list.remove(expired_ammo)
+		self.ammunition_list.remove(picked_ammo)
+		self.treasure_list.remove(picked_treasure)
+		self.bomb_list.remove(expired_bombs)
+		self.fire_list.remove(expired_fire)
+		self.value_block_list.remove(destroyed_blocks)
 		#self.players = dict(filter(lambda p: p.is_alive, self.players.values()))
 
 		# Evaluate game termination rules
@@ -408,11 +775,11 @@ class Game:
 				else:
 					self.winner = next(((pid,p) for pid,p in self.players.items() if p.is_alive), None)
 
-			game_state = self._serialize_state()
-			
-			# Update agents view of the world
-			for pid, agent in self._agents.items():
-				self._update_agent(dt, pid, agent, game_state)
+			# Update agents view of the world. Games without agents, such as clones used for search, skip the serialization
+			if self._agents:
+				game_state = self._serialize_state()
+				for pid, agent in self._agents.items():
+					self._update_agent(dt, pid, agent, game_state)
 
 		self.tick_counter += 1
 
@@ -433,151 +800,249 @@ class Game:
 			is_over=self.is_over,
 			iteration=self.tick_counter, 
 			winner_pid=self.winner[0] if self.winner else None,
-			players={ k: self._player_stat(k, p) for k, p in self.players.items()}
+			players={ k: self._player_stat(k, p) for k, p in self.players.items()},
+			agents={ k: a.accounting.stat() for k, a in self._agents.items() if getattr(a, 'accounting', None) }
 		)
 
 
 	@property
 	def all_blocks(self):
-		return self.static_block_list + self.value_block_list
+		return [*self.static_block_list, *self.value_block_list]
 
 	@property
 	def all_entities(self):
 		# Combine all alive entities into a single list for quereing by the render engine
-		return \
-			self.static_block_list + \
-			self.ammunition_list + \
-			self.treasure_list + \
-			self.bomb_list + \
-			self.fire_list + \
-			self.value_block_list
+		return [
+			*self.static_block_list,
+			*self.ammunition_list,
+			*self.treasure_list,
+			*self.bomb_list,
+			*self.fire_list,
+			*self.value_block_list
+		]
+
+
+	def snapshot(self) -> GameSnapshot:
+		""" Capture mutable state of the game to be restored later. Agents and recorder are not captured """
+		return GameSnapshot(
+			tick_counter=self.tick_counter,
+			is_over=self.is_over,
+			winner_pid=self.winner[0] if self.winner else None,
+			pid_counter=self._pid_counter,
+			players=tuple((pid, p.name, p.pos, p._ttl, p.ammo, p.power, p.reward) for pid, p in self.players.items()),
+			action_queue=tuple((pid, tuple(queue)) for pid, queue in self._action_queue.items()),
+			static_blocks=self.static_block_list.positions(),
+			value_blocks=tuple((type(b), b.pos, b._ttl) for b in self.value_block_list),
+			ammo=tuple((a.pos, a.hp, a.value, a.on_perish is not None) for a in self.ammunition_list),
+			treasure=tuple((t.pos, t.value) for t in self.treasure_list),
+			bombs=tuple((b.owner_id, b.pos, b.hp, b.power) for b in self.bomb_list),
+			fire=tuple((f.owner_id, f.pos, f.hp) for f in self.fire_list),
+			delayed_effects=tuple((e.effect, e.hp) for e in self._effect_timers.pending()),
+			dead_bodies=tuple((body.pid, body.pos) for body in self.dead_player_list),
+			rng_state=self._rng.getstate(),
+			free_cells=tuple(self._free_cells),
+		)
 
+	def restore(self, snapshot:GameSnapshot):
+		""" Reset the game to the state captured by `snapshot`. Agents and recorder of this game are kept as is """
+		self.is_over = snapshot.is_over
+		self.tick_counter = snapshot.tick_counter
+		self._pid_counter = snapshot.pid_counter
+		self._new_layers()
+
+		self.players = {}
+		for pid, name, pos, hp, ammo, power, reward in snapshot.players:
+			player = self.players[pid] = self._Player(hp=hp, pos=pos, ammo=ammo, name=name, power=power, reward=reward, pid=pid)
+			self._player_cells.add(player)
+		self.winner = (snapshot.winner_pid, self.players[snapshot.winner_pid]) if snapshot.winner_pid is not None else None
+
+		for pid, queue in snapshot.action_queue:
+			self._action_queue[pid] = list(queue)
+
+		for pos in snapshot.static_blocks:
+			self.static_block_list.add(self._IndestructibleBlock(pos))
+		for block_type, pos, hp in snapshot.value_blocks:
+			self.value_block_list.add(block_type(pos, hp))
+		for pos, ttl, value, respawns in snapshot.ammo:
+			self._add_ammo(pos, ttl, value=value, on_perish=self._respawn_ammo if respawns else None)
+		for pos, value in snapshot.treasure:
+			self.treasure_list.add(self._Treasure(pos, value))
+		for owner_id, pos, ttl, power in snapshot.bombs:
+			self._add_bomb(owner_id, pos, ttl, power)
+		for owner_id, pos, ttl in snapshot.fire:
+			self._add_fire(owner_id, pos, ttl)
+		for effect, ttl in snapshot.delayed_effects:
+			self._enqueue_effect(effect, ttl)
+		self.dead_player_list = [self._DeadBody(pid, pos) for pid, pos in snapshot.dead_bodies]
+		self._rng.setstate(snapshot.rng_state)
+		self._free_cells.replace(snapshot.free_cells)
+
+	def clone(self) -> 'Game':
+		""" Create an independent copy of the game to simulate ahead.
+		The clone has the same configuration and state, but no agents and no recorder: it is advanced with `enqueue_action` and `tick`.
+		The clone continues the random stream of the game, so the same actions played on both lead to the same outcome.
+		"""
+		game = type(self).__new__(type(self))
+		game.__dict__.update((key, value) for key, value in self.__dict__.items() if key.isupper()) # Game rules overridden per instance
+		game.row_count = self.row_count
+		game.column_count = self.column_count
+		game.max_iterations = self.max_iterations
+		game.recorder = Recorder()
+		game._encode_observation = self._encode_observation
+		game._agents = {}
+		game._rng = random.Random()
+		game.restore(self.snapshot())
+		return game
 
 	def _reset_state(self):
 		self.is_over = False
 		self.winner = None
 		self.tick_counter = 0
+		self._new_layers()
+
+		for player in self.players.values():
+			player.ammo = self.PLAYER_START_AMMO
+			player.power = self.PLAYER_START_POWER
+			player.reward = 0
+			player._ttl = self.PLAYER_START_HP
 
+	def _new_layers(self):
 		# Recet actions queues
 		self._action_queue:Dict[PID, List[PlayerActions]] = defaultdict(lambda: [])
-		self._delayed_effects:List[Game._DelayedEffect] = []
 
-		self.static_block_list:List[Game._IndestructibleBlock] = []
+		# Perishable entities expire by timers rather than being counted down every tick
+		self._effect_timers = _TimerWheel()
+		self._bomb_timers = _TimerWheel()
+		self._fire_timers = _TimerWheel()
+		self._ammo_timers = _TimerWheel()
 
-		self.ammunition_list:List[Game._Ammunitation] = []
-		self.treasure_list:List[Game._Treasure] = []
-		self.bomb_list:List[Game._Bomb] = []
-		self.fire_list:List[Game._Fire] = []
-		self.value_block_list:List[Game._Destructable] = []
+		# Cells where items can spawn are kept up to date by the layers of entities occupying them
+		self._free_cells = _FreeCells((x, y) for x in range(self.column_count) for y in range(self.row_count))
+
+		# Entities are kept in per-cell indexed layers to make collision checks O(1)
+		free_cells = self._free_cells
+		self.static_block_list = _EntityLayer(track_changes=True, free_cells=free_cells)
+
+		self.ammunition_list = _EntityLayer(track_changes=True, free_cells=free_cells)
+		self.treasure_list = _EntityLayer(track_changes=True, free_cells=free_cells)
+		self.bomb_list = _EntityLayer(track_changes=True, free_cells=free_cells) # Order of bombs decides the order of fires
+		self.fire_list = _EntityLayer() # Fires in a cell collect rewards in the order they were started
+		self.value_block_list = _EntityLayer(track_changes=True, free_cells=free_cells)
 		self.dead_player_list:List[Game._DeadBody] = []
+		self._player_cells = _EntityLayer(track_changes=True, free_cells=free_cells) # Players are placed by map generation or restore
 
-		for player in self.players.values():
-			player.ammo = self.PLAYER_START_AMMO
-			player.power = self.PLAYER_START_POWER
-			player.reward = 0
-			player._ttl = self.PLAYER_START_HP
+		# Occupancy map for agents is updated from the cells that changed since the last update
+		self._occupancy = _OccupancyMap()
+		self._blocks_snapshot = ((), (), ())
 
 
-	def generate_map(self, seed=1):
+	def generate_map(self, seed=None):
+		""" Generate a new random map and reset the state of the game.
+		If a seed is given, the random stream of the game is reseeded first, so the map and the match played on it can be reproduced.
+		"""
+		if seed is not None:
+			self._rng.seed(seed)
+
 		self._reset_state()
 
 		# FIXME: We need to record enqueued delayed effects, otherwise replay won't match
-		self._enqueue_effect(DelayedEffectType.SPAWN_TREASURE, ttl=random.randint(self.TREASURE_SPAWN_FREQUENCY_MIN, self.TREASURE_SPAWN_FREQUENCY_MAX))
+		self._enqueue_effect(DelayedEffectType.SPAWN_TREASURE, ttl=self._rng.randint(self.TREASURE_SPAWN_FREQUENCY_MIN, self.TREASURE_SPAWN_FREQUENCY_MAX))
 
-		all_cells = []
-		for x in range(0, self.column_count):
-			for y in range(0, self.row_count):
-				all_cells.append((x,y))
+		# Cells not taken yet or reserved around players
+		all_cells = _CellSet((x, y) for x in range(self.column_count) for y in range(self.row_count))
 
 		# Place players
 		for player in self.players.values():
-			player.pos = random.choice(all_cells)
-			all_cells.remove(player.pos)
+			player.pos = all_cells.choice(self._rng)
+			all_cells.discard(player.pos)
 			# Make sure there are at least 5 free cells around a player spawning position
 			x, y = player.pos
 			cross =  [ (x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1) ]
 			extras = [ (x - 2, y), (x + 2, y), (x, y - 2), (x, y + 2) ]
 			for c in cross:
-				if c in all_cells:
-					all_cells.remove(c)
+				all_cells.discard(c)
 			while extras:
-				e_id = random.choice(range(0, len(extras)))
+				e_id = self._rng.choice(range(0, len(extras)))
 				e = extras.pop(e_id)
 				if e in all_cells:
-					all_cells.remove(e)
+					all_cells.discard(e)
 					break
 
-		static_blocks = random.sample(all_cells, self.STATIC_BLOCK_COUNT)
+			self._player_cells.add(player)
+
+		static_blocks = all_cells.sample(self._rng, self.STATIC_BLOCK_COUNT)
 		for cell in static_blocks:
-			self.static_block_list.append(self._IndestructibleBlock(cell))
-			all_cells.remove(cell)
+			self.static_block_list.add(self._IndestructibleBlock(cell))
+			all_cells.discard(cell)
 
-		soft_blocks = random.sample(all_cells, self.SOFT_BLOCK_COUNT)
+		soft_blocks = all_cells.sample(self._rng, self.SOFT_BLOCK_COUNT)
 		for cell in soft_blocks:
-			self.value_block_list.append(self._SoftBlock(cell, self.SOFTBLOCK_HP))
-			all_cells.remove(cell)
+			self.value_block_list.add(self._SoftBlock(cell, self.SOFTBLOCK_HP))
+			all_cells.discard(cell)
 
-		ore_blocks = random.sample(all_cells, self.ORE_BLOCK_COUNT)
+		ore_blocks = all_cells.sample(self._rng, self.ORE_BLOCK_COUNT)
 		for cell in ore_blocks:
-			self.value_block_list.append(self._OreBlock(cell, self.ORE_BLOCK_HP))
-			all_cells.remove(cell)
+			self.value_block_list.add(self._OreBlock(cell, self.ORE_BLOCK_HP))
+			all_cells.discard(cell)
 
-		free_ammo = random.sample(all_cells, self.FREE_AMMO_COUNT)
+		free_ammo = all_cells.sample(self._rng, self.FREE_AMMO_COUNT)
 		for cell in free_ammo:
-			self.ammunition_list.append(self._Ammunitation(cell, ttl=self.AMMO_PERISH_TTL, on_perish=lambda: self._enqueue_effect(DelayedEffectType.SPAWN_AMMO, ttl=self.AMMO_RESPAWN_TTL)))
-			all_cells.remove(cell)
+			self._add_ammo(cell, self.AMMO_PERISH_TTL, on_perish=self._respawn_ammo)
+			all_cells.discard(cell)
 
 		self.recorder.record(self.tick_counter, GameSysAction(GameSysActions.MAP, self._serialize_map()))
 
 	def _serialize_state(self) -> GameState:
+		# State is a snapshot sharing unchanged data with the game and previous states
 		return GameState(
 				is_over=self.is_over,
 				tick_number=self.tick_counter,
 				size=(self.column_count, self.row_count),
 				
 				game_map=self._serialize_map(),
-				ammo=[a.pos for a in self.ammunition_list].copy(),
-				treasure=[a.pos for a in self.treasure_list].copy(),
-				bombs=[a.pos for a in self.bomb_list].copy(),
-				blocks=[(block.Tag, block.pos) for block in self.all_blocks].copy(),
-				players=[(pid, player.pos) for pid, player in self.players.items()].copy(),
+				ammo=self.ammunition_list.positions(),
+				treasure=self.treasure_list.positions(),
+				bombs=self.bomb_list.positions(),
+				blocks=self._serialize_blocks(),
+				players=tuple((pid, player.pos) for pid, player in self.players.items()),
+				observation=self._encode_observation(self) if self._encode_observation else None,
 			)
 
-	def _serialize_map(self):
-		# Build an occupancy map for AI-agents to base decisions on
-		game_map ={}
-
-		def __set_tag(pos, tag):
-			game_map.setdefault(pos[0], {})
-			game_map[pos[0]][pos[1]] = tag
-
-		for pid, player in self.players.items():
-			__set_tag(player.pos, pid)
+	def _serialize_blocks(self):
+		static_blocks = self.static_block_list.tagged_positions()
+		value_blocks = self.value_block_list.tagged_positions()
+		cached_static, cached_value, blocks = self._blocks_snapshot
+		if cached_static is not static_blocks or cached_value is not value_blocks:
+			blocks = static_blocks + value_blocks
+			self._blocks_snapshot = (static_blocks, value_blocks, blocks)
 
-		for item in self.static_block_list:
-			__set_tag(item.pos, item.Tag)
+		return blocks
 
-		for item in self.value_block_list:
-			__set_tag(item.pos, item.Tag)
+	def _serialize_map(self):
+		# Occupancy map for AI-agents to base decisions on. Only cells that have changed are updated
+		changes = set()
+		for layer in (self._player_cells, self.static_block_list, self.value_block_list, self.ammunition_list, self.treasure_list, self.bomb_list):
+			changes.update(layer.take_changes())
 
-		for item in self.ammunition_list:
-			__set_tag(item.pos, item.Tag)
+		for pos in changes:
+			self._occupancy.set(pos, self._cell_tag(pos))
 
-		for item in self.treasure_list:
-			__set_tag(item.pos, item.Tag)
+		return self._occupancy.snapshot()
 
-		for item in self.bomb_list:
-			__set_tag(item.pos, item.Tag)
+	def _cell_tag(self, pos:Point):
+		# Top-most entity in a cell is visible: bombs, then treasure, ammo, blocks and players last
+		for layer in (self.bomb_list, self.treasure_list, self.ammunition_list, self.value_block_list, self.static_block_list):
+			items = layer.at(pos)
+			if items:
+				return items[-1].Tag
 
-		return game_map		
+		players = self._player_cells.at(pos)
+		return max(player.pid for player in players) if players else None
 
 	def _is_in_bounds(self, p:Point):
 		return  p[0] >= 0 and p[0] < self.column_count and \
 				p[1] >= 0 and p[1] < self.row_count
 
-	def _collision_list(self, pos, items_list):
-		return [p for p in items_list if collide(pos, p.pos)]
-
 	def _next_pid(self) -> PID:
 		pid, self._pid_counter = self._pid_counter, self._pid_counter + 1
 		return pid
@@ -586,7 +1051,16 @@ class Game:
 		if not effect or ttl <= 0:
 			return
 
-		self._delayed_effects.append(self._DelayedEffect(effect=effect, ttl=ttl))
+		self._effect_timers.schedule(self._DelayedEffect(effect=effect), ttl)
+
+	def _add_ammo(self, pos:Point, ttl:int, value:int=1, on_perish=None):
+		self.ammunition_list.add(self._ammo_timers.schedule(self._Ammunitation(pos, value=value, on_perish=on_perish), ttl))
+
+	def _add_bomb(self, owner_pid:PID, pos:Point, ttl:int, power:int):
+		self.bomb_list.add(self._bomb_timers.schedule(self._Bomb(owner_pid, pos, power), ttl))
+
+	def _add_fire(self, owner_pid:PID, pos:Point, ttl:int=1):
+		self.fire_list.add(self._fire_timers.schedule(self._Fire(owner_pid, pos), ttl))
 
 
 	def _apply_action(self, pid: PID, action: PlayerActions) -> bool:
@@ -619,13 +1093,6 @@ class Game:
 			logger.error(f"Attempt to apply unknown effect: '{effect}'")
 			# TODO: Record cheeting attempt
 
-	def __update_list(self, lt):
-		for i in lt:
-			i.update()
-
-	def _only_alive(self, items):
-		return [i for i in items if i.is_alive]
-
 	def _alive_players(self) -> List[Tuple[PID, _Player]]:
 		return [(pid,p) for pid,p in self.players.items() if p.is_alive]
 
@@ -664,17 +1131,17 @@ class Game:
 		if not self._is_in_bounds(pos):
 			return False
 		
-		if self._collision_list(pos, self.all_blocks) or self._collision_list(pos, self.bomb_list):
-			self.fire_list.append(self._Fire(owner_pid, pos))
+		if self._has_block(pos) or self.bomb_list.at(pos):
+			self._add_fire(owner_pid, pos)
 			return False
 
-		self.fire_list.append(self._Fire(owner_pid, pos))
+		self._add_fire(owner_pid, pos)
 		return True
 
 	def _start_fire(self, owner_pid:PID, loc:Point, power:int):
 		(cell_x, cell_y) = loc
 
-		self.fire_list.append(self._Fire(owner_pid, loc))
+		self._add_fire(owner_pid, loc)
 		for i in range(1, power + 1):
 			if not self._try_add_fire(owner_pid, (cell_x - i, cell_y)): 
 				break
@@ -695,14 +1162,12 @@ class Game:
 		if player.ammo <= 0: # Need to have something to place
 			return False
 		
-		hit_list = self._collision_list(player.pos, self.bomb_list)
-		if hit_list: # Don't place a bomb on top of a bomb!
+		if self.bomb_list.at(player.pos): # Don't place a bomb on top of a bomb!
 			return False
 
 		player.ammo -= 1
 
-		self.bomb_list.append(self._Bomb(pid, player.pos, self.BOMB_TTL, player.power))
-		# TODO Update occupancy greed
+		self._add_bomb(pid, player.pos, self.BOMB_TTL, player.power)
 
 		# Schedule respawn of an ammo for the next turn
 		self._enqueue_effect(DelayedEffectType.SPAWN_AMMO, ttl=self.AMMO_RESPAWN_TTL)
@@ -714,80 +1179,41 @@ class Game:
 		if self._has_collision(new_loc):
 			return False
 
-		player.pos = new_loc
+		self._player_cells.move(player, new_loc)
 		
 		return True
 
-	def _pick_good_spots(self):
-		all_cells = []
-
-		def __safe_remove(pos):
-			try:
-				all_cells.remove(pos)
-			except:
-				pass
-
-		for x in range(0, self.column_count):
-			for y in range(0, self.row_count):
-				all_cells.append((x,y))
-
-		# Don't spawn ammo on top of a player
-		for player in self.players.values():
-			__safe_remove(player.pos)
-
-		# Don't spawn ammo on top of a block
-		for block in self.all_blocks:
-			__safe_remove(block.pos)
-
-		# Don't spawn ammo on top of another ammo
-		for ammo in self.ammunition_list:
-			__safe_remove(ammo.pos)
-
-		# Don't spawn ammo on top of treasure ammo
-		for ammo in self.treasure_list:
-			__safe_remove(ammo.pos)
-
-		# Don't spawn ammo on top of a bomb
-		for ammo in self.bomb_list:
-			__safe_remove(ammo.pos)
-
-		return all_cells
-
 	def _spawn_treasure(self):
-		good_locations = self._pick_good_spots()
-		if not good_locations:
-			self._enqueue_effect(DelayedEffectType.SPAWN_TREASURE, ttl=random.randint(1, self.TREASURE_SPAWN_FREQUENCY_MIN))
+		if not self._free_cells:
+			self._enqueue_effect(DelayedEffectType.SPAWN_TREASURE, ttl=self._rng.randint(1, self.TREASURE_SPAWN_FREQUENCY_MIN))
 			return False
 
-		loc = random.choice(good_locations)
-		self.treasure_list.append(Game._Treasure(loc))
-		self._enqueue_effect(DelayedEffectType.SPAWN_TREASURE, ttl=random.randint(self.TREASURE_SPAWN_FREQUENCY_MIN, self.TREASURE_SPAWN_FREQUENCY_MAX))
+		loc = self._free_cells.choice(self._rng)
+		self.treasure_list.add(Game._Treasure(loc))
+		self._enqueue_effect(DelayedEffectType.SPAWN_TREASURE, ttl=self._rng.randint(self.TREASURE_SPAWN_FREQUENCY_MIN, self.TREASURE_SPAWN_FREQUENCY_MAX))
 
 		return True
 	
 	def _spawn_ammo(self):
-		good_locations = self._pick_good_spots()
-		if not good_locations:
+		if not self._free_cells:
 			self._enqueue_effect(DelayedEffectType.SPAWN_AMMO, ttl=self.AMMO_RESPAWN_TTL)
 			return False
 
-		loc = random.choice(good_locations)
-		self.ammunition_list.append(self._Ammunitation(loc, ttl=self.AMMO_PERISH_TTL, on_perish=lambda: self._enqueue_effect(DelayedEffectType.SPAWN_AMMO, ttl=self.AMMO_RESPAWN_TTL)))
+		loc = self._free_cells.choice(self._rng)
+		self._add_ammo(loc, self.AMMO_PERISH_TTL, on_perish=self._respawn_ammo)
 		
 		return True
 
+	def _respawn_ammo(self):
+		self._enqueue_effect(DelayedEffectType.SPAWN_AMMO, ttl=self.AMMO_RESPAWN_TTL)
+
+	def _has_block(self, pos:Point) -> bool:
+		""" Check if given postion overlaps with any of the blocks """
+		return bool(self.static_block_list.at(pos) or self.value_block_list.at(pos))
+
 	def _has_collision(self, pos:Point) -> bool:
 		""" It checks if a player can move to a new location"""
 		# Check if given postion overlaps with any of the blocks
-		hit_list = self._collision_list(pos, self.all_blocks)
-
-		# Check if given postion overlaps with any of the players
-		# This makes players non-clipable
-		hit_list += self._collision_list(pos, self.players.values())
-
-		# Make bomb non-clipable
-		hit_list += self._collision_list(pos, self.bomb_list)
-
-		# Loop through each colliding sprite, remove it, and add to the score.
-		return len(hit_list) > 0
+		# Players are non-clipable and so are bombs
+		return bool(self._has_block(pos) or self._player_cells.at(pos) or self.bomb_list.at(pos))
 
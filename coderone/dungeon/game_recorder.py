@@ -1,4 +1,3 @@
-import jsonplus
 from .game import Recorder, GameEvent, GameSysAction, PlayerMove
 
 class FileRecorder(Recorder):
@@ -19,6 +18,7 @@ class FileRecorder(Recorder):
 		self.file.write(f"{tick}: ")
 
 		if isinstance(event, GameSysAction):
+			import jsonplus
 			self.file.write(f"{event.action.value} ")
 			self.file.write(jsonplus.dumps(event.payload))
 		
@@ -5,13 +5,16 @@ import logging
 logger = logging.getLogger(__name__)
 
 class Client:
-	def __init__(self, game, config):
+	def __init__(self, game, config, agents=()):
 		self.game = game
 		self.config = config
+		self.agents = agents
 
 		self.is_endless = self.config.get('endless', False)
+		self.is_turbo = self.config.get('turbo', False)
 		self.paused = False # self.config.get('start_paused', False)
 		self.single_step = False # self.config.get('single_step', False)
+		self.ticks_per_sec = None # Achieved by the last run
 		
 	def _update(self, tick_step):
 		self.game.tick(tick_step)
@@ -24,18 +27,32 @@ class Client:
 		if self.game.is_over and self.is_endless:
 			self._reset_game()
 
+	def _wait_agents(self, deadline:float):
+		""" Wait for all agents to answer the last state update, but no later than the deadline """
+		for agent in self.agents:
+			agent.wait_move(max(0, deadline - time.time()))
+
 	def run(self, tick_step):
+		""" Run the game loop. A tick takes `tick_step` seconds,
+		or in turbo mode as long as it takes all agents to answer but at most `tick_step` seconds.
+		"""
+		tick_count = 0
+		start_time = time.time()
 		try:
 			while not self.game.is_over:
 				logger.info(f"game-step [{self.game.tick_counter}/{self.game.max_iterations}]")
 				
 				cycle_start_time = time.time()
+				if self.is_turbo:
+					self._wait_agents(cycle_start_time + tick_step)
+
 				self._update(tick_step)
+				tick_count += 1
 				dt = time.time() - cycle_start_time
 				logger.debug(f"game-step [{self.game.tick_counter}/{self.game.max_iterations}] completed in {dt*1000.0:.4f}ms")
 		
 				sleep_time = tick_step - dt
-				if sleep_time > 0:
+				if sleep_time > 0 and not self.is_turbo:
 					logger.debug(f"has time to sleep for {sleep_time}sec")
 					time.sleep(sleep_time)
 
@@ -43,5 +60,12 @@ class Client:
 			logger.info(f"user interrupted the game")
 			pass
 
+		elapsed = time.time() - start_time
+		if elapsed > 0:
+			self.ticks_per_sec = tick_count / elapsed
+			logger.info(f"{tick_count} game-steps in {elapsed:.2f}sec: {self.ticks_per_sec:.1f} ticks/sec")
+
 	def _reset_game(self):
+		# Every game of an endless session is played by fresh agents
+		self.game.reset_agents()
 		self.game.generate_map()
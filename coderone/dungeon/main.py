@@ -4,23 +4,23 @@
  Coder One AI game tournament challenge
 """
 
-import argparse
 import os
 import sys
 import time
 import logging
-import jsonplus
 from contextlib import ExitStack
-from typing import Dict, List, Tuple, Union, NamedTuple, Any, Optional
-
-from appdirs import user_config_dir
+from typing import TYPE_CHECKING, List, Any, Optional
 
 from .game_recorder import FileRecorder, Recorder
-# from coderone.dungeon.agent_driver.simple_driver import Driver, AgentProxy
-from .agent_driver.multiproc_driver import Driver, AgentProxy
+from .agent_driver import DRIVERS, get_driver
+from .agent_driver.agent import Agent, wait_ready
 
 from .game import Game
 
+# Heavy dependencies are imported by the code paths that use them: agent processes started from scratch import this module too
+if TYPE_CHECKING:
+	from .agent_driver.multiproc_driver import WorkerPool
+
 APP_NAME = 'coderone.dungeon'
 
 ASSET_DIRECTORY = os.path.join(os.path.dirname(__file__), 'assets')
@@ -29,8 +29,7 @@ DEFAULT_CONFIG_FILE = 'config.json'
 
 SCREEN_TITLE = "Coder One: Dungeons & Data Structures"
 
-AGENT_READY_WAIT_TIMEOUT = 3
-AGENT_READY_WAIT_SEC = 1	# Max numbre of sec to wait for agent to become ready.
+AGENT_READY_WAIT_TIMEOUT = 3	# Max number of sec to wait for agents to become ready
 TICK_STEP = 0.1 			# Number of seconds per 1 iteration of game loop
 ITERATION_LIMIT = 180*10 	# Max number of iteration the game should go on for, None for unlimited
 
@@ -41,6 +40,7 @@ logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 
 def __load_or_generate_config(config_file:Optional[str]) -> dict:
 	## Setting up the players using the config file
+	import jsonplus
 
 	if config_file:
 		# A custom config file location given:
@@ -52,6 +52,7 @@ def __load_or_generate_config(config_file:Optional[str]) -> dict:
 			raise
 	else:
 		# Default config file expected:
+		from appdirs import user_config_dir
 		config_dir = user_config_dir(APP_NAME)
 		config_file = os.path.join(config_dir, DEFAULT_CONFIG_FILE)
 
@@ -83,10 +84,25 @@ def __load_or_generate_config(config_file:Optional[str]) -> dict:
 	config_data.setdefault('no_text', False)  # A work around Pillow (Python image library) bug	
 	config_data.setdefault('single_step', False)
 	config_data.setdefault('endless', False)
+	config_data.setdefault('turbo', False)	# Headless only: advance as soon as all agents have answered, tick_step is the deadline
+	config_data.setdefault('lockstep', False)	# Agents answer every tick in order, moves missing the move_deadline are NO-OP
+	config_data.setdefault('move_deadline', TICK_STEP)
 	
 	config_data.setdefault('rows', Game.ROW_COUNT)
 	config_data.setdefault('columns', Game.COLUMN_COUNT)
 	config_data.setdefault('max_iterations', ITERATION_LIMIT)
+	config_data.setdefault('seed', None)	# Seed of the game random stream, None for a random match
+	config_data.setdefault('shared_state', True)	# Send game states to agent processes through shared memory rather than pickling them
+	config_data.setdefault('state_delta', False)	# Send agents deltas against the previous state through their queues, instead of shared memory
+	config_data.setdefault('observation', False)	# Provide agents with a dense NumPy observation of the game state, needs NumPy
+	config_data.setdefault('driver', 'multiproc')	# Agent driver: 'multiproc', 'thread', 'inproc', 'async' or 'batch', see agent_driver/__init__.py
+	config_data.setdefault('agent_tick_budget', None)	# CPU seconds an agent may take per move, moves over it are NO-OP. None for no limit
+	config_data.setdefault('agent_match_budget', None)	# CPU seconds an agent may take over a match, it plays NO-OP once over. None for no limit
+	config_data.setdefault('agent_cpu_limit_sec', None)	# CPU seconds an agent process may use per match, the agent is disqualified once over. None for no limit
+	config_data.setdefault('agent_memory_limit_mb', None)	# Address space an agent process may use in MB, the agent is disqualified once over. None for no limit
+	config_data.setdefault('agent_cpu_affinity', None)	# CPUs agent processes may run on, e.g. [2, 3]. None for any
+	config_data.setdefault('zygote', False)	# Fork agent processes from a server process that has already imported the engine
+	config_data.setdefault('zygote_preload', [])	# Modules for the zygote to import once for all agents, e.g. ["numpy"]
 
 	return config_data
 
@@ -120,16 +136,34 @@ def _prepare_import(path):
 	return ".".join(module_name[::-1])
 
 
-def __load_agent_drivers(cntx: ExitStack, agent_modules, config:dict, watch=False) -> List[Driver]:
+def __load_agent_drivers(cntx: ExitStack, agent_modules, config:dict, watch=False, pool:Optional['WorkerPool']=None) -> list:
 	agents = []
 	n_agents = len(agent_modules)
+	driver_name = config.get('driver', 'multiproc')
+	Driver = get_driver(driver_name)
+	driver_args = {}
+	if pool and driver_name != 'multiproc':
+		logger.warning(f"Agents of the '{driver_name}' driver are not run by worker pools, ignoring the pool")
+	elif pool:
+		driver_args['pool'] = pool
+	if driver_name in ('multiproc', 'batch'):
+		# Agents of the match share deltas of the states sent to them
+		from .agent_driver.state_delta import DeltaCache
+		driver_args['delta_cache'] = DeltaCache()
+
+	if driver_name not in ('multiproc', 'batch'):
+		from .agent_driver.sandbox import has_limits
+		if has_limits(config):
+			logger.warning(f"Agents of the '{driver_name}' driver run in the game process, resource limits are ignored")
+	if driver_name == 'async' and (config.get('agent_tick_budget') is not None or config.get('agent_match_budget') is not None):
+		logger.warning("CPU time of agents of the 'async' driver is not measured, CPU budgets are ignored: move_deadline bounds their calls")
 
 	logger.info(f"Loading agent modules: {n_agents} required")
 	for counter, agent_module in enumerate(agent_modules):
 		try:
 			logger.info(f"[{counter + 1}/{n_agents}] loading agent driver: {agent_module}")
 			module_name = _prepare_import(agent_module)
-			driver = Driver(module_name, watch, config)
+			driver = Driver(module_name, watch, config, **driver_args)
 			cntx.enter_context(driver)
 			agents.append(driver)
 		except Exception as e:
@@ -143,7 +177,8 @@ class TooManyPlayers(Exception):
 	pass
 
 
-def run(agent_modules, player_names, config=None, recorder=None, watch=False):
+def run(agent_modules, player_names, config=None, recorder=None, watch=False, pool:Optional['WorkerPool']=None):
+	""" Play a match. Agents are leased from the `pool` if one is given, otherwise they are started for this match only """
 	# Create a new game
 	row_count = config.get('rows')
 	column_count = config.get('columns')
@@ -157,15 +192,16 @@ def run(agent_modules, player_names, config=None, recorder=None, watch=False):
 		raise TooManyPlayers(f"Game map ({column_count}x{row_count}) supports at most {max_players} players while {len(agent_modules)} agent requested.")
 
 	# Load agent modules
+	start_time = time.time()
 	with ExitStack() as stack:
-		agent_drivers = __load_agent_drivers(stack, agent_modules, watch=watch, config=config)
+		agent_drivers = __load_agent_drivers(stack, agent_modules, watch=watch, config=config, pool=pool)
 		if not agent_drivers:
 			return None  # Exiting with an error, no contest
 
-		game = Game(row_count=row_count, column_count=column_count, max_iterations=iteration_limit, recorder=recorder)
+		game = Game(row_count=row_count, column_count=column_count, max_iterations=iteration_limit, recorder=recorder, seed=config.get('seed'), observation=config.get('observation'))
 
 		# Add all agents to the game
-		agents: List[AgentProxy] = []
+		agents: List[Agent] = []
 		names_len = len(player_names) if player_names else 0
 		for i, agent_driver in enumerate(agent_drivers):
 			agent = agent_driver.agent()
@@ -176,24 +212,21 @@ def run(agent_modules, player_names, config=None, recorder=None, watch=False):
 		user_pid = game.add_player("Player") if is_interactive else None
 		game.generate_map()
 
-		wait_time = AGENT_READY_WAIT_TIMEOUT
-		time.sleep(0.1) # Yeld to sub-processes a chance to start and initialise agents
-		agents_not_ready = [a.name for a in agents if not a.is_ready]
-		while agents_not_ready and wait_time > 0:		
-			logger.info(f"Waiting for slowpoke agents [{wait_time} sec]: {agents_not_ready}")
-			time.sleep(AGENT_READY_WAIT_SEC)
-			wait_time -= AGENT_READY_WAIT_SEC
-			agents_not_ready = [a.name for a in agents if not a.is_ready]
-		
+		# The match starts as soon as the last agent reports ready. Agents leased from a pool are ready straight away
+		agents_not_ready = [a.name for a in wait_ready(agents, AGENT_READY_WAIT_TIMEOUT)]
 		if agents_not_ready:
 			logger.info(f"Agents {agents_not_ready} are still not ready even after {AGENT_READY_WAIT_TIMEOUT}sec. Starting the match anyways")
+		start_latency = time.time() - start_time
 
 		tick_step = config.get('tick_step')
+		ticks_per_sec = None
 		if config.get('headless'):
 			from .headless_client import Client
 
-			client = Client(game=game, config=config)
+			client = Client(game=game, config=config, agents=agents)
 			client.run(tick_step)
+			if config.get('turbo') and client.ticks_per_sec is not None:
+				ticks_per_sec = round(client.ticks_per_sec, 1)
 		else:
 			if config.get('hack'):
 				from .hack_client import Client
@@ -209,7 +242,7 @@ def run(agent_modules, player_names, config=None, recorder=None, watch=False):
 			window.run(tick_step)
 
 		# Announce game winner and exit
-		return game.stats
+		return game.stats._replace(start_latency_ms=round(start_latency * 1000, 3), ticks_per_sec=ticks_per_sec)
 
 
 def run_match(agents:List[str], players:List[str]=None, config_name:str=None, record_file:str=None, watch:bool=False, args:Any=None):
@@ -222,6 +255,10 @@ def run_match(agents:List[str], players:List[str]=None, config_name:str=None, re
 		if args.start_paused or 'start_paused' not in config:	config['start_paused'] = args.start_paused
 		if args.single_step or 'single_step' not in config:		config['single_step'] = args.single_step
 		if args.endless or 'endless' not in config:				config['endless'] = args.endless
+		if args.turbo or 'turbo' not in config:					config['turbo'] = args.turbo
+		if args.lockstep or 'lockstep' not in config:			config['lockstep'] = args.lockstep
+		if args.seed is not None or 'seed' not in config:		config['seed'] = args.seed
+		if args.driver is not None or 'driver' not in config:	config['driver'] = args.driver
 		
 		# if args.watch or 'watch' not in config:					config['watch'] = args.watch
 		# if args.record or 'record' not in config:				config['record'] = args.record
@@ -277,6 +314,9 @@ def submit_agent(agent_module:str):
 
 
 def main():
+	import argparse
+	import jsonplus
+
 	parser = argparse.ArgumentParser(description=SCREEN_TITLE)
 	
 	parser.add_argument('--headless', action='store_true',
@@ -303,6 +343,22 @@ def main():
 					default=False,
 					help='Game will restart after the match is over. indefinitely')
 
+	parser.add_argument('--turbo', action='store_true',
+					default=False,
+					help='In headless mode, advance the game as soon as all agents answer instead of every tick_step seconds')
+
+	parser.add_argument('--lockstep', action='store_true',
+					default=False,
+					help='Play each tick with the moves agents have made for that tick. Moves missing the move_deadline are NO-OP')
+
+	parser.add_argument('--driver', type=str, choices=list(DRIVERS),
+					default=None,
+					help='How agents are run: in separate processes (multiproc, default), in a thread pool (thread), in the game process (inproc), on an event loop (async) or in one process per module (batch)')
+
+	parser.add_argument('--seed', type=int,
+					default=None,
+					help='Seed of the game random stream to replay the same maps and spawns')
+
 	parser.add_argument('--submit', action='store_true',
 					default=False,
 					help="Don't run the game, but submit the agent as team entry into the trournament")
@@ -343,6 +399,8 @@ def main():
 		# TODO: Do we need an error message for 'single_step' if running headless?
 	if args.headless and args.no_text:
 		print("Makes no sense to run headless and ask for no-text. Ignoring", file=sys.stderr)
+	if args.turbo and not args.headless:
+		print("Turbo mode is only supported in headless mode. Ignoring", file=sys.stderr)
 	if not args.interactive and args.start_paused:
 		print("Can not start paused in non-interactive mode. Exiting", file=sys.stderr)
 		sys.exit(1)		
@@ -0,0 +1,98 @@
+"""
+ Dense tensor observation of the game for agents based on numeric models.
+
+ The observation of a game is a read-only float32 array of shape (channels, column_count, row_count), indexed as [channel, x, y].
+ Channels, all values are in [0, 1]:
+	CH_INDESTRUCTIBLE_BLOCK		1 where there is an indestructible block
+	CH_SOFT_BLOCK				1 where there is a soft block
+	CH_ORE_BLOCK				1 where there is an ore block
+	CH_AMMO						1 where there is ammo to pick up
+	CH_TREASURE					1 where there is a treasure to pick up
+	CH_BOMB						1 where there is a bomb
+	CH_BOMB_TIMER				Time left until the bomb in the cell goes off as a fraction of BOMB_TTL
+	CH_FIRE						1 where there is fire
+	CH_PLAYER + i				1 where the i-th alive player of `GameState.players` is
+
+ An egocentric view of a player is a (EGO_CHANNELS, 2 * radius + 1, 2 * radius + 1) window of the observation centered on the player.
+ It has the same first CH_PLAYER channels followed by EGO_SELF, the player itself, and EGO_OPPONENTS, all other alive players.
+ Cells outside of the map are seen as indestructible blocks.
+
+ Channel numbers only ever get appended to, so models trained on an observation keep working.
+"""
+
+from typing import Tuple
+
+try:
+	import numpy as np
+except ImportError as e:
+	raise ImportError("Dense observation needs NumPy, install it with: pip install 'coderone-challenge-dungeon[ml]'") from e
+
+from .agent import Point
+
+CH_INDESTRUCTIBLE_BLOCK = 0
+CH_SOFT_BLOCK = 1
+CH_ORE_BLOCK = 2
+CH_AMMO = 3
+CH_TREASURE = 4
+CH_BOMB = 5
+CH_BOMB_TIMER = 6
+CH_FIRE = 7
+CH_PLAYER = 8
+
+EGO_SELF = CH_PLAYER
+EGO_OPPONENTS = CH_PLAYER + 1
+EGO_CHANNELS = CH_PLAYER + 2
+
+EGO_RADIUS = 5 # Default radius of the egocentric view
+
+
+def _mark(obs:np.ndarray, channel:int, positions:Tuple[Point, ...]):
+	if positions:
+		xy = np.array(positions)
+		obs[channel, xy[:, 0], xy[:, 1]] = 1
+
+
+def encode(game) -> np.ndarray:
+	""" Build an observation of the current state of the game, see module docs for the layout
+	"""
+	players = list(game.players.values()) # Same order as GameState.players
+	obs = np.zeros((CH_PLAYER + len(players), game.column_count, game.row_count), dtype=np.float32)
+
+	_mark(obs, CH_INDESTRUCTIBLE_BLOCK, game.static_block_list.positions())
+	for block in game.value_block_list:
+		obs[CH_ORE_BLOCK if isinstance(block, game._OreBlock) else CH_SOFT_BLOCK][block.pos] = 1
+	_mark(obs, CH_AMMO, game.ammunition_list.positions())
+	_mark(obs, CH_TREASURE, game.treasure_list.positions())
+	_mark(obs, CH_BOMB, game.bomb_list.positions())
+	for bomb in game.bomb_list:
+		obs[CH_BOMB_TIMER][bomb.pos] = min(bomb.hp / game.BOMB_TTL, 1)
+	_mark(obs, CH_FIRE, game.fire_list.positions())
+
+	for i, player in enumerate(players):
+		if player.pos is not None and player.is_alive:
+			obs[CH_PLAYER + i][player.pos] = 1
+
+	obs.flags.writeable = False
+	return obs
+
+
+def egocentric(obs:np.ndarray, pos:Point, player_index:int, radius:int=EGO_RADIUS) -> np.ndarray:
+	""" Egocentric view of the i-th player standing at `pos`, see module docs for the layout
+	"""
+	size = 2 * radius + 1
+	view = np.zeros((EGO_CHANNELS, size, size), dtype=obs.dtype)
+	view[CH_INDESTRUCTIBLE_BLOCK] = 1
+
+	_, columns, rows = obs.shape
+	x, y = pos
+	x0, x1 = max(x - radius, 0), min(x + radius + 1, columns)
+	y0, y1 = max(y - radius, 0), min(y + radius + 1, rows)
+	window = obs[:, x0:x1, y0:y1]
+	target = (slice(x0 - x + radius, x1 - x + radius), slice(y0 - y + radius, y1 - y + radius))
+
+	view[(slice(0, CH_PLAYER),) + target] = window[:CH_PLAYER]
+	view[(EGO_SELF,) + target] = window[CH_PLAYER + player_index]
+	view[(EGO_OPPONENTS,) + target] = np.delete(window[CH_PLAYER:], player_index, axis=0).max(axis=0, initial=0)
+
+	view.flags.writeable = False
+	return view
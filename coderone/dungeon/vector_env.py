@@ -0,0 +1,211 @@
+"""
+ Gym-style vectorized environment.
+ VectorEnv plays a number of `Game` instances in-process, without agents or agent drivers,
+ and exchanges batched NumPy arrays with the caller. It is meant for training RL agents.
+ Games can be spread over worker processes to use more than one CPU core.
+"""
+
+import multiprocessing
+import random
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+	import numpy as np
+except ImportError as e:
+	raise ImportError("VectorEnv needs NumPy, install it with: pip install 'coderone-challenge-dungeon[ml]'") from e
+
+from .game import Game, PlayerActions
+from .batch_game import ACTIONS
+from .observation import CH_PLAYER, encode
+
+# Per-player values reported in the info of every step
+_PLAYER_INFO = ('hp', 'ammo', 'power', 'score')
+
+
+class _GameBatch:
+	""" Games of a VectorEnv played in the current process
+	"""
+
+	def __init__(self, n_envs:int, n_players:int, column_count:int, row_count:int, max_iterations:Optional[int], auto_reset:bool, seed=None):
+		self.n_envs = n_envs
+		self.n_players = n_players
+		self.auto_reset = auto_reset
+		self._seeds = random.Random(seed) # Seeds maps of games that are reset automatically
+
+		self.games:List[Game] = []
+		for _ in range(n_envs):
+			game = Game(row_count=row_count, column_count=column_count, max_iterations=max_iterations)
+			for _ in range(n_players):
+				game.add_player(None)
+			self.games.append(game)
+		self._pids = [sorted(game.players) for game in self.games]
+
+		self._obs = np.zeros((n_envs, CH_PLAYER + n_players, column_count, row_count), dtype=np.float32)
+		self._score = np.zeros((n_envs, n_players), dtype=np.int64)
+
+	def reset(self, seeds:Sequence[int]) -> np.ndarray:
+		for i, seed in enumerate(seeds):
+			self._reset_game(i, seed)
+		return self._obs.copy()
+
+	def _reset_game(self, i:int, seed:int):
+		game = self.games[i]
+		game.generate_map(seed)
+		self._obs[i] = encode(game)
+		self._score[i] = 0
+
+	def step(self, actions:np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+		n_envs, n_players = self.n_envs, self.n_players
+		rewards = np.zeros((n_envs, n_players), dtype=np.float32)
+		dones = np.zeros(n_envs, dtype=bool)
+		info = {key: np.zeros((n_envs, n_players), dtype=np.int32) for key in _PLAYER_INFO}
+		info['tick'] = np.zeros(n_envs, dtype=np.int64)
+		info['winner'] = np.full(n_envs, -1, dtype=np.int32)
+		final_obs = None
+
+		for i, game in enumerate(self.games):
+			pids = self._pids[i]
+			if not game.is_over:
+				for pid, action in zip(pids, actions[i]):
+					action = ACTIONS[action]
+					if action != PlayerActions.NO_OP:
+						game.enqueue_action(pid, action)
+				game.tick(0)
+				self._obs[i] = encode(game)
+
+			for p, pid in enumerate(pids):
+				player = game.players[pid]
+				info['hp'][i, p] = player.hp
+				info['ammo'][i, p] = player.ammo
+				info['power'][i, p] = player.power
+				info['score'][i, p] = player.reward
+				rewards[i, p] = player.reward - self._score[i, p]
+			self._score[i] = info['score'][i]
+			info['tick'][i] = game.tick_counter
+			if game.winner:
+				info['winner'][i] = pids.index(game.winner[0])
+
+			dones[i] = game.is_over
+			if game.is_over and self.auto_reset:
+				if final_obs is None:
+					final_obs = np.zeros_like(self._obs)
+				final_obs[i] = self._obs[i]
+				self._reset_game(i, self._seeds.getrandbits(64))
+
+		if self.auto_reset:
+			info['final_observation'] = final_obs if final_obs is not None else np.zeros_like(self._obs)
+
+		return self._obs.copy(), rewards, dones, info
+
+
+def _worker(conn, batch_args):
+	""" Serve commands of a VectorEnv for a part of its games until closed
+	"""
+	batch = _GameBatch(*batch_args)
+	try:
+		while True:
+			command, data = conn.recv()
+			if command == 'step':
+				conn.send(batch.step(data))
+			elif command == 'reset':
+				conn.send(batch.reset(data))
+			else:
+				break
+	except (EOFError, KeyboardInterrupt):
+		pass
+	finally:
+		conn.close()
+
+
+class VectorEnv:
+	""" A vector of `n_envs` independent games of the same map size and number of players played in lockstep.
+
+	- `reset(seeds)` generates new maps and returns observations: a float32 array of shape (n_envs, channels, column_count, row_count)
+	  holding the dense observation of each game, see `coderone.dungeon.observation`. Players are in the order of their pids.
+	- `step(actions)` takes an (n_envs, n_players) array of action codes, see `batch_game.ACTIONS`, advances every game by one tick
+	  and returns `(observations, rewards, dones, info)`. It must not be called before `reset`. Rewards are changes of player scores on this tick.
+	  Info is a dict of arrays: per-player 'hp', 'ammo', 'power' and 'score' of shape (n_envs, n_players),
+	  'tick' and 'winner' (player index, -1 if none) of shape (n_envs,).
+
+	With `auto_reset` a game that is over is reset straight away: the step returns observation of the new map,
+	while info describes the game that has ended and 'final_observation' holds its last observation.
+	Without it, games that are over stay as they are until `reset` is called.
+
+	With `n_workers` > 0 games are split between that many worker processes. Call `close` to stop them.
+	"""
+
+	def __init__(self, n_envs:int, n_players:int=2, column_count:int=Game.COLUMN_COUNT, row_count:int=Game.ROW_COUNT,
+			max_iterations:Optional[int]=None, auto_reset:bool=True, seed=None, n_workers:int=0):
+		self.n_envs = n_envs
+		self.n_players = n_players
+		self.column_count = column_count
+		self.row_count = row_count
+		self._seeds = random.Random(seed) # Seeds maps of games reset without explicit seeds
+
+		self._batch = None
+		self._workers = []
+		self._is_reset = False
+		if n_workers <= 0:
+			self._batch = _GameBatch(n_envs, n_players, column_count, row_count, max_iterations, auto_reset, self._seeds.getrandbits(64))
+			return
+
+		self._splits = np.array_split(np.arange(n_envs), min(n_workers, n_envs))
+		for envs in self._splits:
+			conn, worker_conn = multiprocessing.Pipe()
+			batch_args = (len(envs), n_players, column_count, row_count, max_iterations, auto_reset, self._seeds.getrandbits(64))
+			process = multiprocessing.Process(target=_worker, args=(worker_conn, batch_args), daemon=True)
+			process.start()
+			worker_conn.close()
+			self._workers.append((process, conn))
+
+	def reset(self, seeds:Optional[Sequence[int]]=None) -> np.ndarray:
+		""" Generate new maps for all games. Games with the same seed get the same map and random stream """
+		if seeds is None:
+			seeds = [self._seeds.getrandbits(64) for _ in range(self.n_envs)]
+		elif len(seeds) != self.n_envs:
+			raise ValueError(f"Expected {self.n_envs} seeds, got {len(seeds)}")
+
+		self._is_reset = True
+		if self._batch is not None:
+			return self._batch.reset(seeds)
+
+		for envs, (_, conn) in zip(self._splits, self._workers):
+			conn.send(('reset', [seeds[i] for i in envs]))
+		return np.concatenate([conn.recv() for _, conn in self._workers])
+
+	def step(self, actions:np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+		""" Advance all games by one tick """
+		if not self._is_reset:
+			raise RuntimeError("call reset() first")
+		actions = np.asarray(actions, dtype=np.int64)
+		if actions.shape != (self.n_envs, self.n_players):
+			raise ValueError(f"Expected actions of shape {(self.n_envs, self.n_players)}, got {actions.shape}")
+
+		if self._batch is not None:
+			return self._batch.step(actions)
+
+		for envs, (_, conn) in zip(self._splits, self._workers):
+			conn.send(('step', actions[envs]))
+		results = [conn.recv() for _, conn in self._workers]
+
+		obs, rewards, dones, infos = zip(*results)
+		info = {key: np.concatenate([info[key] for info in infos]) for key in infos[0]}
+		return np.concatenate(obs), np.concatenate(rewards), np.concatenate(dones), info
+
+	def close(self):
+		""" Stop worker processes """
+		for process, conn in self._workers:
+			try:
+				conn.send(('close', None))
+			except (BrokenPipeError, EOFError):
+				pass
+			conn.close()
+			process.join()
+		self._workers = []
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
@@ -27,6 +27,10 @@ setuptools.setup(
 
 		'requests==2.25.0'
 	],
+	extras_require={
+		# Dense observations, BatchGame and VectorEnv
+		'ml': ['numpy'],
+	},
     python_requires='>=3.6',
 	entry_points = {
         'console_scripts': [